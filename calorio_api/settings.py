@@ -11,8 +11,10 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 import sys
+from importlib.util import find_spec
 from dotenv import load_dotenv
 from django.core.management.utils import get_random_secret_key
 
@@ -70,12 +72,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -111,14 +117,36 @@ import dj_database_url
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+
+# Пул соединений psycopg 3 (Django >= 5.1): один пул на процесс вместо
+# постоянного соединения на поток. С пулом CONN_MAX_AGE должен быть 0.
+DB_POOL = os.getenv('DB_POOL', 'False').lower() == 'true'
+DB_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+}
+
+
+def _database_config(url):
+    """Настройки соединения из URL (с пулом для PostgreSQL при DB_POOL=True)"""
+    pooled = DB_POOL and url.startswith(('postgres://', 'postgresql://'))
+    config = dj_database_url.parse(
+        url,
+        # Под ASGI соединения привязаны к потокам запросов - там нужен DB_CONN_MAX_AGE=0 или пул
+        conn_max_age=0 if pooled else int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        conn_health_checks=not pooled,
+    )
+    if pooled:
+        config.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL_OPTIONS)
+    return config
+
+
 if DATABASE_URL:
     # Production: используем PostgreSQL через DATABASE_URL
     DATABASES = {
-        'default': dj_database_url.config(
-            default=DATABASE_URL,
-            conn_max_age=600,
-            conn_health_checks=True,
-        )
+        'default': _database_config(DATABASE_URL),
     }
 else:
     # Development: используем SQLite
@@ -129,6 +157,17 @@ else:
         }
     }
 
+if DATABASE_REPLICA_URL and not RUNNING_TESTS:
+    # Реплика для чтения в read-only view (core.db_router). Локально можно
+    # проверить с двумя SQLite: DATABASE_REPLICA_URL=sqlite:///replica.sqlite3.
+    # В тестах не подключается: зеркало не видит данных из транзакции теста
+    DATABASES['replica'] = _database_config(DATABASE_REPLICA_URL)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной БД (больше задержки репликации)
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', '10'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -178,17 +217,34 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # REST Framework settings
+MSGPACK_AVAILABLE = find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication с кэшем пользователя (users.authentication)
+        'users.authentication.CachedJWTAuthentication',
         # SessionAuthentication убран, так как используется только JWT для API
     ],
+    # orjson вместо stdlib json (формат ответов прежний, см. core.renderers);
+    # MessagePack - по Accept / Content-Type: application/msgpack, если установлен msgpack.
+    # JSON остаётся первым: он отдаётся при Accept: */* и без Accept
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        *(['core.renderers.MessagePackRenderer'] if MSGPACK_AVAILABLE else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        *(['core.parsers.MessagePackParser'] if MSGPACK_AVAILABLE else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.throttles.AnonThrottle',
+        'core.throttles.UserThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -291,23 +347,117 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Claim версии токенов пользователя: отзыв всех токенов - один UPDATE (users.tokens)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.VersionedTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.VersionedTokenRefreshSerializer',
 }
 
 # OpenRouter API settings (для распознавания по фото и поиска КБЖУ по названию)
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
 SITE_URL = os.getenv('SITE_URL', 'http://217.26.29.106')
 
+# Адрес chat completions (переопределяется для стаба в нагрузочных тестах)
+OPENROUTER_API_URL = os.getenv('OPENROUTER_API_URL', '')
+# Размер пула соединений httpx к OpenRouter в асинхронных view (на процесс)
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv('OPENROUTER_MAX_CONNECTIONS', '200'))
+# Асинхронные view для распознавания, поиска КБЖУ и создания блюда (запуск под ASGI/uvicorn)
+ASYNC_UPSTREAM_VIEWS = os.getenv('ASYNC_UPSTREAM_VIEWS', 'False').lower() == 'true'
+
+# Метрики Prometheus (/api/metrics/): каталог снимков процессов для агрегации
+# по воркерам gunicorn (пусто - только текущий процесс), период сброса снимка
+# и токен доступа (Authorization: Bearer <токен>; пусто - endpoint доступен только в DEBUG)
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Профилирование запросов (core.profiling): выборка по вероятности, id пользователей
+# или заголовку PROFILING_HEADER с токеном; захват профиля - cprofile или stack
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_USERS = [user_id for user_id in os.getenv('PROFILING_USERS', '').split(',') if user_id]
+PROFILING_HEADER = os.getenv('PROFILING_HEADER', 'X-Calorio-Profile')
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_CAPTURE = os.getenv('PROFILING_CAPTURE', '')
+PROFILING_STACK_INTERVAL_MS = float(os.getenv('PROFILING_STACK_INTERVAL_MS', '5'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', str(BASE_DIR / 'logs' / 'profiles'))
+
+# Сжатие ответов (core.compression): кодировки в порядке предпочтения сервера
+# (доступны при установленных brotli / zstandard) и минимальный размер тела
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_ENCODINGS = [coding for coding in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if coding]
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
+# Пакетные запросы (POST /api/batch/, core.batch): максимум подзапросов в пакете
+# и потоков для параллельного выполнения (1 - всегда последовательно)
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
+
+# Квоты на запросы к OpenRouter по тарифным планам (JSON, сливается с core.quotas.DEFAULT_QUOTA_PLANS):
+# {"free": {"recognition": {"day": 10, "month": 100}, "nutrition_lookup": {...}}, "default": {...}}
+QUOTA_PLANS = json.loads(os.getenv('QUOTA_PLANS', 'null'))
+
 # Payment Provider Webhook Secret (для проверки подписи webhook)
 PAYMENT_WEBHOOK_SECRET = os.getenv('PAYMENT_WEBHOOK_SECRET', '')
 
-# Cache configuration (для rate limiting)
-CACHES = {
-    'default': {
+# Cache configuration
+# Общий кэш нужен для согласованных лимитов (throttling), версий дней и кэша
+# ответов между воркерами gunicorn. Работа с кэшем идёт через core.cache.
+#   REDIS_URL=redis://localhost:6379/0   - Redis (production)
+#   CACHE_BACKEND=file                   - файловый кэш, общий для процессов на одной машине
+#   CACHE_BACKEND=db                     - таблица в БД (python manage.py createcachetable)
+#   по умолчанию                         - LocMemCache (локальная разработка, тесты)
+# file и db - только для DEBUG и тестов: incr в них - неатомарные get + set,
+# сбрасывающие TTL ключа. Скользящее окно throttling (core.ratelimit), квоты
+# (core.quotas) и версии кэша ответов (core.response_cache) на них теряют
+# увеличения, а окна дня и месяца не истекают вовремя.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if REDIS_URL else 'locmem').lower()
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'calorio')
+
+if CACHE_BACKEND in ('file', 'db') and not (DEBUG or RUNNING_TESTS):
+    raise ValueError(
+        f"CACHE_BACKEND={CACHE_BACKEND} допустим только при DEBUG=True или в тестах: "
+        "счётчикам нужен атомарный incr с сохранением TTL (используйте REDIS_URL)"
+    )
+
+if CACHE_BACKEND == 'redis':
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL or 'redis://127.0.0.1:6379/0',
+        'OPTIONS': {
+            'socket_connect_timeout': 1,
+            'socket_timeout': 1,
+        },
+    }
+elif CACHE_BACKEND == 'file':
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    }
+elif CACHE_BACKEND == 'db':
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'calorio_cache'),
+    }
+else:
+    _default_cache = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+CACHES = {
+    'default': {
+        **_default_cache,
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': 300,
     }
 }
 
+# Время жизни закэшированных ответов за день (секунды).
+# Инвалидация происходит по версии дня, TTL лишь ограничивает размер кэша
+DAY_RESPONSE_CACHE_TIMEOUT = int(os.getenv('DAY_RESPONSE_CACHE_TIMEOUT', '300'))
+
 # Security Settings
 def _bool_env(name: str, default: bool) -> bool:
     return os.getenv(name, str(default)).lower() == 'true'
@@ -24,6 +24,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 from core.health import health_check, readiness_check, liveness_check
+from core.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -35,6 +36,7 @@ urlpatterns = [
     path('api/health/', health_check, name='health-check'),
     path('api/ready/', readiness_check, name='readiness-check'),
     path('api/alive/', liveness_check, name='liveness-check'),
+    path('api/metrics/', metrics_view, name='metrics'),
     
     # API документация
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
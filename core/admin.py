@@ -10,3 +10,5 @@ class DishAdmin(admin.ModelAdmin):
     search_fields = ['name']
     ordering = ['-created_at']
     readonly_fields = ['created_at', 'updated_at']
+    # __str__ блюда обращается к user.username: без этого - запрос на каждую строку
+    list_select_related = ['user', 'meal']
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (инвалидация кэша ответов)
+        from . import signals  # noqa: F401
@@ -0,0 +1,179 @@
+"""
+Асинхронные view для endpoint'ов, ожидающих OpenRouter
+
+Под ASGI (uvicorn) синхронный view занимает поток на всё время ответа LLM
+(до 60 секунд). Здесь аутентификация, права, throttling, валидация и ORM
+выполняются в потоке через sync_to_async, а ожидание OpenRouter - в event
+loop: один процесс обслуживает сотни одновременных медленных запросов.
+
+Включаются настройкой ASYNC_UPSTREAM_VIEWS (см. core/urls.py).
+"""
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import openrouter
+from .exceptions import QuotaExceededException
+from .models import Dish
+from .quotas import NUTRITION_LOOKUP, RECOGNITION, QuotaHeadersMixin, get_quota_status
+from .serializers import DishRecognitionSerializer, DishSerializer, FoodSearchSerializer
+from .utils import asearch_food_nutrition
+from .views import (
+    DishViewSet,
+    _apply_nutrition,
+    _prepare_dish,
+    _prepare_recognition,
+    _recognition_response,
+    _recognition_transport_error,
+)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView с асинхронными обработчиками методов.
+
+    initial() (аутентификация, права, throttling) и обработчик исключений
+    синхронные и выполняются в потоке; обработчики (post и т.д.) - корутины.
+    Синхронный options() из APIView тоже поддерживается.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('context', {'request': self.request, 'format': self.format_kwarg, 'view': self})
+        return self.serializer_class(*args, **kwargs)
+
+
+class AsyncDishRecognitionView(QuotaHeadersMixin, AsyncAPIView):
+    """Асинхронное распознавание блюда по фотографии"""
+    serializer_class = DishRecognitionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_throttles(self):
+        from core.throttles import DishRecognitionThrottle
+        return [DishRecognitionThrottle()]
+
+    def _prepare(self, request):
+        # Декодирование и проверка изображения - CPU-работа, выполняем в потоке
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        base64_data, error_response = _prepare_recognition(serializer)
+        if error_response is None:
+            self.consume_quota(request, RECOGNITION)
+        return serializer, base64_data, error_response
+
+    async def post(self, request, *args, **kwargs):
+        serializer, base64_data, error_response = await sync_to_async(self._prepare)(request)
+        if error_response is not None:
+            return error_response
+
+        try:
+            status_code, body = await openrouter.apost(
+                openrouter.recognition_payload(base64_data),
+                openrouter.RECOGNITION_TITLE,
+                openrouter.RECOGNITION_TIMEOUT,
+            )
+        except openrouter.OpenRouterTransportError as e:
+            return _recognition_transport_error(e)
+        return _recognition_response(status_code, body, serializer)
+
+
+class AsyncFoodSearchView(QuotaHeadersMixin, AsyncAPIView):
+    """Асинхронный поиск КБЖУ по названию продукта"""
+    serializer_class = FoodSearchSerializer
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        food_name = serializer.validated_data['food_name']
+        weight = serializer.validated_data.get('weight', 100)
+
+        try:
+            nutrition_data = await asearch_food_nutrition(food_name, weight, user=request.user)
+        except QuotaExceededException as exc:
+            request.quota_status = exc.quota_status
+            raise
+        request.quota_status = await sync_to_async(get_quota_status)(request.user, NUTRITION_LOOKUP)
+
+        if nutrition_data:
+            return Response(nutrition_data, status=status.HTTP_200_OK)
+        return Response(
+            {"detail": "Не удалось найти информацию о продукте. Попробуйте другое название или введите КБЖУ вручную."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+
+class AsyncDishCreateView(AsyncAPIView):
+    """Асинхронное создание блюда с автоматическим поиском КБЖУ"""
+    serializer_class = DishSerializer
+    permission_classes = [IsAuthenticated]
+
+    def _prepare(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        meal, fields, needs_lookup = _prepare_dish(request.user, serializer.validated_data)
+        return serializer, meal, fields, needs_lookup
+
+    def _create(self, request, serializer, meal, fields):
+        serializer.instance = Dish.objects.create(user=request.user, meal=meal, **fields)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    async def post(self, request, *args, **kwargs):
+        import logging
+        logger = logging.getLogger(__name__)
+
+        serializer, meal, fields, needs_lookup = await sync_to_async(self._prepare)(request)
+        if needs_lookup:
+            logger.info(f"🔍 Автоматический поиск КБЖУ для блюда: '{fields['name']}' ({fields['weight']}г)")
+            try:
+                nutrition_data = await asearch_food_nutrition(fields['name'], fields['weight'], user=request.user)
+            except QuotaExceededException:
+                logger.warning(f"Квота на поиск КБЖУ исчерпана для пользователя {request.user.pk}")
+                nutrition_data = None
+            _apply_nutrition(fields, nutrition_data)
+
+        return await sync_to_async(self._create)(request, serializer, meal, fields)
+
+
+_dish_create = AsyncDishCreateView.as_view()
+_dish_list = DishViewSet.as_view({'get': 'list'})
+
+
+@csrf_exempt
+async def dish_collection(request, *args, **kwargs):
+    """
+    /api/dishes/: создание - асинхронно, список - синхронным DishViewSet.
+
+    Router DRF не умеет смешивать sync и async обработчики в одном view.
+    csrf_exempt - как у APIView.as_view(): CSRF проверяет SessionAuthentication DRF.
+    """
+    if request.method == 'POST':
+        return await _dish_create(request, *args, **kwargs)
+    return await sync_to_async(_dish_list)(request, *args, **kwargs)
@@ -0,0 +1,135 @@
+"""
+Пакетное выполнение GET-запросов к API внутри одного HTTP-запроса
+
+Подзапросы вызывают view напрямую (resolve + вызов), минуя middleware:
+аутентификация, сжатие, метрики и т.п. выполняются один раз для внешнего
+POST /api/batch/. Пользователь передаётся во view уже аутентифицированным
+(ForcedAuthentication DRF), JWT повторно не проверяется. Последовательно
+подзапросы выполняются в текущем потоке и на одном соединении с БД,
+параллельно - в пуле потоков (у каждого потока своё соединение, оно
+закрывается после подзапроса). Асинхронные view (ASYNC_UPSTREAM_VIEWS)
+выполняются через async_to_sync в том же потоке.
+
+Ответ собирается из уже отрендеренных тел подзапросов без повторной
+сериализации: {"responses": [{"path", "status", "body"}, ...]} в порядке
+запросов. Тела из кэша ответов за день вставляются как есть.
+"""
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/api/batch/'
+
+# Заголовки внешнего запроса, которые не передаются в подзапросы: условные
+# запросы дали бы 304 без тела, сжатие и формат определяются внешним ответом
+_STRIPPED_META = (
+    'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_ACCEPT_ENCODING',
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'wsgi.input',
+)
+
+
+def _subrequest(request, path):
+    """Django-запрос GET path от имени пользователя внешнего запроса"""
+    django_request = getattr(request, '_request', request)
+    parts = urlsplit(path)
+    sub = HttpRequest()
+    sub.META = {key: value for key, value in django_request.META.items() if key not in _STRIPPED_META}
+    sub.META.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'HTTP_ACCEPT': 'application/json',
+    })
+    sub.method = 'GET'
+    sub.path = sub.path_info = parts.path
+    sub.GET = QueryDict(parts.query)
+    sub.COOKIES = django_request.COOKIES
+    sub.user = request.user
+    # Request DRF подставит ForcedAuthentication вместо authentication_classes
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    """Тело ответа как фрагмент JSON (байты)"""
+    content = response.content
+    if not content:
+        return b'null'
+    if response.get('Content-Type', '').startswith('application/json'):
+        return content
+    return dumps(content.decode(response.charset or 'utf-8', errors='replace'))
+
+
+def execute(request, path):
+    """
+    Выполняет один подзапрос.
+
+    Returns:
+        tuple (status_code, тело как JSON-байты)
+    """
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return 404, dumps({'detail': 'Не найдено.'})
+
+    sub = _subrequest(request, path)
+    sub.resolver_match = match
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    try:
+        response = view(sub, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+            # Рендеринг запускает post-render callbacks (например, кэш ответов за день)
+            response.render()
+    except Exception:
+        logger.exception('Batch subrequest failed: %s', path)
+        return 500, dumps({'detail': 'Внутренняя ошибка сервера.'})
+    return response.status_code, _body(response)
+
+
+def _execute_in_thread(request, path):
+    try:
+        return execute(request, path)
+    finally:
+        # Соединение потока пула не переиспользуется между пакетами
+        connections.close_all()
+
+
+def run(request, paths, parallel=False):
+    """
+    Выполняет подзапросы и возвращает результаты в порядке paths.
+
+    Args:
+        parallel: выполнять в пуле потоков (BATCH_MAX_WORKERS)
+    """
+    workers = min(getattr(settings, 'BATCH_MAX_WORKERS', 4), len(paths))
+    if not parallel or workers <= 1:
+        return [execute(request, path) for path in paths]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+        # Каждому подзапросу - своя копия контекста (реплика БД, профилирование)
+        futures = [
+            executor.submit(contextvars.copy_context().run, _execute_in_thread, request, path)
+            for path in paths
+        ]
+        return [future.result() for future in futures]
+
+
+def batch_response(paths, results):
+    """Ответ пакета: тела подзапросов вставляются без повторной сериализации"""
+    items = [
+        b'{"path":%s,"status":%d,"body":%s}' % (dumps(path), status_code, body)
+        for path, (status_code, body) in zip(paths, results)
+    ]
+    return HttpResponse(b'{"responses":[' + b','.join(items) + b']}', content_type='application/json')
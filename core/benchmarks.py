@@ -0,0 +1,422 @@
+"""
+Бенчмарки горячих endpoint'ов: генерация данных, бюджеты запросов, замеры
+
+Используется командами seed_benchmark и benchmark, а бюджеты запросов -
+тестами tests/test_query_budgets.py, чтобы N+1 ловились в CI без
+большого объёма данных.
+"""
+import random
+import subprocess
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import DailyGoal, Dish, Meal
+
+USERNAME_PREFIX = 'bench'
+PASSWORD = 'Benchmark-Passw0rd'
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snack']
+
+DISH_NAMES = [
+    'Овсянка', 'Гречка с курицей', 'Борщ', 'Салат овощной', 'Омлет', 'Творог',
+    'Паста болоньезе', 'Рис с овощами', 'Суп куриный', 'Яблоко', 'Банан', 'Йогурт',
+]
+
+# Максимальное число SQL-запросов на запрос к endpoint'у после прогрева (пользователь
+# JWT-аутентификации к этому времени в кэше, users.authentication). Не зависит от
+# объёма данных: рост означает N+1 или лишний запрос.
+QUERY_BUDGETS = {
+    'day_view': 4,
+    'day_view_cached': 0,
+    'stats_week': 2,
+    'stats_range': 2,
+    'dashboard': 4,
+    'dashboard_cached': 0,
+    'dish_list': 2,
+    'dish_create': 3,
+    'login': 5,
+    'subscription': 3,
+    'subscription_plans': 3,
+    'payment_history': 2,
+}
+
+
+def seed(users=1000, dishes_per_user=1000, days=365, batch_size=5000, prefix=USERNAME_PREFIX,
+         seed_value=42, end_date=None, stdout=None):
+    """
+    Создаёт пользователей с блюдами, целями на каждый день и подписками.
+
+    Данные детерминированы (seed_value). Запись идёт через bulk_create,
+    поэтому сигналы (инвалидация кэша дня) не срабатывают - для свежих
+    пользователей кэша ещё нет.
+
+    Returns:
+        dict с числом созданных объектов
+    """
+    from subscriptions.models import Payment, Subscription, SubscriptionPlan
+
+    User = get_user_model()
+    rng = random.Random(seed_value)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    password = make_password(PASSWORD)
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    plan, _ = SubscriptionPlan.objects.get_or_create(
+        name='Benchmark',
+        defaults={'price_monthly': Decimal('299.00'), 'price_yearly': Decimal('2990.00'), 'features': []},
+    )
+
+    existing = User.objects.filter(username__startswith=prefix).count()
+    created_users = User.objects.bulk_create(
+        [
+            User(username=f'{prefix}{index}', email=f'{prefix}{index}@bench.calorio.local', password=password)
+            for index in range(existing, existing + users)
+        ],
+        batch_size=batch_size,
+    )
+    log(f'Пользователи: {len(created_users)}')
+
+    counts = {'users': len(created_users), 'meals': 0, 'dishes': 0, 'goals': 0, 'subscriptions': 0, 'payments': 0}
+    now = timezone.now()
+
+    for user_index, user in enumerate(created_users):
+        goals = [
+            DailyGoal(
+                user=user, date=start_date + timedelta(days=offset),
+                calories=rng.randrange(1600, 3000, 50), proteins=Decimal(rng.randrange(60, 180)),
+                fats=Decimal(rng.randrange(40, 110)), carbohydrates=Decimal(rng.randrange(150, 380)),
+                is_auto_calculated=rng.random() < 0.5,
+            )
+            for offset in range(days)
+        ]
+        counts['goals'] += len(DailyGoal.objects.bulk_create(goals, batch_size=batch_size))
+
+        # Блюда равномерно по дням, приёмы пищи - по использованным (день, тип)
+        slots = [
+            (start_date + timedelta(days=index % days), MEAL_TYPES[(index // days) % len(MEAL_TYPES)])
+            for index in range(dishes_per_user)
+        ]
+        meals = Meal.objects.bulk_create(
+            [Meal(user=user, date=day, meal_type=meal_type) for day, meal_type in dict.fromkeys(slots)],
+            batch_size=batch_size,
+        )
+        meal_ids = {(meal.date, meal.meal_type): meal for meal in meals}
+        counts['meals'] += len(meals)
+
+        dishes = []
+        for slot in slots:
+            weight = rng.randrange(50, 500, 10)
+            dishes.append(Dish(
+                user=user, meal=meal_ids[slot], name=rng.choice(DISH_NAMES), weight=weight,
+                calories=weight * rng.randrange(50, 250) // 100,
+                proteins=Decimal(rng.randrange(0, 4000)) / 100,
+                fats=Decimal(rng.randrange(0, 3000)) / 100,
+                carbohydrates=Decimal(rng.randrange(0, 8000)) / 100,
+            ))
+            if len(dishes) >= batch_size:
+                counts['dishes'] += len(Dish.objects.bulk_create(dishes))
+                dishes = []
+        counts['dishes'] += len(Dish.objects.bulk_create(dishes))
+
+        # Каждый пятый - с активной подпиской и историей платежей
+        if user_index % 5 == 0:
+            subscription = Subscription.objects.create(
+                user=user, plan=plan, status='active',
+                start_date=now - timedelta(days=30), end_date=now + timedelta(days=335),
+            )
+            counts['subscriptions'] += 1
+            payments = Payment.objects.bulk_create([
+                Payment(
+                    user=user, subscription=subscription, plan=plan, amount=plan.price_monthly,
+                    payment_type='monthly', status='completed',
+                    transaction_id=f'{prefix}-{user.pk}-{month}',
+                )
+                for month in range(12)
+            ])
+            counts['payments'] += len(payments)
+
+        if (user_index + 1) % 100 == 0:
+            log(f'  {user_index + 1}/{len(created_users)} пользователей заполнено')
+
+    return counts
+
+
+def purge(prefix=USERNAME_PREFIX):
+    """Удаляет данные бенчмарка (каскадно вместе с блюдами и целями)"""
+    return get_user_model().objects.filter(username__startswith=prefix).delete()
+
+
+def percentile(values, p):
+    """Перцентиль методом ближайшего ранга (p от 0 до 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def scenarios(user, day_dates):
+    """
+    Запросы бенчмарка для пользователя.
+
+    Каждый сценарий - (имя, метод, функция итерации -> (path, data)).
+    day_view и dashboard перебирают разные даты (холодный кэш), *_cached -
+    одну и ту же (попадание в кэш ответов); stats_range - последние 30 дней.
+    """
+    first_day = day_dates[0].isoformat()
+
+    def day_path(iteration):
+        return f'/api/days/{day_dates[iteration % len(day_dates)].isoformat()}/', None
+
+    return [
+        ('day_view', 'get', day_path),
+        ('day_view_cached', 'get', lambda iteration: (f'/api/days/{first_day}/', None)),
+        ('stats_week', 'get', lambda iteration: (
+            f'/api/stats/week/{day_dates[iteration % len(day_dates)].isoformat()}/', None,
+        )),
+        ('stats_range', 'get', lambda iteration: (
+            f'/api/stats/?start={(day_dates[0] - timedelta(days=29)).isoformat()}&end={first_day}', None,
+        )),
+        ('dashboard', 'get', lambda iteration: (
+            f'/api/dashboard/?date={day_dates[iteration % len(day_dates)].isoformat()}', None,
+        )),
+        ('dashboard_cached', 'get', lambda iteration: (f'/api/dashboard/?date={first_day}', None)),
+        ('dish_list', 'get', lambda iteration: (f'/api/dishes/?date={first_day}', None)),
+        ('dish_create', 'post', lambda iteration: ('/api/dishes/', {
+            'name': 'Бенчмарк', 'weight': 100, 'calories': 120, 'proteins': '5.00',
+            'fats': '3.00', 'carbohydrates': '15.00', 'date': first_day,
+            'meal_type': MEAL_TYPES[iteration % len(MEAL_TYPES)],
+        })),
+        ('login', 'post', lambda iteration: ('/api/auth/login/', {'email': user.email, 'password': PASSWORD})),
+        ('subscription', 'get', lambda iteration: ('/api/subscription/', None)),
+        ('subscription_plans', 'get', lambda iteration: ('/api/subscription/plans/', None)),
+        ('payment_history', 'get', lambda iteration: ('/api/subscription/payments/', None)),
+    ]
+
+
+def run(client, user, day_dates, iterations=50, warmup=5, only=None, stdout=None):
+    """
+    Выполняет сценарии и собирает время и число SQL-запросов.
+
+    Returns:
+        dict {сценарий: {'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'queries_max',
+        'query_budget', 'status_codes'}}
+    """
+    results = {}
+    for name, method, request_for in scenarios(user, day_dates):
+        if only and name not in only:
+            continue
+        send = getattr(client, method)
+
+        for iteration in range(warmup):
+            path, data = request_for(iteration)
+            send(path, data, format='json') if data is not None else send(path)
+
+        timings = []
+        queries = []
+        status_codes = {}
+        for iteration in range(warmup, warmup + iterations):
+            path, data = request_for(iteration)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = send(path, data, format='json') if data is not None else send(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+        results[name] = {
+            'iterations': iterations,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries_max': max(queries),
+            'query_budget': QUERY_BUDGETS.get(name),
+            'status_codes': {str(code): count for code, count in sorted(status_codes.items())},
+        }
+        if stdout is not None:
+            result = results[name]
+            stdout.write(
+                f"{name:<20} p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+                f"p99={result['p99_ms']:>8.2f}ms queries={result['queries_max']} (budget {result['query_budget']})"
+            )
+    return results
+
+
+def sample_payloads(dishes_per_day=50, page_size=100, seed_value=42):
+    """
+    Типичные тела ответов без обращения к БД: день с dishes_per_day блюдами
+    (как DayDataView) и страница списка блюд (как DishViewSet).
+    """
+    from .serializers import DishSerializer
+
+    rng = random.Random(seed_value)
+    now = timezone.now()
+
+    def dishes(count):
+        items = []
+        for index in range(count):
+            weight = rng.randrange(50, 500, 10)
+            items.append(Dish(
+                pk=index + 1, name=rng.choice(DISH_NAMES), weight=weight,
+                calories=weight * rng.randrange(50, 250) // 100,
+                proteins=Decimal(rng.randrange(0, 4000)) / 100,
+                fats=Decimal(rng.randrange(0, 3000)) / 100,
+                carbohydrates=Decimal(rng.randrange(0, 8000)) / 100,
+                created_at=now, updated_at=now,
+            ))
+        return DishSerializer(items, many=True).data
+
+    day_dishes = dishes(dishes_per_day)
+    meals = {meal_type: [] for meal_type in MEAL_TYPES}
+    for index, dish in enumerate(day_dishes):
+        meals[MEAL_TYPES[index % len(MEAL_TYPES)]].append(dish)
+    day = {
+        'date': now.date().isoformat(),
+        'goal': {'date': now.date().isoformat(), 'calories': 2200, 'proteins': '120.00', 'fats': '70.00',
+                 'carbohydrates': '250.00', 'is_auto_calculated': False},
+        'meals': meals,
+        'summary': {
+            'total_calories': sum(dish['calories'] for dish in day_dishes),
+            'total_proteins': sum(float(dish['proteins']) for dish in day_dishes),
+            'total_fats': sum(float(dish['fats']) for dish in day_dishes),
+            'total_carbohydrates': sum(float(dish['carbohydrates']) for dish in day_dishes),
+            'goal_progress': {'calories_percent': 81.5, 'proteins_percent': 64.25,
+                              'fats_percent': 90.0, 'carbohydrates_percent': 77.75},
+        },
+    }
+    page = {'count': page_size * 10, 'next': 'http://testserver/api/dishes/?page=2', 'previous': None,
+            'results': dishes(page_size)}
+    return {f'day_{dishes_per_day}_dishes': day, f'dish_page_{page_size}': page}
+
+
+def _timed_runs(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _speedup(baseline_ms, fast_ms):
+    return round(baseline_ms / fast_ms, 2) if fast_ms else None
+
+
+def run_render(iterations=500, stdout=None):
+    """
+    Сравнивает стандартные JSONRenderer/JSONParser DRF и FastJSONRenderer/FastJSONParser;
+    при установленном msgpack - также время и размер MessagePack.
+
+    Returns:
+        dict {нагрузка: {'render_ms', 'fast_render_ms', 'render_speedup', 'parse_ms', ...}}
+        (медианы на одну операцию)
+    """
+    import io
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from .parsers import FastJSONParser, MessagePackParser
+    from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+    results = {}
+    for name, payload in sample_payloads().items():
+        body = JSONRenderer().render(payload)
+        measured = {
+            'render_ms': _timed_runs(lambda: JSONRenderer().render(payload), iterations),
+            'fast_render_ms': _timed_runs(lambda: FastJSONRenderer().render(payload), iterations),
+            'parse_ms': _timed_runs(lambda: JSONParser().parse(io.BytesIO(body)), iterations),
+            'fast_parse_ms': _timed_runs(lambda: FastJSONParser().parse(io.BytesIO(body)), iterations),
+        }
+        if msgpack is not None:
+            packed = MessagePackRenderer().render(payload)
+            measured['msgpack_render_ms'] = _timed_runs(lambda: MessagePackRenderer().render(payload), iterations)
+            measured['msgpack_parse_ms'] = _timed_runs(
+                lambda: MessagePackParser().parse(io.BytesIO(packed)), iterations
+            )
+        result = {key: round(percentile(values, 50), 4) for key, values in measured.items()}
+        result['bytes'] = len(body)
+        result['render_speedup'] = _speedup(result['render_ms'], result['fast_render_ms'])
+        result['parse_speedup'] = _speedup(result['parse_ms'], result['fast_parse_ms'])
+        if msgpack is not None:
+            result['msgpack_bytes'] = len(packed)
+        results[name] = result
+        if stdout is not None:
+            stdout.write(
+                f"{name:<20} render {result['render_ms']:.3f} -> {result['fast_render_ms']:.3f}ms "
+                f"(x{result['render_speedup']}), parse {result['parse_ms']:.3f} -> {result['fast_parse_ms']:.3f}ms "
+                f"(x{result['parse_speedup']}), {result['bytes']} байт"
+            )
+            if msgpack is not None:
+                stdout.write(
+                    f"{'':<20} msgpack render {result['msgpack_render_ms']:.3f}ms, "
+                    f"parse {result['msgpack_parse_ms']:.3f}ms, {result['msgpack_bytes']} байт"
+                )
+    return results
+
+
+def run_serialization(sizes=(50, 100), iterations=200, seed_value=42, stdout=None):
+    """
+    Сравнивает DishSerializer(many=True).data и dish_rows() на одних и тех же
+    данных в памяти (без БД): время сборки строк ответа.
+
+    Returns:
+        dict {'dishes_<N>': {'serializer_ms', 'rows_ms', 'speedup'}} (медианы)
+    """
+    from .fields import to_centigrams
+    from .serializers import DishSerializer, dish_rows
+
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    results = {}
+    for size in sizes:
+        meals = [Meal(pk=index + 1, date=now.date(), meal_type=meal_type) for index, meal_type in enumerate(MEAL_TYPES)]
+        dishes = []
+        for index in range(size):
+            weight = rng.randrange(50, 500, 10)
+            dishes.append(Dish(
+                pk=index + 1, meal=meals[index % len(meals)], name=rng.choice(DISH_NAMES), weight=weight,
+                calories=weight * rng.randrange(50, 250) // 100,
+                proteins=Decimal(rng.randrange(0, 4000)) / 100, fats=Decimal(rng.randrange(0, 3000)) / 100,
+                carbohydrates=Decimal(rng.randrange(0, 8000)) / 100, created_at=now, updated_at=now,
+            ))
+        values = [
+            (dish.pk, dish.name, dish.weight, dish.calories, to_centigrams(dish.proteins), to_centigrams(dish.fats),
+             to_centigrams(dish.carbohydrates), dish.created_at, dish.updated_at, dish.meal.date, dish.meal.meal_type)
+            for dish in dishes
+        ]
+        serializer_ms = percentile(_timed_runs(lambda: DishSerializer(dishes, many=True).data, iterations), 50)
+        rows_ms = percentile(_timed_runs(lambda: dish_rows(values), iterations), 50)
+        name = f'dishes_{size}'
+        results[name] = {
+            'serializer_ms': round(serializer_ms, 4),
+            'rows_ms': round(rows_ms, 4),
+            'speedup': round(serializer_ms / rows_ms, 2) if rows_ms else None,
+        }
+        if stdout is not None:
+            stdout.write(
+                f"{name:<20} DishSerializer {serializer_ms:.3f}ms -> dish_rows {rows_ms:.3f}ms "
+                f"(x{results[name]['speedup']})"
+            )
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,167 @@
+"""
+Слой кэширования поверх django.core.cache
+
+Все обращения к кэшу в проекте идут через get_cache(namespace):
+- ключи автоматически получают префикс пространства имён;
+- get_or_set защищён от "stampede" (значение вычисляет один процесс,
+  остальные ждут результата);
+- для каждого семейства ключей считаются попадания и промахи (stats()).
+
+Бэкенд задаётся в settings.CACHES: в production это общий Redis
+(REDIS_URL), локально и в тестах - LocMem или файловый кэш.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def _record(name, hit):
+    with _stats_lock:
+        _stats[name]['hits' if hit else 'misses'] += 1
+
+
+def stats():
+    """
+    Статистика попаданий по семействам ключей текущего процесса.
+
+    Returns:
+        dict вида {'day:response': {'hits': 10, 'misses': 2, 'hit_ratio': 0.83}, ...}
+    """
+    with _stats_lock:
+        snapshot = {name: dict(values) for name, values in _stats.items()}
+    for values in snapshot.values():
+        total = values['hits'] + values['misses']
+        values['hit_ratio'] = round(values['hits'] / total, 4) if total else 0.0
+    return snapshot
+
+
+def reset_stats():
+    """Сбрасывает статистику (используется в тестах)"""
+    with _stats_lock:
+        _stats.clear()
+
+
+class NamespacedCache:
+    """
+    Кэш с пространством имён поверх одного из бэкендов settings.CACHES.
+
+    Семейство ключа для статистики - часть ключа до первого двоеточия:
+    get('response:42:...') учитывается как '<namespace>:response'.
+    """
+
+    def __init__(self, namespace, alias='default'):
+        self.namespace = namespace
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def _family(self, key):
+        return f'{self.namespace}:{str(key).split(":", 1)[0]}'
+
+    def get(self, key, default=None):
+        value = self.backend.get(self.make_key(key), _MISSING)
+        _record(self._family(key), value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys):
+        found = self.backend.get_many([self.make_key(key) for key in keys])
+        result = {}
+        for key in keys:
+            full_key = self.make_key(key)
+            _record(self._family(key), full_key in found)
+            if full_key in found:
+                result[key] = found[full_key]
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.backend.set(self.make_key(key), value, timeout)
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        self.backend.set_many({self.make_key(key): value for key, value in mapping.items()}, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return self.backend.add(self.make_key(key), value, timeout)
+
+    def delete(self, key):
+        return self.backend.delete(self.make_key(key))
+
+    def delete_many(self, keys):
+        self.backend.delete_many([self.make_key(key) for key in keys])
+
+    def incr(self, key, delta=1):
+        """Атомарное увеличение (в Redis - INCRBY). ValueError, если ключа нет"""
+        return self.backend.incr(self.make_key(key), delta)
+
+    def decr(self, key, delta=1):
+        return self.backend.decr(self.make_key(key), delta)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT):
+        return self.backend.touch(self.make_key(key), timeout)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, lock_timeout=10, wait_timeout=5.0):
+        """
+        Возвращает значение из кэша или вычисляет его, защищая от stampede.
+
+        Вычисляет значение только процесс, захвативший блокировку (cache.add);
+        остальные опрашивают кэш до wait_timeout секунд и лишь потом
+        вычисляют значение сами.
+
+        Args:
+            key: ключ внутри пространства имён
+            default: значение или callable без аргументов
+            timeout: TTL значения
+            lock_timeout: TTL блокировки (на случай падения вычисляющего процесса)
+            wait_timeout: сколько ждать чужого вычисления
+        """
+        full_key = self.make_key(key)
+        value = self.backend.get(full_key, _MISSING)
+        _record(self._family(key), value is not _MISSING)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f'{full_key}:lock'
+        if self.backend.add(lock_key, 1, lock_timeout):
+            try:
+                value = default() if callable(default) else default
+                self.backend.set(full_key, value, timeout)
+            finally:
+                self.backend.delete(lock_key)
+            return value
+
+        deadline = time.monotonic() + wait_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            value = self.backend.get(full_key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+        value = default() if callable(default) else default
+        self.backend.set(full_key, value, timeout)
+        return value
+
+
+def get_cache(namespace, alias='default'):
+    """Возвращает (и переиспользует) NamespacedCache для пространства имён"""
+    instance = _instances.get((namespace, alias))
+    if instance is None:
+        with _instances_lock:
+            instance = _instances.setdefault((namespace, alias), NamespacedCache(namespace, alias))
+    return instance
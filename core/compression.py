@@ -0,0 +1,201 @@
+"""
+Сжатие ответов API (Content-Encoding: zstd / br / gzip)
+
+Кодировка выбирается по Accept-Encoding клиента (q-значения, при равенстве -
+порядок COMPRESSION_ENCODINGS). Сжимаются только ответы сжимаемых типов
+(JSON, MessagePack, текст) не меньше COMPRESSION_MIN_SIZE байт.
+
+Ответ может принести уже сжатые варианты тела: атрибут precompressed
+({кодировка: байты}) и, по желанию, store_compressed(кодировка, байты) -
+куда сохранить вариант, сжатый middleware. Так кэш ответов за день
+(core.response_cache) хранит сжатое тело рядом с исходным, и попадание
+в кэш отдаёт готовые байты без повторного сжатия.
+"""
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli указан в requirements
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard указан в requirements
+    zstandard = None
+
+# Уровни подобраны для динамических ответов: почти та же степень сжатия,
+# что и на максимуме, за доли миллисекунды на десятки КБ
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/msgpack',
+    'application/vnd.oai.openapi',
+    'application/javascript',
+    'text/',
+)
+
+
+def _zstd_compress(content):
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(content)
+
+
+def _brotli_compress(content):
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+def _gzip_compress(content):
+    # mtime=0: одинаковое тело даёт одинаковые байты
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+COMPRESSORS = {
+    'zstd': _zstd_compress if zstandard is not None else None,
+    'br': _brotli_compress if brotli is not None else None,
+    'gzip': _gzip_compress,
+}
+
+
+def available_encodings():
+    """Кодировки из COMPRESSION_ENCODINGS, для которых установлены библиотеки (в порядке предпочтения)"""
+    configured = getattr(settings, 'COMPRESSION_ENCODINGS', ('zstd', 'br', 'gzip'))
+    return [coding for coding in configured if COMPRESSORS.get(coding) is not None]
+
+
+def _parse_accept_encoding(header):
+    """{кодировка: q} из заголовка Accept-Encoding"""
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def negotiate(accept_encoding):
+    """
+    Выбирает кодировку для ответа.
+
+    Args:
+        accept_encoding: значение заголовка Accept-Encoding
+
+    Returns:
+        str кодировки или None (отдавать без сжатия)
+    """
+    if not accept_encoding:
+        return None
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in available_encodings():
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(content, coding):
+    """Сжимает тело выбранной кодировкой"""
+    return COMPRESSORS[coding](content)
+
+
+def _min_size():
+    return getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def is_compressible(response):
+    """Ответ можно сжимать: не потоковый, не сжат, сжимаемого типа и размера"""
+    if response.streaming or response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').lower()
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return len(response.content) >= _min_size()
+
+
+def encode_for(request, response):
+    """
+    Сжатый вариант тела для запроса: (кодировка, байты) или None.
+
+    Используется и middleware, и кэшем ответов, чтобы сжать тело один раз
+    при сохранении записи.
+    """
+    if not getattr(settings, 'COMPRESSION_ENABLED', True) or not is_compressible(response):
+        return None
+    django_request = getattr(request, '_request', request)
+    coding = negotiate(django_request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if coding is None:
+        return None
+    return coding, compress(response.content, coding)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов по Accept-Encoding (замена django GZipMiddleware с brotli и zstd).
+
+    Ставится сразу после метрик и профилирования, чтобы время сжатия входило
+    в длительность запроса. При COMPRESSION_ENABLED=False исключается из цепочки.
+    Поддерживает синхронную и асинхронную (ASGI) цепочку.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        variants = getattr(response, 'precompressed', None) or {}
+        body = variants.get(coding)
+        if body is None:
+            body = compress(response.content, coding)
+            store = getattr(response, 'store_compressed', None)
+            if store is not None:
+                store(coding, body)
+        if len(body) >= len(response.content):
+            return response
+
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = coding
+        # Сжатое тело отличается побайтно: сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,132 @@
+"""
+Условные GET-запросы (ETag)
+
+Валидаторы считаются дешёвыми запросами (max(updated_at) + count) без
+сериализации ответа. Если клиент прислал If-None-Match и данные не
+изменились, view возвращает 304 до обращения к сериализаторам.
+
+Last-Modified не отдаётся: ресурсы составные, и max(updated_at) оставшихся
+строк не растёт при удалении блюда, шаблона или плана, при смене email и при
+двух правках за одну секунду. Клиент с одним If-Modified-Since получал бы
+устаревший 304.
+"""
+import hashlib
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .goal_schedule import get_schedule
+
+
+def make_etag(*parts):
+    """Собирает слабый ETag из произвольных частей (id, даты, счётчики)"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    digest = hashlib.blake2b(raw.encode('utf-8'), digest_size=12).hexdigest()
+    return f'W/{quote_etag(digest)}'
+
+
+def not_modified_response(request, etag=None):
+    """
+    Возвращает HttpResponseNotModified, если клиентская копия актуальна, иначе None.
+
+    Args:
+        request: DRF Request или Django HttpRequest
+        etag: значение ETag (из make_etag)
+    """
+    if request.method not in ('GET', 'HEAD') or not etag:
+        return None
+    django_request = getattr(request, '_request', request)
+    response = get_conditional_response(django_request, etag=etag)
+    if response is not None and response.status_code == 304:
+        # 304 должен повторять валидатор, чтобы клиент обновил свою копию
+        response['ETag'] = etag
+    return response
+
+
+def set_validators(response, etag=None, private=True):
+    """Проставляет ETag в ответ (только для успешных ответов)"""
+    if response.status_code != 200:
+        return response
+    if etag:
+        response['ETag'] = etag
+    if private:
+        # Ответ зависит от пользователя: разрешаем хранить только клиенту
+        # и требуем ревалидацию при каждом обращении
+        patch_cache_control(response, private=True, no_cache=True)
+    # Один ресурс отдаётся в JSON и MessagePack - копии хранятся по Accept
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def day_validators(user, date_obj):
+    """
+    Валидаторы для данных за день: один запрос с подзапросами по блюдам и цели.
+
+    Количество блюд входит в ETag, чтобы удаление блюда тоже меняло валидатор.
+
+    Returns:
+        ETag или None
+    """
+    from django.contrib.auth import get_user_model
+    from .models import DailyGoal, Dish
+
+    dishes = Dish.objects.filter(meal__user=user, meal__date=date_obj).order_by().values('meal__user')
+    row = get_user_model().objects.filter(pk=user.pk).annotate(
+        dishes_last=Subquery(dishes.annotate(last=Max('updated_at')).values('last')[:1]),
+        dishes_count=Coalesce(
+            Subquery(dishes.annotate(cnt=Count('id')).values('cnt')[:1], output_field=IntegerField()),
+            0,
+        ),
+        goal_updated=Subquery(
+            DailyGoal.objects.filter(user=OuterRef('pk'), date=date_obj).values('updated_at')[:1]
+        ),
+    ).values('dishes_last', 'dishes_count', 'goal_updated').first()
+
+    if row is None:
+        return None
+
+    # Без явной цели на день действует шаблон (из кэша шаблонов, без запроса)
+    goal_updated = row['goal_updated']
+    template_version = ''
+    if goal_updated is None:
+        template = get_schedule(user.pk).template_for(date_obj)
+        if template is not None:
+            effective_from, weekday, values = template
+            goal_updated = values[-1]
+            template_version = f'{effective_from.isoformat()}:{weekday}'
+
+    return make_etag(
+        'day', user.pk, date_obj,
+        row['dishes_count'],
+        row['dishes_last'].isoformat() if row['dishes_last'] else '',
+        goal_updated.isoformat() if goal_updated else '',
+        template_version,
+    )
+
+
+def goal_validators(user, date_obj):
+    """ETag цели на день (явной или из шаблона) или None"""
+    from .models import DailyGoal
+
+    row = DailyGoal.objects.filter(user=user, date=date_obj).values_list('id', 'updated_at').first()
+    if row is None:
+        template = get_schedule(user.pk).template_for(date_obj)
+        if template is None:
+            return None
+        effective_from, weekday, values = template
+        return make_etag('goal-template', user.pk, date_obj, effective_from.isoformat(), weekday, values[-1].isoformat())
+    goal_id, updated_at = row
+    return make_etag('goal', user.pk, goal_id, updated_at.isoformat())
+
+
+def queryset_validators(prefix, queryset, *extra):
+    """
+    ETag списка: max(updated_at) и количество строк одним агрегатом.
+
+    Returns:
+        ETag
+    """
+    stats = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('id'))
+    return make_etag(prefix, *extra, stats['count'], stats['last'].isoformat() if stats['last'] else '')
@@ -0,0 +1,153 @@
+"""
+Маршрутизация чтения на реплику БД
+
+Чтение идёт на реплику (алиас 'replica') только внутри read-only view,
+отмеченных ReadReplicaMixin, и только для безопасных методов. Всё остальное,
+включая запись, - на основную БД.
+
+Read-your-writes: при записи пользователь на DATABASE_REPLICA_PIN_SECONDS
+закрепляется за основной БД (метка в общем кэше), чтобы не увидеть собственные
+данные с задержкой репликации. Метка ставится в момент записи, до смены версии
+кэша ответов за день (core.response_cache.bump_*): иначе параллельный GET того же
+пользователя прочитал бы отстающую реплику и закэшировал её данные под новой
+версией. ReplicaPinMiddleware дополнительно закрепляет пользователя после
+остальных успешных изменяющих запросов.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import get_cache
+
+REPLICA_ALIAS = 'replica'
+
+_use_replica = ContextVar('calorio_use_replica', default=False)
+
+cache = get_cache('db')
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.databases
+
+
+def reading_from_replica():
+    """Разрешено ли сейчас читать с реплики (для тестов и диагностики)"""
+    return _use_replica.get()
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Чтение с реплики внутри блока"""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _pin_timeout():
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10)
+
+
+def _pin_key(user_id):
+    return f'pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Закрепляет пользователя за основной БД (без реплики - ничего не делает)"""
+    if user_id is not None and _pin_timeout() > 0 and replica_configured():
+        cache.set(_pin_key(user_id), 1, _pin_timeout())
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(_pin_key(user_id)) is not None
+
+
+class ReplicaRouter:
+    """Router Django: чтение с реплики внутри use_replica(), остальное - default"""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной БД, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит с репликацией
+        return db != REPLICA_ALIAS
+
+
+class ReadReplicaMixin:
+    """
+    Mixin для read-only DRF view: GET/HEAD/OPTIONS читают с реплики.
+
+    Флаг ставится после аутентификации (нужен пользователь для проверки
+    read-your-writes) и снимается в finalize_response.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        if request.method in SAFE_METHODS and replica_configured() and not is_pinned(user_id):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """
+    После успешного изменяющего запроса закрепляет пользователя за основной БД.
+
+    Записи данных за день закрепляют пользователя ещё до ответа (см. модуль);
+    здесь покрываются остальные изменения. Пользователь берётся из request.user
+    уже после view: DRF выставляет его и в исходный HttpRequest при
+    JWT-аутентификации. В асинхронной цепочке (ASGI) обращение к пользователю
+    и кэшу выполняется в потоке.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._is_write(request, response):
+            self._pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._is_write(request, response):
+            await sync_to_async(self._pin)(request)
+        return response
+
+    @staticmethod
+    def _is_write(request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
+
+    @staticmethod
+    def _pin(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
@@ -49,6 +49,16 @@ def mask_sensitive_data(data):
     return masked_data
 
 
+def _record_rejection(exc, context):
+    """Учитывает отказ throttling или квоты в метриках"""
+    from .exceptions import QuotaExceededException
+    from .metrics import REJECTIONS
+    
+    view = context.get('view')
+    reason = 'quota' if isinstance(exc, QuotaExceededException) else 'throttle'
+    REJECTIONS.inc(reason=reason, view=view.__class__.__name__ if view is not None else 'unknown')
+
+
 def custom_exception_handler(exc, context):
     """
     Кастомный обработчик исключений для REST API
@@ -60,6 +70,9 @@ def custom_exception_handler(exc, context):
     
     # Если стандартный обработчик вернул ответ, используем его
     if response is not None:
+        if response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            _record_rejection(exc, context)
+        
         # Маскируем чувствительные данные перед логированием
         safe_data = mask_sensitive_data(response.data) if hasattr(response, 'data') else None
         
@@ -32,3 +32,15 @@ class PaymentProviderException(APIException):
     default_detail = 'Ошибка при обработке платежа. Попробуйте позже.'
     default_code = 'payment_provider_error'
 
+
+class QuotaExceededException(APIException):
+    """Исключение для исчерпанной квоты тарифного плана"""
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    default_detail = 'Исчерпан лимит запросов по вашему тарифу. Попробуйте позже.'
+    default_code = 'quota_exceeded'
+
+    def __init__(self, quota_status=None, detail=None, code=None):
+        super().__init__(detail, code)
+        self.quota_status = quota_status
+        # DRF выставит заголовок Retry-After по атрибуту wait
+        self.wait = quota_status.retry_after() if quota_status is not None else None
@@ -0,0 +1,78 @@
+"""
+Хранение БЖУ в целых сантиграммах (1 г = 100 сг)
+
+В базе белки, жиры и углеводы - целые числа, поэтому суммы в SQL
+(Sum) и в Python - целочисленные, без Decimal. Снаружи модели значение
+по-прежнему в граммах: атрибут и результат Sum() - Decimal с двумя знаками,
+фильтры (proteins__gte=10) и присваивания принимают граммы. Горячие пути
+чтения берут сырые сантиграммы через centigrams() и форматируют их без Decimal
+(format_centigrams).
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+from django.db.models import ExpressionWrapper, F
+
+CENTIGRAMS_PER_GRAM = 100
+
+
+def to_centigrams(value):
+    """Граммы (Decimal, int, float, строка) -> целые сантиграммы с округлением до 0.01 г"""
+    if isinstance(value, int):
+        return value * CENTIGRAMS_PER_GRAM
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * CENTIGRAMS_PER_GRAM).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def format_centigrams(value):
+    """Сантиграммы -> строка граммов с двумя знаками, как DecimalField DRF ('12.50')"""
+    if value < 0:
+        return '-' + format_centigrams(-value)
+    return '%d.%02d' % divmod(value, CENTIGRAMS_PER_GRAM)
+
+
+def centigrams(field_name):
+    """
+    Значение поля в сантиграммах (int) для values_list()/annotate()
+
+    Обходит преобразование в Decimal: столбец читается как есть.
+    """
+    return ExpressionWrapper(F(field_name), output_field=models.IntegerField())
+
+
+class CentigramField(models.IntegerField):
+    """Масса в граммах с точностью 0.01 г, хранится целым числом сантиграммов"""
+    description = 'Масса в граммах (хранится в сантиграммах)'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(value).scaleb(-2)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal) and value.as_tuple().exponent == -2:
+            return value
+        try:
+            return Decimal(to_centigrams(value)).scaleb(-2)
+        except (InvalidOperation, TypeError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        try:
+            return to_centigrams(value)
+        except (InvalidOperation, TypeError, ValueError) as e:
+            raise e.__class__(f"Поле '{self.name}' ожидает массу в граммах, получено {value!r}") from e
+
+    def formfield(self, **kwargs):
+        return super(models.IntegerField, self).formfield(**{
+            'form_class': forms.DecimalField,
+            'decimal_places': 2,
+            **kwargs,
+        })
@@ -0,0 +1,302 @@
+"""
+Цели КБЖУ по дням: шаблоны целей и явные цели на день
+
+Шаблоны пользователя (GoalTemplate) образуют версии: каждая действует с
+effective_from до начала следующей (строка с effective_to - не дольше этой
+даты). Даты начала версий хранятся
+отсортированными, версия для дня находится bisect'ом за O(log n), внутри
+версии - словарь {день недели или None: цели}. Строк шаблонов у
+пользователя единицы, поэтому структура кэшируется целиком на пользователя
+и сбрасывается при записи шаблона (core.signals). Явная цель на день
+(DailyGoal) остаётся переопределением и важнее шаблона.
+
+Цели из шаблона отдаются в формате строк GOAL_ROW_FIELDS (с id=None), так
+что данные за день и статистика обрабатывают их так же, как строки DailyGoal.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import get_cache
+from .fields import centigrams
+from .response_cache import bump_day_version, bump_goals_version
+
+cache = get_cache('goals')
+
+SCHEDULE_TIMEOUT = 24 * 60 * 60
+
+# Даты начала и окончания, день недели, дальше - как в GOAL_ROW_FIELDS после id и date
+TEMPLATE_FIELDS = (
+    'effective_from', 'effective_to', 'weekday', 'calories',
+    centigrams('proteins'), centigrams('fats'), centigrams('carbohydrates'),
+    'is_auto_calculated', 'created_at', 'updated_at',
+)
+
+
+class GoalSchedule:
+    """Версии шаблонов целей пользователя"""
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows: кортежи TEMPLATE_FIELDS, упорядоченные по effective_from
+        """
+        self.starts = []
+        self.versions = []
+        for effective_from, effective_to, weekday, *values in rows:
+            if not self.starts or self.starts[-1] != effective_from:
+                self.starts.append(effective_from)
+                self.versions.append({})
+            self.versions[-1][weekday] = (effective_to, tuple(values))
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def template_for(self, day):
+        """
+        Шаблон, действующий в день day.
+
+        Returns:
+            tuple (effective_from, weekday, values) или None; values - поля
+            TEMPLATE_FIELDS после дня недели
+        """
+        index = bisect_right(self.starts, day) - 1
+        if index < 0:
+            return None
+        version = self.versions[index]
+        for weekday in (day.weekday(), None):
+            if weekday in version:
+                effective_to, values = version[weekday]
+                if effective_to is None or day <= effective_to:
+                    return self.starts[index], weekday, values
+        return None
+
+    def goal_row(self, day):
+        """Цель из шаблона в формате GOAL_ROW_FIELDS (id=None - строки в базе нет) или None"""
+        template = self.template_for(day)
+        return None if template is None else (None, day, *template[2])
+
+    def resolve(self, start, end, overrides=()):
+        """
+        Цели на дни start..end в формате GOAL_ROW_FIELDS.
+
+        Args:
+            overrides: строки GOAL_ROW_FIELDS явных целей (DailyGoal) из этого диапазона
+        """
+        explicit = {row[1]: row for row in overrides}
+        rows = []
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            row = explicit.get(day) or self.goal_row(day)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+
+def _schedule_key(user_id):
+    return f'schedule:{user_id}'
+
+
+def get_schedule(user_id):
+    """Шаблоны целей пользователя (из кэша; при промахе - один запрос)"""
+    from .models import GoalTemplate
+
+    rows = cache.get(_schedule_key(user_id))
+    if rows is None:
+        rows = list(
+            GoalTemplate.objects.filter(user_id=user_id)
+            .order_by('effective_from')
+            .values_list(*TEMPLATE_FIELDS)
+        )
+        cache.set(_schedule_key(user_id), rows, SCHEDULE_TIMEOUT)
+    return GoalSchedule(rows)
+
+
+def invalidate_schedule(user_id):
+    """
+    Сбрасывает кэш шаблонов пользователя.
+
+    Внутри транзакции - ещё раз после коммита, чтобы параллельный запрос
+    не закэшировал незакоммиченное состояние (как bump_day_version).
+    """
+    cache.delete(_schedule_key(user_id))
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(_schedule_key(user_id)))
+
+
+def _blocks(rows):
+    """Отрезки строк без пропущенных дней (строки упорядочены по дате)"""
+    block = []
+    for row in rows:
+        if block and (row[1] - block[-1][1]).days != 1:
+            yield block
+            block = []
+        block.append(row)
+    if block:
+        yield block
+
+
+def _compact_block(user_id, rows, min_run):
+    """
+    Шаблоны из серий подряд идущих дней с одинаковыми целями.
+
+    Returns:
+        tuple (несохранённые GoalTemplate, id строк DailyGoal, которые они заменяют)
+    """
+    from .models import GoalTemplate
+
+    runs = []
+    for row in rows:
+        if runs and runs[-1][0] == row[2:]:
+            runs[-1][1].append(row)
+        else:
+            runs.append((row[2:], [row]))
+
+    templates = []
+    redundant = []
+    current = None
+    for values, run in runs:
+        if values == current:
+            redundant.extend(row[0] for row in run)
+        elif len(run) >= min_run:
+            calories, proteins, fats, carbohydrates, is_auto_calculated = values
+            templates.append(GoalTemplate(
+                user_id=user_id,
+                effective_from=run[0][1],
+                calories=calories,
+                proteins=Decimal(proteins).scaleb(-2),
+                fats=Decimal(fats).scaleb(-2),
+                carbohydrates=Decimal(carbohydrates).scaleb(-2),
+                is_auto_calculated=is_auto_calculated,
+            ))
+            current = values
+            redundant.extend(row[0] for row in run)
+    return templates, redundant
+
+
+def compact_goals(user_id, min_run=3, dry_run=False):
+    """
+    Переносит историю целей пользователя из DailyGoal в шаблоны.
+
+    История делится на непрерывные (без пропущенных дней) отрезки явных
+    целей. В каждом отрезке серии из min_run и более дней с одинаковыми
+    целями становятся шаблонами, совпадающие с действующим шаблоном строки
+    удаляются, короткие отличающиеся серии остаются явными целями. Последний
+    шаблон отрезка закрывается его последним днём (effective_to), поэтому
+    цели не меняются ни в отрезках, ни в пропусках между ними, ни после
+    истории. Пользователи, у которых уже есть шаблоны, пропускаются.
+
+    Returns:
+        tuple (создано шаблонов, удалено строк DailyGoal)
+    """
+    from .models import DailyGoal, GoalTemplate
+
+    if GoalTemplate.objects.filter(user_id=user_id).exists():
+        return 0, 0
+
+    rows = list(
+        DailyGoal.objects.filter(user_id=user_id).order_by('date').values_list(
+            'id', 'date', 'calories',
+            centigrams('proteins'), centigrams('fats'), centigrams('carbohydrates'),
+            'is_auto_calculated',
+        )
+    )
+    if not rows:
+        return 0, 0
+
+    templates = []
+    redundant = []
+    for block in _blocks(rows):
+        block_templates, block_redundant = _compact_block(user_id, block, min_run)
+        if block_templates:
+            # Дни после отрезка остаются без целей, как и до переноса
+            block_templates[-1].effective_to = block[-1][1]
+        templates.extend(block_templates)
+        redundant.extend(block_redundant)
+
+    if not dry_run and templates:
+        with transaction.atomic():
+            GoalTemplate.objects.bulk_create(templates)
+            for index in range(0, len(redundant), 500):
+                DailyGoal.objects.filter(pk__in=redundant[index:index + 500]).delete()
+            # bulk_create не отправляет post_save - сбрасываем кэши сами
+            invalidate_schedule(user_id)
+            bump_goals_version(user_id)
+    return len(templates), len(redundant)
+
+
+def recalculate_auto_goals(user_id, values, start):
+    """
+    Пересчёт автоматических целей пользователя с даты start.
+
+    Явные цели на день с is_auto_calculated=True обновляются одним UPDATE,
+    автоматические шаблоны с effective_from >= start - ещё одним. Если в
+    версии шаблонов, действующей на start, есть автоматические строки, с
+    start начинается её копия с новыми значениями: цели прошлых дней не
+    меняются. Ручные цели не трогаются.
+
+    Args:
+        values: (calories, proteins, fats, carbohydrates) - ккал и граммы
+        start: первый пересчитываемый день
+
+    Returns:
+        число обновлённых целей на день
+    """
+    from .models import DailyGoal, GoalTemplate
+
+    calories, proteins, fats, carbohydrates = values
+    fields = {
+        'calories': calories,
+        'proteins': proteins,
+        'fats': fats,
+        'carbohydrates': carbohydrates,
+        'updated_at': timezone.now(),
+    }
+    with transaction.atomic():
+        goals = DailyGoal.objects.filter(user_id=user_id, date__gte=start, is_auto_calculated=True)
+        dates = list(goals.values_list('date', flat=True))
+        updated = goals.update(**fields) if dates else 0
+
+        templates_changed = GoalTemplate.objects.filter(
+            user_id=user_id, effective_from__gte=start, is_auto_calculated=True,
+        ).update(**fields)
+
+        current_from = (
+            GoalTemplate.objects.filter(user_id=user_id, effective_from__lte=start)
+            .order_by('-effective_from').values_list('effective_from', flat=True).first()
+        )
+        if current_from is not None and current_from < start:
+            # Строки версии, закрытые до start, на start уже не действуют
+            version = list(
+                GoalTemplate.objects.filter(user_id=user_id, effective_from=current_from)
+                .exclude(effective_to__lt=start)
+            )
+            if any(template.is_auto_calculated for template in version):
+                copies = []
+                for template in version:
+                    copy = GoalTemplate(
+                        user_id=user_id,
+                        effective_from=start,
+                        effective_to=template.effective_to,
+                        weekday=template.weekday,
+                        calories=template.calories,
+                        proteins=template.proteins,
+                        fats=template.fats,
+                        carbohydrates=template.carbohydrates,
+                        is_auto_calculated=template.is_auto_calculated,
+                    )
+                    if template.is_auto_calculated:
+                        copy.calories, copy.proteins, copy.fats, copy.carbohydrates = values
+                    copies.append(copy)
+                templates_changed += len(GoalTemplate.objects.bulk_create(copies))
+
+        # UPDATE и bulk_create не отправляют сигналы - инвалидируем сами
+        for day in dates:
+            bump_day_version(user_id, day)
+        if templates_changed:
+            invalidate_schedule(user_id)
+            bump_goals_version(user_id)
+    return updated
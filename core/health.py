@@ -3,9 +3,10 @@ Health check views для мониторинга состояния прилож
 """
 from django.http import JsonResponse
 from django.db import connection
-from django.core.cache import cache
 import logging
 
+from .cache import get_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,6 +35,7 @@ def health_check(request):
     
     # Проверка кэша
     try:
+        cache = get_cache('health')
         cache.set('health_check', 'ok', 10)
         cache_value = cache.get('health_check')
         if cache_value == 'ok':
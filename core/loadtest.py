@@ -0,0 +1,180 @@
+"""
+Нагрузочный тест: воспроизведение пользовательских сессий по HTTP
+
+Сессия: логин -> день -> добавление блюд -> поиск КБЖУ -> распознавание
+фото -> статистика за неделю (уже с добавленными блюдами). Сессии
+выполняются параллельно в потоках против запущенного стенда
+(gunicorn/uvicorn); OpenRouter заменяется заглушкой (core.openrouter_stub).
+Пользователи - из seed_benchmark (bench<N>@bench.calorio.local).
+"""
+import base64
+import io
+import itertools
+import random
+import threading
+import time
+from datetime import date
+
+from .benchmarks import MEAL_TYPES, PASSWORD, USERNAME_PREFIX, percentile
+
+# Названия, которых нет в локальной базе: поиск уходит в OpenRouter (заглушку)
+SEARCH_NAMES = ['Плов по-узбекски', 'Лазанья домашняя', 'Сырники со сметаной', 'Том ям', 'Шакшука', 'Рамен']
+
+STEPS = ['login', 'day_view', 'dish_create', 'food_search', 'recognize', 'stats_week']
+
+
+def sample_image_base64():
+    """Небольшое JPEG-изображение для распознавания"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, format='JPEG')
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def bench_users(count, prefix=USERNAME_PREFIX, password=PASSWORD):
+    """Учётные данные пользователей seed_benchmark"""
+    return [(f'{prefix}{index}@bench.calorio.local', password) for index in range(count)]
+
+
+class LoadTest:
+    """
+    Генератор нагрузки.
+
+    Args:
+        base_url: адрес стенда, например http://127.0.0.1:8000
+        users: список (email, password)
+        concurrency: число параллельных сессий (потоков)
+        duration: длительность в секундах (или None)
+        sessions: общее число сессий (или None); нужен duration или sessions
+        dishes_per_session: сколько блюд добавляет сессия
+        steps: шаги сессии (по умолчанию все STEPS)
+    """
+
+    def __init__(self, base_url, users, concurrency=8, duration=None, sessions=None,
+                 dishes_per_session=3, timeout=60, steps=None, seed=None):
+        if duration is None and sessions is None:
+            raise ValueError('Нужно указать duration или sessions')
+        self.base_url = base_url.rstrip('/')
+        self.users = users
+        self.concurrency = concurrency
+        self.duration = duration
+        self.sessions = sessions
+        self.dishes_per_session = dishes_per_session
+        self.timeout = timeout
+        self.steps = steps or STEPS
+        self.seed = seed
+        self.image = sample_image_base64()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._records = []
+
+    def _next_session(self, deadline):
+        with self._lock:
+            number = next(self._counter)
+        if self.sessions is not None and number >= self.sessions:
+            return None
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        return number
+
+    def _request(self, http, records, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = http.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status_code = response.status_code
+        except Exception:
+            response, status_code = None, 0
+        records.append((name, status_code, (time.perf_counter() - started) * 1000))
+        return response
+
+    def _session(self, number, records):
+        import requests
+
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        email, password = self.users[number % len(self.users)]
+        today = date.today().isoformat()
+
+        with requests.Session() as http:
+            response = self._request(http, records, 'login', 'POST', '/api/auth/login/',
+                                     json={'email': email, 'password': password})
+            if response is None or response.status_code != 200:
+                return
+            http.headers['Authorization'] = f"Bearer {response.json()['tokens']['access']}"
+
+            if 'day_view' in self.steps:
+                self._request(http, records, 'day_view', 'GET', f'/api/days/{today}/')
+            if 'dish_create' in self.steps:
+                for index in range(self.dishes_per_session):
+                    dish = {'name': rng.choice(SEARCH_NAMES), 'weight': rng.randrange(100, 400, 50),
+                            'date': today, 'meal_type': MEAL_TYPES[index % len(MEAL_TYPES)]}
+                    # Первое блюдо - без КБЖУ (автоматический поиск), остальные - с КБЖУ
+                    if index:
+                        dish.update({'calories': rng.randrange(100, 700), 'proteins': '10.00',
+                                     'fats': '5.00', 'carbohydrates': '30.00'})
+                    self._request(http, records, 'dish_create', 'POST', '/api/dishes/', json=dish)
+            if 'food_search' in self.steps:
+                self._request(http, records, 'food_search', 'POST', '/api/dishes/search-nutrition/',
+                              json={'food_name': rng.choice(SEARCH_NAMES), 'weight': 200})
+            if 'recognize' in self.steps:
+                self._request(http, records, 'recognize', 'POST', '/api/dishes/recognize/',
+                              json={'image_base64': self.image})
+            if 'stats_week' in self.steps:
+                self._request(http, records, 'stats_week', 'GET', f'/api/stats/week/{today}/')
+
+    def _worker(self, deadline):
+        records = []
+        while True:
+            number = self._next_session(deadline)
+            if number is None:
+                break
+            self._session(number, records)
+        with self._lock:
+            self._records.extend(records)
+
+    def run(self):
+        """Запускает нагрузку и возвращает отчёт (см. summarize)"""
+        deadline = time.monotonic() + self.duration if self.duration is not None else None
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=self._worker, args=(deadline,), name=f'loadtest-{index}')
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(self._records, time.monotonic() - started)
+
+
+def _stats(records, elapsed):
+    latencies = [latency for _, _, latency in records]
+    errors = sum(1 for _, status_code, _ in records if status_code == 0 or (status_code >= 400 and status_code != 429))
+    throttled = sum(1 for _, status_code, _ in records if status_code == 429)
+    return {
+        'requests': len(records),
+        'errors': errors,
+        'throttled': throttled,
+        'error_rate': round(errors / len(records), 4) if records else 0.0,
+        'throughput_rps': round(len(records) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def summarize(records, elapsed):
+    """
+    Отчёт по записям (endpoint, status_code, latency_ms).
+
+    Ответ 429 (throttling, квоты) считается отдельно от ошибок; статус 0 -
+    сетевая ошибка или таймаут.
+    """
+    by_endpoint = {}
+    for record in records:
+        by_endpoint.setdefault(record[0], []).append(record)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'endpoints': {name: _stats(items, elapsed) for name, items in sorted(by_endpoint.items())},
+        'total': _stats(records, elapsed),
+    }
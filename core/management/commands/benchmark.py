@@ -0,0 +1,141 @@
+"""
+Бенчмарк горячих endpoint'ов: перцентили времени и число SQL-запросов
+
+    python manage.py seed_benchmark --users 100
+    python manage.py benchmark --output bench/$(git rev-parse --short HEAD).json
+    python manage.py benchmark --compare bench/baseline.json --check
+    python manage.py benchmark --render     # JSON-рендереры и сборка строк ответа, без БД
+
+Запросы выполняются в процессе (тестовый клиент DRF) против текущей БД,
+throttling отключён. --check завершает команду с ошибкой, если число
+запросов превысило бюджет (core.benchmarks.QUERY_BUDGETS).
+"""
+import json
+import platform
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import benchmarks
+from core.models import DailyGoal, Dish, Meal
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время ответа и число SQL-запросов горячих endpoint\'ов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Замеров на сценарий')
+        parser.add_argument('--warmup', type=int, default=5, help='Прогревочных запросов на сценарий')
+        parser.add_argument('--user', help='username пользователя (по умолчанию первый из seed_benchmark)')
+        parser.add_argument('--only', action='append', help='Запустить только указанный сценарий (можно повторять)')
+        parser.add_argument('--output', help='Путь к JSON с результатами')
+        parser.add_argument('--compare', help='JSON с предыдущими результатами для сравнения')
+        parser.add_argument('--check', action='store_true', help='Ошибка при превышении бюджета запросов')
+        parser.add_argument('--render', action='store_true',
+                            help='Сравнить JSON-рендереры и сериализацию блюд на типичных ответах (без БД)')
+
+    def handle(self, *args, **options):
+        if options['render']:
+            iterations = max(options['iterations'], 200)
+            results = benchmarks.run_render(iterations=iterations, stdout=self.stdout)
+            serialization = benchmarks.run_serialization(iterations=iterations, stdout=self.stdout)
+            if options['output']:
+                self._write(options['output'], {
+                    'revision': benchmarks.git_revision(),
+                    'timestamp': timezone.now().isoformat(),
+                    'python': platform.python_version(),
+                    'render': results,
+                    'serialization': serialization,
+                })
+            return
+
+        user = self._get_user(options['user'])
+        day_dates = list(
+            Meal.objects.filter(user=user).order_by('-date').values_list('date', flat=True).distinct()
+            [:options['iterations'] + options['warmup']]
+        )
+        if not day_dates:
+            raise CommandError(f'У пользователя {user.username} нет данных. Запустите seed_benchmark.')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        hosts = list(settings.ALLOWED_HOSTS) + ['testserver']
+        with override_settings(ALLOWED_HOSTS=hosts, SECURE_SSL_REDIRECT=False), \
+                mock.patch.object(APIView, 'check_throttles', lambda view, request: None):
+            try:
+                results = benchmarks.run(
+                    client, user, day_dates,
+                    iterations=options['iterations'], warmup=options['warmup'],
+                    only=options['only'], stdout=self.stdout,
+                )
+            finally:
+                # Блюда, созданные сценарием dish_create
+                Dish.objects.filter(user=user, name='Бенчмарк').delete()
+
+        report = {
+            'revision': benchmarks.git_revision(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'data': {
+                'users': get_user_model().objects.count(),
+                'dishes': Dish.objects.count(),
+                'goals': DailyGoal.objects.count(),
+            },
+            'results': results,
+        }
+
+        if options['output']:
+            self._write(options['output'], report)
+
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text()), report)
+
+        over_budget = [
+            name for name, result in results.items()
+            if result['query_budget'] is not None and result['queries_max'] > result['query_budget']
+        ]
+        for name in over_budget:
+            self.stdout.write(self.style.ERROR(
+                f"{name}: {results[name]['queries_max']} запросов при бюджете {results[name]['query_budget']}"
+            ))
+        if over_budget and options['check']:
+            raise CommandError('Превышен бюджет SQL-запросов: ' + ', '.join(over_budget))
+
+    def _write(self, output, report):
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        self.stdout.write(f'Результаты записаны в {path}')
+
+    def _get_user(self, username):
+        User = get_user_model()
+        queryset = User.objects.filter(username=username) if username else (
+            User.objects.filter(username__startswith=benchmarks.USERNAME_PREFIX).order_by('pk')
+        )
+        user = queryset.first()
+        if user is None:
+            raise CommandError('Пользователь не найден. Запустите seed_benchmark или укажите --user.')
+        return user
+
+    def _compare(self, previous, current):
+        self.stdout.write(f"Сравнение с {previous.get('revision') or 'предыдущим запуском'}:")
+        for name, result in current['results'].items():
+            before = previous.get('results', {}).get(name)
+            if not before:
+                continue
+            delta = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            self.stdout.write(
+                f"{name:<20} p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f}ms ({delta:+.1f}%), "
+                f"queries {before['queries_max']} -> {result['queries_max']}"
+            )
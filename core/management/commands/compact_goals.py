@@ -0,0 +1,38 @@
+"""
+Перенос истории целей КБЖУ из строк DailyGoal в шаблоны
+
+    python manage.py compact_goals                 # все пользователи
+    python manage.py compact_goals --user 42 --dry-run
+    python manage.py compact_goals --min-run 7     # шаблон - от недели одинаковых целей
+"""
+from django.core.management.base import BaseCommand
+
+from core.goal_schedule import compact_goals
+from core.models import DailyGoal
+
+
+class Command(BaseCommand):
+    help = 'Заменяет серии одинаковых целей на день шаблонами целей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='id пользователя (можно несколько)')
+        parser.add_argument('--min-run', type=int, default=3, help='Минимальная серия дней для шаблона')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не менять')
+
+    def handle(self, *args, **options):
+        user_ids = options['user'] or list(
+            DailyGoal.objects.order_by().values_list('user_id', flat=True).distinct()
+        )
+        users = templates = deleted = 0
+        for user_id in user_ids:
+            created, removed = compact_goals(user_id, min_run=options['min_run'], dry_run=options['dry_run'])
+            if created:
+                users += 1
+                templates += created
+                deleted += removed
+        before = DailyGoal.objects.count() + (deleted if not options['dry_run'] else 0)
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Пользователей: {users}, шаблонов: {templates}, '
+            f'строк целей удалено: {deleted} из {before}'
+        ))
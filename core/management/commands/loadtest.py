@@ -0,0 +1,73 @@
+"""
+Нагрузочный тест запущенного стенда
+
+    python manage.py seed_benchmark --users 200
+    python manage.py openrouter_stub --port 8090 &
+    OPENROUTER_API_URL=http://127.0.0.1:8090/api/v1/chat/completions \\
+        gunicorn --workers 4 calorio_api.wsgi:application &
+    python manage.py loadtest --base-url http://127.0.0.1:8000 --users 200 --concurrency 32 --duration 60
+
+Throttling и квоты стенда тоже срабатывают: ответы 429 считаются отдельно
+(throttled). Для замера ёмкости задайте стенду большие QUOTA_PLANS.
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+from core.loadtest import STEPS, LoadTest, bench_users
+
+
+class Command(BaseCommand):
+    help = 'Воспроизводит пользовательские сессии против запущенного стенда и считает перцентили'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8, help='Параллельных сессий')
+        parser.add_argument('--duration', type=float, help='Длительность, секунд')
+        parser.add_argument('--sessions', type=int, help='Общее число сессий')
+        parser.add_argument('--users', type=int, default=100, help='Сколько пользователей seed_benchmark использовать')
+        parser.add_argument('--prefix', default=benchmarks.USERNAME_PREFIX)
+        parser.add_argument('--password', default=benchmarks.PASSWORD)
+        parser.add_argument('--dishes-per-session', type=int, default=3)
+        parser.add_argument('--step', action='append', choices=STEPS, help='Шаги сессии (по умолчанию все)')
+        parser.add_argument('--timeout', type=float, default=60, help='Таймаут запроса, секунд')
+        parser.add_argument('--seed', type=int, help='Seed генератора (воспроизводимые сессии)')
+        parser.add_argument('--output', help='Путь к JSON с отчётом')
+
+    def handle(self, *args, **options):
+        if options['duration'] is None and options['sessions'] is None:
+            options['duration'] = 30
+
+        load = LoadTest(
+            options['base_url'],
+            bench_users(options['users'], options['prefix'], options['password']),
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            sessions=options['sessions'],
+            dishes_per_session=options['dishes_per_session'],
+            timeout=options['timeout'],
+            steps=options['step'],
+            seed=options['seed'],
+        )
+        self.stdout.write(f"Нагрузка на {options['base_url']}: {options['concurrency']} параллельных сессий")
+        report = load.run()
+        if not report['total']['requests']:
+            raise CommandError('Не выполнено ни одного запроса')
+
+        self.stdout.write(f"{'endpoint':<14}{'req':>7}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'err%':>8}{'429':>6}")
+        for name, stats in list(report['endpoints'].items()) + [('total', report['total'])]:
+            self.stdout.write(
+                f"{name:<14}{stats['requests']:>7}{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>10.1f}"
+                f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['error_rate'] * 100:>8.2f}{stats['throttled']:>6}"
+            )
+
+        if options['output']:
+            report['base_url'] = options['base_url']
+            report['concurrency'] = options['concurrency']
+            report['revision'] = benchmarks.git_revision()
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+            self.stdout.write(f'Отчёт записан в {path}')
@@ -0,0 +1,64 @@
+"""
+Локальная заглушка OpenRouter
+
+    python manage.py openrouter_stub --port 8090 --latency-ms 800 --jitter-ms 300 --distribution lognormal
+    python manage.py openrouter_stub --fail 429:0.05 --fail 402:0.01 --malformed-rate 0.02 --canned canned.json
+    OPENROUTER_API_URL=http://127.0.0.1:8090/api/v1/chat/completions python manage.py runserver
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.openrouter_stub import (
+    CHAT_COMPLETIONS_PATH, DISTRIBUTIONS, MALFORMED_MODES, StubConfig, load_canned, make_server,
+)
+
+
+def _failure(value):
+    """Разбор --fail СТАТУС:ДОЛЯ"""
+    try:
+        status_code, rate = value.split(':')
+        return int(status_code), float(rate)
+    except ValueError:
+        raise CommandError(f'Ожидается --fail СТАТУС:ДОЛЯ, получено: {value}')
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку OpenRouter chat completions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latency-ms', type=float, default=500, help='Задержка ответа, мс')
+        parser.add_argument('--jitter-ms', type=float, default=0, help='Разброс задержки, мс')
+        parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='fixed')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 500 (0..1)')
+        parser.add_argument('--fail', action='append', default=[], metavar='STATUS:RATE',
+                            help='Доля ответов с указанным статусом, например 429:0.05')
+        parser.add_argument('--malformed-rate', type=float, default=0.0, help='Доля некорректных ответов 200')
+        parser.add_argument('--malformed-mode', choices=MALFORMED_MODES, default='content')
+        parser.add_argument('--canned', help='JSON-файл с КБЖУ блюд на 100 г')
+        parser.add_argument('--seed', type=int, help='Seed для воспроизводимости задержек и ошибок')
+
+    def handle(self, *args, **options):
+        try:
+            config = StubConfig(
+                latency_ms=options['latency_ms'],
+                jitter_ms=options['jitter_ms'],
+                distribution=options['distribution'],
+                error_rate=options['error_rate'],
+                failures=dict(_failure(value) for value in options['fail']),
+                malformed_rate=options['malformed_rate'],
+                malformed_mode=options['malformed_mode'],
+                canned=load_canned(options['canned']) if options['canned'] else None,
+                seed=options['seed'],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        server = make_server(options['host'], options['port'], config)
+        host, port = server.server_address[:2]
+        self.stdout.write(f'Заглушка OpenRouter: http://{host}:{port}{CHAT_COMPLETIONS_PATH}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
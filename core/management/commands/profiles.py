@@ -0,0 +1,85 @@
+"""
+Просмотр профилей запросов (core.profiling)
+
+    python manage.py profiles                       # последние профили
+    python manage.py profiles --aggregate           # сводка по view
+    python manage.py profiles --view core:day-data --stats --top 30
+    python manage.py profiles --view core:day-data --folded day.folded
+"""
+import io
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import PHASES, aggregate, load_profiles, merge_folded
+
+
+class Command(BaseCommand):
+    help = 'Список и агрегация сохранённых профилей запросов по view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Каталог профилей (по умолчанию PROFILING_DIR)')
+        parser.add_argument('--view', help='Только профили указанного view')
+        parser.add_argument('--limit', type=int, default=20, help='Сколько последних профилей показать')
+        parser.add_argument('--aggregate', action='store_true', help='Сводка по view')
+        parser.add_argument('--stats', action='store_true', help='Объединённая статистика cProfile')
+        parser.add_argument('--sort', default='cumulative', help='Сортировка pstats')
+        parser.add_argument('--top', type=int, default=25, help='Строк статистики cProfile')
+        parser.add_argument('--folded', help='Записать объединённые folded stacks в файл')
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'] or settings.PROFILING_DIR)
+        if not directory.is_dir():
+            raise CommandError(f'Каталог профилей не найден: {directory}')
+        profiles = load_profiles(directory, options['view'])
+        if not profiles:
+            self.stdout.write('Профилей нет')
+            return
+
+        if options['stats']:
+            return self._stats(directory, profiles, options)
+        if options['folded']:
+            return self._folded(directory, profiles, options['folded'])
+        if options['aggregate']:
+            return self._aggregate(profiles)
+
+        header = f"{'id':<25}{'view':<28}{'status':>7}{'total':>10}{'sql':>6}" + ''.join(f'{phase:>11}' for phase in PHASES)
+        self.stdout.write(header)
+        for profile in profiles[:options['limit']]:
+            self.stdout.write(
+                f"{profile['id']:<25}{profile['view']:<28}{profile['status']:>7}{profile['total_ms']:>10.1f}"
+                f"{profile['sql_count']:>6}" + ''.join(f"{profile[f'{phase}_ms']:>11.1f}" for phase in PHASES)
+            )
+
+    def _aggregate(self, profiles):
+        header = f"{'view':<28}{'req':>6}{'p50':>10}{'p95':>10}{'sql':>7}" + ''.join(f'{phase:>11}' for phase in PHASES)
+        self.stdout.write(header)
+        for view, stats in aggregate(profiles).items():
+            self.stdout.write(
+                f"{view:<28}{stats['requests']:>6}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                f"{stats['sql_count']:>7.1f}" + ''.join(f"{stats[f'{phase}_ms']:>11.1f}" for phase in PHASES)
+            )
+
+    def _captures(self, directory, profiles, suffix):
+        paths = [
+            directory / profile['capture'] for profile in profiles
+            if profile.get('capture', '').endswith(suffix) and (directory / profile['capture']).exists()
+        ]
+        if not paths:
+            raise CommandError(f'Нет профилей с захватом {suffix} (PROFILING_CAPTURE)')
+        return paths
+
+    def _stats(self, directory, profiles, options):
+        paths = self._captures(directory, profiles, '.prof')
+        output = io.StringIO()
+        stats = pstats.Stats(*(str(path) for path in paths), stream=output)
+        stats.sort_stats(options['sort']).print_stats(options['top'])
+        self.stdout.write(f'Объединено профилей: {len(paths)}')
+        self.stdout.write(output.getvalue())
+
+    def _folded(self, directory, profiles, output):
+        paths = self._captures(directory, profiles, '.folded')
+        Path(output).write_text(merge_folded(paths))
+        self.stdout.write(f'Объединено профилей: {len(paths)}, folded stacks записаны в {output}')
@@ -0,0 +1,45 @@
+"""
+Генерация данных для бенчмарков
+
+    python manage.py seed_benchmark                       # 1k пользователей, 1M блюд, год целей
+    python manage.py seed_benchmark --users 50 --dishes-per-user 200 --days 90
+    python manage.py seed_benchmark --purge               # удалить данные бенчмарка
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Создаёт пользователей, блюда, цели и подписки для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Число пользователей')
+        parser.add_argument('--dishes-per-user', type=int, default=1000, help='Блюд на пользователя')
+        parser.add_argument('--days', type=int, default=365, help='Дней истории (целей на пользователя)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--prefix', default=benchmarks.USERNAME_PREFIX, help='Префикс username')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора случайных чисел')
+        parser.add_argument('--purge', action='store_true', help='Удалить данные бенчмарка и выйти')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted, _ = benchmarks.purge(options['prefix'])
+            self.stdout.write(self.style.SUCCESS(f'Удалено объектов: {deleted}'))
+            return
+
+        started = time.monotonic()
+        counts = benchmarks.seed(
+            users=options['users'],
+            dishes_per_user=options['dishes_per_user'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            seed_value=options['seed'],
+            stdout=self.stdout,
+        )
+        summary = ', '.join(f'{name}: {count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.monotonic() - started:.1f}с ({summary})'))
+        self.stdout.write(f'Пароль пользователей: {benchmarks.PASSWORD}')
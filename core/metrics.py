@@ -0,0 +1,449 @@
+"""
+Метрики приложения в формате Prometheus (/api/metrics/)
+
+Собираются в памяти процесса: длительность запросов по маршрутам и статусам,
+число и время SQL-запросов на запрос, попадания в кэш (core.cache.stats()),
+длительность и исход обращений к OpenRouter по моделям, отказы throttling
+и квот, запросы в обработке и время ожидания в очереди перед воркером
+(заголовок X-Request-Start от nginx).
+
+Несколько воркеров gunicorn: при заданном METRICS_DIR каждый процесс не чаще
+раза в METRICS_FLUSH_SECONDS сбрасывает свой снимок в METRICS_DIR/<pid>.json,
+а /api/metrics/ суммирует снимки всех процессов. Счётчики и гистограммы
+завершившихся процессов сохраняются, gauge - только у живых. Каталог
+очищается при старте сервиса (см. scripts/calorio.service).
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+_lock = threading.Lock()
+_registry = {}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def snapshot(self):
+        with _lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def clear(self):
+        with _lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Гистограмма: значения хранятся по корзинам (не накопительно), плюс сумма и число"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            if index < len(self.buckets):
+                entry['buckets'][index] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def snapshot(self):
+        with _lock:
+            return [
+                [list(key), {'buckets': list(entry['buckets']), 'sum': entry['sum'], 'count': entry['count']}]
+                for key, entry in self._values.items()
+            ]
+
+
+REQUEST_DURATION = Histogram(
+    'calorio_http_request_duration_seconds', 'Длительность обработки запроса',
+    ['route', 'method', 'status'],
+)
+REQUESTS_IN_PROGRESS = Gauge('calorio_http_requests_in_progress', 'Запросы в обработке')
+REQUEST_QUEUE_TIME = Histogram(
+    'calorio_http_request_queue_seconds', 'Ожидание запроса между балансировщиком и воркером (X-Request-Start)',
+)
+DB_QUERIES = Histogram(
+    'calorio_db_queries_per_request', 'Число SQL-запросов на запрос', ['route'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram('calorio_db_query_seconds_per_request', 'Суммарное время SQL-запросов на запрос', ['route'])
+CACHE_REQUESTS = Counter('calorio_cache_requests_total', 'Обращения к кэшу по семействам ключей', ['family', 'result'])
+CACHE_HIT_RATIO = Gauge('calorio_cache_hit_ratio', 'Доля попаданий в кэш по семействам ключей', ['family'])
+OPENROUTER_DURATION = Histogram(
+    'calorio_openrouter_request_duration_seconds', 'Длительность запросов к OpenRouter',
+    ['model', 'outcome'], buckets=UPSTREAM_BUCKETS,
+)
+OPENROUTER_IN_FLIGHT = Gauge('calorio_openrouter_requests_in_flight', 'Ожидающие ответа запросы к OpenRouter')
+REJECTIONS = Counter('calorio_rejected_requests_total', 'Отказы throttling и квот (429)', ['reason', 'view'])
+
+# Метрики, которые вычисляются при выдаче, а не накапливаются
+_DERIVED = {CACHE_REQUESTS.name, CACHE_HIT_RATIO.name}
+
+
+def openrouter_outcome(status_code):
+    """Исход запроса к OpenRouter для метки outcome"""
+    return 'ok' if status_code == 200 else str(status_code)
+
+
+def _cache_snapshot():
+    from .cache import stats
+
+    return [
+        [[family, result], values[key]]
+        for family, values in stats().items()
+        for result, key in (('hit', 'hits'), ('miss', 'misses'))
+    ]
+
+
+def snapshot():
+    """Снимок метрик текущего процесса: {имя: [[значения меток, значение], ...]}"""
+    data = {name: metric.snapshot() for name, metric in _registry.items() if name not in _DERIVED}
+    data[CACHE_REQUESTS.name] = _cache_snapshot()
+    return data
+
+
+def reset():
+    """Сбрасывает метрики процесса (используется в тестах)"""
+    for metric in _registry.values():
+        metric.clear()
+
+
+# --- Агрегация по процессам ---
+
+_last_flush = 0.0
+
+
+def _directory():
+    return getattr(settings, 'METRICS_DIR', '')
+
+
+def flush(force=False):
+    """Сбрасывает снимок процесса в METRICS_DIR (не чаще METRICS_FLUSH_SECONDS)"""
+    global _last_flush
+
+    directory = _directory()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+        return
+    _last_flush = now
+
+    path = Path(directory) / f'{os.getpid()}.json'
+    temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary.write_text(json.dumps(snapshot()))
+        os.replace(temporary, path)
+    except OSError:
+        # Метрики не должны ломать обработку запросов
+        pass
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(total, data, include_gauges):
+    for name, series in data.items():
+        metric = _registry.get(name)
+        if metric is None or (metric.type == 'gauge' and not include_gauges):
+            continue
+        values = total.setdefault(name, {})
+        for labels, value in series:
+            key = tuple(labels)
+            if metric.type == 'histogram':
+                entry = values.setdefault(key, {'buckets': [0] * len(metric.buckets), 'sum': 0.0, 'count': 0})
+                if len(value['buckets']) != len(entry['buckets']):
+                    continue
+                entry['buckets'] = [a + b for a, b in zip(entry['buckets'], value['buckets'])]
+                entry['sum'] += value['sum']
+                entry['count'] += value['count']
+            else:
+                values[key] = values.get(key, 0) + value
+
+
+def collect():
+    """Метрики всех процессов: {имя: {значения меток: значение}}"""
+    total = {}
+    directory = _directory()
+    if directory:
+        for path in Path(directory).glob('*.json'):
+            try:
+                pid = int(path.stem)
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            _merge(total, data, include_gauges=_process_alive(pid))
+    _merge(total, snapshot(), include_gauges=True)
+
+    # Доля попаданий - по сумме всех процессов
+    families = {}
+    for (family, result), value in total.get(CACHE_REQUESTS.name, {}).items():
+        families.setdefault(family, {'hit': 0, 'miss': 0})[result] = value
+    total[CACHE_HIT_RATIO.name] = {
+        (family, ): round(values['hit'] / (values['hit'] + values['miss']), 4)
+        for family, values in families.items() if values['hit'] + values['miss']
+    }
+    return total
+
+
+# --- Формат Prometheus ---
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
+
+
+def render(total=None):
+    """Текстовый формат Prometheus 0.0.4"""
+    total = collect() if total is None else total
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for key, value in sorted(total.get(name, {}).items()):
+            if metric.type == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value['buckets']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(metric.labels, key, ('le', _number(float(bound))))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(metric.labels, key, ('le', '+Inf'))} {value['count']}")
+                lines.append(f"{name}_sum{_labels(metric.labels, key)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_labels(metric.labels, key)} {value['count']}")
+            else:
+                lines.append(f'{name}{_labels(metric.labels, key)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    /api/metrics/ для Prometheus.
+
+    Требуется заголовок Authorization: Bearer <METRICS_TOKEN>. Без токена
+    endpoint открыт только в DEBUG, иначе отвечает 404.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse('Not Found\n', status=404, content_type=CONTENT_TYPE)
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type=CONTENT_TYPE)
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+# --- Сбор метрик запросов ---
+
+class QueryTimer:
+    """Число и время SQL-запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.duration += duration
+
+
+_query_timers = ContextVar('calorio_query_timers', default=())
+
+
+def _count_query(execute, sql, params, many, context):
+    """execute_wrapper всех подключений: запрос учитывается в таймерах текущего контекста"""
+    timers = _query_timers.get()
+    if not timers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for timer in timers:
+            timer.add(elapsed)
+
+
+def _install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_query_counter)
+
+
+@contextmanager
+def track_queries(timer):
+    """
+    Учитывает в timer SQL-запросы текущего контекста.
+
+    Таймеры хранятся в ContextVar, а не в execute_wrapper подключений потока:
+    под ASGI view выполняют запросы в потоках sync_to_async, которые получают
+    копию контекста запроса.
+    """
+    for alias in connections:
+        _install_query_counter(connections[alias])
+    token = _query_timers.set(_query_timers.get() + (timer,))
+    try:
+        yield timer
+    finally:
+        _query_timers.reset(token)
+
+
+def _queue_time(request):
+    """
+    Время в очереди по X-Request-Start (nginx: "t=${msec}", секунды с долями).
+
+    Returns:
+        секунды или None, если заголовка нет или он некорректен
+    """
+    header = request.headers.get('X-Request-Start', '')
+    if not header:
+        return None
+    try:
+        started = float(header[2:] if header.startswith('t=') else header)
+    except ValueError:
+        return None
+    # Значения в миллисекундах/микросекундах (другие балансировщики)
+    while started > 1e11:
+        started /= 1000
+    waited = time.time() - started
+    return waited if waited >= 0 else None
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    # Для несовпавших URL - одна метка, чтобы сканеры не раздували число серий
+    return match.route if match is not None and match.route else 'unmatched'
+
+
+class MetricsMiddleware:
+    """
+    Длительность запроса, SQL-запросы и время в очереди по маршрутам.
+
+    Ставится первым в MIDDLEWARE, чтобы учитывать всю цепочку. Работает и в
+    синхронной, и в асинхронной цепочке (ASGI): иначе Django переводил бы
+    каждый запрос в поток и асинхронные view теряли бы смысл.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer, started = self._start(request)
+        try:
+            with track_queries(timer):
+                response = self.get_response(request)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+        return self._finish(request, response, timer, started)
+
+    async def __acall__(self, request):
+        timer, started = self._start(request)
+        try:
+            with track_queries(timer):
+                response = await self.get_response(request)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+        return self._finish(request, response, timer, started)
+
+    def _start(self, request):
+        queued = _queue_time(request)
+        if queued is not None:
+            REQUEST_QUEUE_TIME.observe(queued)
+        REQUESTS_IN_PROGRESS.inc()
+        return QueryTimer(), time.perf_counter()
+
+    def _finish(self, request, response, timer, started):
+        elapsed = time.perf_counter() - started
+        route = _route(request)
+        REQUEST_DURATION.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        DB_QUERIES.observe(timer.count, route=route)
+        DB_TIME.observe(timer.duration, route=route)
+        flush()
+        return response
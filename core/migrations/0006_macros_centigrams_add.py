@@ -0,0 +1,20 @@
+# Перевод БЖУ блюд и целей в целые сантиграммы, шаг 1 из 3: новые столбцы
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_remove_payment_payments_user_id_1b771c_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name=model_name,
+            name=f'{field_name}_cg',
+            field=models.IntegerField(null=True),
+        )
+        for model_name in ('dish', 'dailygoal')
+        for field_name in ('proteins', 'fats', 'carbohydrates')
+    ]
@@ -0,0 +1,46 @@
+# Перевод БЖУ блюд и целей в целые сантиграммы, шаг 2 из 3: перенос данных
+#
+# Данные переносятся пачками по диапазонам pk, каждая пачка - в своей
+# транзакции, чтобы не держать одну долгую транзакцию на миллионах строк.
+# Заполняются только строки с пустыми новыми столбцами, поэтому прерванную
+# миграцию можно просто запустить снова.
+
+from django.db import migrations, models, transaction
+from django.db.models import F, Max, Min
+from django.db.models.functions import Cast, Round
+
+BATCH_SIZE = 5000
+
+MODELS = ('Dish', 'DailyGoal')
+MACROS = ('proteins', 'fats', 'carbohydrates')
+
+
+def fill_centigrams(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    for model_name in MODELS:
+        manager = apps.get_model('core', model_name)._base_manager.using(alias)
+        bounds = manager.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            continue
+        for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+            with transaction.atomic(using=alias):
+                manager.filter(
+                    pk__gte=start, pk__lt=start + BATCH_SIZE, proteins_cg__isnull=True,
+                ).update(**{
+                    f'{name}_cg': Cast(Round(F(name) * 100), models.IntegerField())
+                    for name in MACROS
+                })
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_macros_centigrams_add'),
+    ]
+
+    operations = [
+        # Обратный перенос - в 0008, до возврата NOT NULL у старых столбцов
+        migrations.RunPython(fill_centigrams, migrations.RunPython.noop),
+    ]
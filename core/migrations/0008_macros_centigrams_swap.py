@@ -0,0 +1,79 @@
+# Перевод БЖУ блюд и целей в целые сантиграммы, шаг 3 из 3: замена столбцов
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, IntegerField, Q, Value
+from django.db.models.functions import Cast, Round
+
+import core.fields
+
+MACROS = (
+    ('proteins', 'Белки (г)'),
+    ('fats', 'Жиры (г)'),
+    ('carbohydrates', 'Углеводы (г)'),
+)
+
+
+def fill_remaining(apps, schema_editor):
+    """
+    Дозаполняет строки, добавленные после пачек 0007: до выкладки нового кода
+    приложение пишет только старые столбцы, а NOT NULL ниже упал бы на них.
+    """
+    alias = schema_editor.connection.alias
+    for model_name in ('Dish', 'DailyGoal'):
+        missing = Q()
+        for name, _ in MACROS:
+            missing |= Q(**{f'{name}_cg__isnull': True})
+        apps.get_model('core', model_name)._base_manager.using(alias).filter(missing).update(**{
+            f'{name}_cg': Cast(Round(F(name) * 100), IntegerField())
+            for name, _ in MACROS
+        })
+
+
+def restore_decimals(model_name):
+    """Обратная миграция: граммы из сантиграммов"""
+    def restore(apps, schema_editor):
+        alias = schema_editor.connection.alias
+        apps.get_model('core', model_name)._base_manager.using(alias).update(**{
+            name: ExpressionWrapper(
+                F(f'{name}_cg') / Value(100.0), output_field=DecimalField(max_digits=6, decimal_places=2),
+            )
+            for name, _ in MACROS
+        })
+    return restore
+
+
+def _operations(model_name):
+    operations = [
+        migrations.AlterField(
+            model_name=model_name,
+            name=name,
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True, verbose_name=verbose_name),
+        )
+        for name, verbose_name in MACROS
+    ]
+    operations.append(migrations.RunPython(migrations.RunPython.noop, restore_decimals(model_name)))
+    for name, verbose_name in MACROS:
+        operations += [
+            migrations.RemoveField(model_name=model_name, name=name),
+            migrations.RenameField(model_name=model_name, old_name=f'{name}_cg', new_name=name),
+            migrations.AlterField(
+                model_name=model_name,
+                name=name,
+                field=core.fields.CentigramField(
+                    validators=[django.core.validators.MinValueValidator(0)], verbose_name=verbose_name,
+                ),
+            ),
+        ]
+    return operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_macros_centigrams_fill'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_remaining, migrations.RunPython.noop),
+    ] + _operations('dish') + _operations('dailygoal')
@@ -0,0 +1,41 @@
+# Шаблоны целей КБЖУ (действуют с даты, с переопределениями по дням недели)
+
+import core.fields
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_macros_centigrams_swap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalTemplate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateField(verbose_name='Действует с')),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')], null=True, verbose_name='День недели')),
+                ('calories', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Калории (ккал)')),
+                ('proteins', core.fields.CentigramField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Белки (г)')),
+                ('fats', core.fields.CentigramField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Жиры (г)')),
+                ('carbohydrates', core.fields.CentigramField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Углеводы (г)')),
+                ('is_auto_calculated', models.BooleanField(default=False, verbose_name='Автоматически рассчитано')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_templates', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Шаблон целей',
+                'verbose_name_plural': 'Шаблоны целей',
+                'db_table': 'goal_templates',
+                'ordering': ['effective_from', 'weekday'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'effective_from', 'weekday'), name='goal_template_unique_weekday'), models.UniqueConstraint(condition=models.Q(('weekday__isnull', True)), fields=('user', 'effective_from'), name='goal_template_unique_base')],
+            },
+        ),
+    ]
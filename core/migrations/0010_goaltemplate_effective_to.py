@@ -0,0 +1,18 @@
+# Дата окончания шаблона целей (шаблоны, созданные compact_goals, закрываются концом отрезка)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_goal_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goaltemplate',
+            name='effective_to',
+            field=models.DateField(blank=True, null=True, verbose_name='Действует по'),
+        ),
+    ]
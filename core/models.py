@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 
+from .fields import CentigramField
+
 User = get_user_model()
 
 
@@ -18,21 +20,15 @@ class DailyGoal(models.Model):
         validators=[MinValueValidator(1)],
         verbose_name='Калории (ккал)'
     )
-    proteins = models.DecimalField(
-        max_digits=6,
-        decimal_places=2,
+    proteins = CentigramField(
         validators=[MinValueValidator(0)],
         verbose_name='Белки (г)'
     )
-    fats = models.DecimalField(
-        max_digits=6,
-        decimal_places=2,
+    fats = CentigramField(
         validators=[MinValueValidator(0)],
         verbose_name='Жиры (г)'
     )
-    carbohydrates = models.DecimalField(
-        max_digits=6,
-        decimal_places=2,
+    carbohydrates = CentigramField(
         validators=[MinValueValidator(0)],
         verbose_name='Углеводы (г)'
     )
@@ -58,6 +54,85 @@ class DailyGoal(models.Model):
         return f'Цель {self.user.username} на {self.date}'
 
 
+class GoalTemplate(models.Model):
+    """
+    Шаблон целей КБЖУ: действует с effective_from до следующего шаблона
+    (или по effective_to включительно, если дата окончания задана)
+    
+    Строка без дня недели - цели на все дни версии шаблона, строки с днём
+    недели - переопределения для этого дня в той же версии. Явная цель на
+    день (DailyGoal) важнее шаблона.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    ]
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='goal_templates',
+        verbose_name='Пользователь'
+    )
+    effective_from = models.DateField(verbose_name='Действует с')
+    effective_to = models.DateField(null=True, blank=True, verbose_name='Действует по')
+    weekday = models.PositiveSmallIntegerField(
+        choices=WEEKDAY_CHOICES,
+        null=True,
+        blank=True,
+        verbose_name='День недели'
+    )
+    calories = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)],
+        verbose_name='Калории (ккал)'
+    )
+    proteins = CentigramField(
+        validators=[MinValueValidator(0)],
+        verbose_name='Белки (г)'
+    )
+    fats = CentigramField(
+        validators=[MinValueValidator(0)],
+        verbose_name='Жиры (г)'
+    )
+    carbohydrates = CentigramField(
+        validators=[MinValueValidator(0)],
+        verbose_name='Углеводы (г)'
+    )
+    is_auto_calculated = models.BooleanField(
+        default=False,
+        verbose_name='Автоматически рассчитано'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Шаблон целей'
+        verbose_name_plural = 'Шаблоны целей'
+        db_table = 'goal_templates'
+        ordering = ['effective_from', 'weekday']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'effective_from', 'weekday'],
+                name='goal_template_unique_weekday',
+            ),
+            # NULL в уникальном индексе не сравнивается - базовая строка версии отдельно
+            models.UniqueConstraint(
+                fields=['user', 'effective_from'],
+                condition=models.Q(weekday__isnull=True),
+                name='goal_template_unique_base',
+            ),
+        ]
+    
+    def __str__(self):
+        weekday = f' ({self.get_weekday_display()})' if self.weekday is not None else ''
+        return f'Шаблон целей {self.user.username} с {self.effective_from}{weekday}'
+
+
 class Meal(models.Model):
     """Модель приёма пищи"""
     MEAL_TYPE_CHOICES = [
@@ -123,21 +198,15 @@ class Dish(models.Model):
         validators=[MinValueValidator(0)],
         verbose_name='Калории (ккал)'
     )
-    proteins = models.DecimalField(
-        max_digits=6,
-        decimal_places=2,
+    proteins = CentigramField(
         validators=[MinValueValidator(0)],
         verbose_name='Белки (г)'
     )
-    fats = models.DecimalField(
-        max_digits=6,
-        decimal_places=2,
+    fats = CentigramField(
         validators=[MinValueValidator(0)],
         verbose_name='Жиры (г)'
     )
-    carbohydrates = models.DecimalField(
-        max_digits=6,
-        decimal_places=2,
+    carbohydrates = CentigramField(
         validators=[MinValueValidator(0)],
         verbose_name='Углеводы (г)'
     )
@@ -0,0 +1,107 @@
+"""
+Расчёты КБЖУ по дням на колоночных массивах
+
+Значения хранятся по столбцам: для каждого показателя - массив array('q')
+длиной в число дней диапазона (калории в ккал, БЖУ в сантиграммах, см.
+core.fields). Суммы, проценты выполнения целей, скользящие средние и
+дефицит/профицит считаются целочисленно, одним проходом по строкам или по
+дням, без Decimal и float-сумм. Используется данными за день (один день)
+и статистикой за неделю и произвольный диапазон.
+"""
+from array import array
+
+from .fields import CENTIGRAMS_PER_GRAM
+
+MACROS = ('calories', 'proteins', 'fats', 'carbohydrates')
+
+# БЖУ - в сантиграммах, калории - в ккал
+SCALE = {'calories': 1, 'proteins': CENTIGRAMS_PER_GRAM, 'fats': CENTIGRAMS_PER_GRAM, 'carbohydrates': CENTIGRAMS_PER_GRAM}
+
+
+def zeros(days, typecode='q'):
+    return array(typecode, bytes(array(typecode).itemsize * days))
+
+
+def sum_columns(rows, indexes, days=1, day_of=None):
+    """
+    Суммы по дням за один проход по строкам.
+
+    Args:
+        rows: кортежи (values_list() блюд или уже сгруппированные по дате суммы)
+        indexes: позиции калорий, белков, жиров и углеводов в строке (в порядке MACROS)
+        days: длина диапазона
+        day_of: функция строка -> номер дня в диапазоне (None - все строки в день 0)
+
+    Returns:
+        dict {показатель: array('q') длины days}
+    """
+    columns = [zeros(days) for _ in MACROS]
+    for row in rows:
+        day = day_of(row) if day_of is not None else 0
+        for column, index in zip(columns, indexes):
+            value = row[index]
+            if value:
+                column[day] += value
+    return dict(zip(MACROS, columns))
+
+
+def goal_columns(rows, indexes, days=1, day_of=None):
+    """
+    Цели по дням: значения (как sum_columns) и маска дней, для которых цель задана.
+
+    Returns:
+        tuple ({показатель: array('q')}, array('b'))
+    """
+    rows = list(rows)
+    has_goal = zeros(days, 'b')
+    for row in rows:
+        has_goal[day_of(row) if day_of is not None else 0] = 1
+    return sum_columns(rows, indexes, days, day_of), has_goal
+
+
+def percentages(totals, goals):
+    """Проценты выполнения целей; 0.0 при отсутствующей или нулевой цели"""
+    return {
+        macro: array('d', (
+            total * 100 / goal if goal > 0 else 0.0
+            for total, goal in zip(totals[macro], goals[macro])
+        ))
+        for macro in MACROS
+    }
+
+
+def balance(totals, goals, has_goal):
+    """Дефицит (<0) / профицит (>0) относительно цели; 0 для дней без цели"""
+    return {
+        macro: array('q', (
+            total - goal if flag else 0
+            for total, goal, flag in zip(totals[macro], goals[macro], has_goal)
+        ))
+        for macro in MACROS
+    }
+
+
+def rolling_average(series, window):
+    """
+    Скользящее среднее за window дней, заканчивающихся текущим (сумма окна
+    обновляется за O(1)); первые дни - среднее по уже прошедшим дням.
+    """
+    result = zeros(len(series), 'd')
+    running = 0
+    for index, value in enumerate(series):
+        running += value
+        if index >= window:
+            running -= series[index - window]
+        result[index] = running / min(index + 1, window)
+    return result
+
+
+def to_units(macro, value):
+    """Значение столбца в единицах API: ккал (int) или граммы (float)"""
+    scale = SCALE[macro]
+    return value if scale == 1 else value / scale
+
+
+def day_values(columns, day):
+    """{показатель: значение в единицах API} для одного дня"""
+    return {macro: to_units(macro, columns[macro][day]) for macro in MACROS}
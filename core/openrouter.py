@@ -0,0 +1,363 @@
+"""
+Клиент OpenRouter API (распознавание блюд по фото и поиск КБЖУ)
+
+Формирование запросов и разбор ответов общие для синхронных view
+(requests) и асинхронных (httpx.AsyncClient, см. core.async_views).
+"""
+import json
+import logging
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+RECOGNITION_MODEL = "openai/gpt-4o"
+NUTRITION_MODEL = "openai/gpt-4o-mini"
+
+RECOGNITION_TITLE = "Calorio - Dish Recognition"
+NUTRITION_TITLE = "Calorio - Nutrition Search"
+
+RECOGNITION_TIMEOUT = 60
+NUTRITION_TIMEOUT = 30
+
+RECOGNITION_PROMPT = """Analyze this food image and determine:
+1. Dish name (in Russian language)
+2. Approximate portion weight in grams
+3. Calories (kcal)
+4. Proteins (g)
+5. Fats (g)
+6. Carbohydrates (g)
+
+Respond ONLY in JSON format without any additional comments or markdown:
+{
+  "name": "dish name in Russian",
+  "weight": weight_in_grams,
+  "calories": calories,
+  "proteins": proteins,
+  "fats": fats,
+  "carbohydrates": carbohydrates
+}
+
+If you cannot determine exact values, use realistic estimates based on typical values for similar dishes."""
+
+
+class OpenRouterTransportError(Exception):
+    """Сетевая ошибка при обращении к OpenRouter (таймаут, обрыв соединения)"""
+
+
+def api_url():
+    """URL chat completions (переопределяется settings.OPENROUTER_API_URL, например для стаба)"""
+    return getattr(settings, 'OPENROUTER_API_URL', '') or DEFAULT_API_URL
+
+
+def api_key():
+    return getattr(settings, 'OPENROUTER_API_KEY', '')
+
+
+def _encode(payload, title):
+    """
+    Тело и заголовки запроса.
+
+    Тело сериализуется вручную в UTF-8 (ensure_ascii=False), а значения
+    заголовков должны быть ASCII: кириллица в X-Title приводит к
+    UnicodeEncodeError и запрос до OpenRouter даже не уходит.
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = {
+        "Authorization": f"Bearer {api_key()}",
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        "HTTP-Referer": getattr(settings, 'SITE_URL', 'http://217.26.29.106'),
+        "X-Title": title,
+    }
+    return body, headers
+
+
+def recognition_payload(base64_data):
+    """Запрос распознавания блюда по изображению (base64 без префикса)"""
+    return {
+        "model": RECOGNITION_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": RECOGNITION_PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_data}"}},
+                ],
+            }
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.1,
+        # Просим строгий JSON (сильно снижает шанс "Некорректные данные от API")
+        "response_format": {"type": "json_object"},
+    }
+
+
+def nutrition_payload(food_name, weight_grams):
+    """Запрос КБЖУ по названию блюда"""
+    prompt = f"""Определи пищевую ценность (КБЖУ) для блюда: {food_name}, вес {weight_grams}г.
+
+Верни ТОЛЬКО JSON:
+{{
+  "name": "название на русском",
+  "weight": {weight_grams},
+  "calories": число,
+  "proteins": число,
+  "fats": число,
+  "carbohydrates": число
+}}
+
+Используй реалистичные значения для указанного веса."""
+    return {
+        "model": NUTRITION_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 300,
+        "temperature": 0.1,
+    }
+
+
+@contextmanager
+def _observe(payload):
+    """
+    Длительность и исход запроса в метриках (и в профиле запроса).
+
+    Исход добавляется в выданный список; если его нет - запрос завершился
+    сетевой ошибкой (transport_error).
+    """
+    outcome = []
+    started = time.perf_counter()
+    metrics.OPENROUTER_IN_FLIGHT.inc()
+    try:
+        yield outcome
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.OPENROUTER_IN_FLIGHT.dec()
+        profiling.add_time('upstream', elapsed)
+        metrics.OPENROUTER_DURATION.observe(
+            elapsed,
+            model=payload.get('model', ''),
+            outcome=outcome[0] if outcome else 'transport_error',
+        )
+
+
+def post(payload, title, timeout):
+    """
+    Синхронный запрос к OpenRouter.
+
+    Returns:
+        tuple (status_code, body_bytes)
+
+    Raises:
+        OpenRouterTransportError: при сетевой ошибке
+    """
+    import requests
+
+    body, headers = _encode(payload, title)
+    with _observe(payload) as outcome:
+        try:
+            response = requests.post(api_url(), headers=headers, data=body, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            raise OpenRouterTransportError(str(e)) from e
+        outcome.append(metrics.openrouter_outcome(response.status_code))
+    return response.status_code, response.content
+
+
+# Один AsyncClient (пул соединений) на event loop: клиент нельзя
+# переиспользовать между циклами, а в воркере uvicorn цикл один
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client():
+    import asyncio
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        max_connections = getattr(settings, 'OPENROUTER_MAX_CONNECTIONS', 200)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 4),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def apost(payload, title, timeout):
+    """Асинхронный запрос к OpenRouter (не блокирует воркер на время ожидания LLM)"""
+    import httpx
+
+    body, headers = _encode(payload, title)
+    with _observe(payload) as outcome:
+        try:
+            response = await _async_client().post(api_url(), headers=headers, content=body, timeout=timeout)
+        except httpx.HTTPError as e:
+            raise OpenRouterTransportError(str(e) or e.__class__.__name__) from e
+        outcome.append(metrics.openrouter_outcome(response.status_code))
+    return response.status_code, response.content
+
+
+def error_text(body):
+    """Текст ошибки для логов (ключ API скрыт)"""
+    try:
+        text = str(json.loads(body.decode('utf-8')))
+    except Exception:
+        try:
+            text = body.decode('utf-8', 'replace')
+        except Exception:
+            text = "Не удалось прочитать ответ"
+    key = api_key()
+    if key:
+        text = text.replace(key, '***HIDDEN***')
+    return text[:500]
+
+
+def message_content(body):
+    """
+    Текст ответа модели (choices[0].message.content).
+
+    Raises:
+        ValueError: если ответ не JSON или формат неожиданный
+    """
+    try:
+        result = json.loads(body.decode('utf-8'))
+    except Exception as e:
+        raise ValueError(f"Не удалось распарсить ответ от API: {str(e)}")
+
+    if isinstance(result, dict) and result.get('choices'):
+        content_raw = result['choices'][0]['message']['content']
+        if isinstance(content_raw, bytes):
+            return content_raw.decode('utf-8')
+        return str(content_raw)
+
+    logger.error(f"Ответ API (первые 500 символов): {str(result)[:500]}")
+    raise ValueError("Неожиданный формат ответа от API")
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Достаём первый валидный JSON-объект из произвольного текста.
+    Работает лучше, чем find('{')..rfind('}') (не ломается на лишних скобках).
+    """
+    if not text:
+        return None
+    s = text.strip()
+    # убираем markdown fences
+    s = s.replace("```json", "").replace("```", "").strip()
+    start = s.find("{")
+    if start == -1:
+        return None
+    end = _json_object_end(s, start)
+    return s[start:end + 1] if end is not None else None
+
+
+def _json_object_end(s: str, start: int) -> Optional[int]:
+    """Индекс скобки, закрывающей объект с s[start], или None (скобки внутри строк не считаются)"""
+    in_str = False
+    esc = False
+    depth = 0
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == "\"":
+                in_str = False
+        elif ch == "\"":
+            in_str = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def parse_recognized_dish(content):
+    """
+    Распознанное блюдо из ответа модели.
+
+    Raises:
+        ValueError: если JSON извлечь не удалось
+    """
+    content_cleaned = content.replace('```json', '').replace('```', '').strip()
+    dish_data: Optional[Dict[str, Any]] = None
+    try:
+        parsed = json.loads(content_cleaned)
+    except Exception:
+        extracted = extract_json_object(content_cleaned)
+        parsed = json.loads(extracted) if extracted else None
+
+    # Нормализуем разные форматы
+    if isinstance(parsed, dict):
+        # Иногда модель возвращает {"recognized_dishes":[{...}]}
+        dishes = parsed.get("recognized_dishes")
+        if "recognized_dishes" in parsed and isinstance(dishes, list) and dishes:
+            if isinstance(dishes[0], dict):
+                dish_data = dishes[0]
+        else:
+            dish_data = parsed
+    elif isinstance(parsed, list) and parsed and isinstance(parsed[0], dict):
+        dish_data = parsed[0]
+
+    if not dish_data:
+        logger.error(f"Не удалось распарсить JSON из ответа модели. content: {content[:500]}")
+        raise ValueError("Не удалось извлечь JSON из ответа")
+
+    # Поддерживаем и русские ключи на всякий случай
+    name = dish_data.get("name") or dish_data.get("название") or "Неизвестное блюдо"
+    weight_val = dish_data.get("weight") or dish_data.get("вес") or 100
+    calories_val = dish_data.get("calories") or dish_data.get("калории") or 0
+    proteins_val = dish_data.get("proteins") or dish_data.get("белки") or 0
+    fats_val = dish_data.get("fats") or dish_data.get("жиры") or 0
+    carbs_val = dish_data.get("carbohydrates") or dish_data.get("углеводы") or 0
+
+    return {
+        "name": str(name).strip(),
+        "weight": max(1, int(float(weight_val))),
+        "calories": max(0, int(float(calories_val))),
+        "proteins": round(max(0, float(proteins_val)), 2),
+        "fats": round(max(0, float(fats_val)), 2),
+        "carbohydrates": round(max(0, float(carbs_val)), 2),
+        "confidence": 0.8,
+    }
+
+
+def parse_nutrition(body, food_name, weight_grams):
+    """КБЖУ из ответа модели или None, если ответ разобрать не удалось"""
+    try:
+        content = message_content(body)
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        logger.error(f"Неожиданный формат ответа от OpenRouter API: {str(e)}")
+        return None
+
+    content_cleaned = content.replace('```json', '').replace('```', '').strip()
+    start_idx = content_cleaned.find('{')
+    end_idx = content_cleaned.rfind('}')
+    if start_idx == -1 or end_idx <= start_idx:
+        logger.error(f"В ответе модели нет JSON: {content_cleaned[:200]}")
+        return None
+
+    try:
+        dish_data = json.loads(content_cleaned[start_idx:end_idx + 1])
+        return {
+            "name": str(dish_data.get("name", food_name)).strip(),
+            "weight": max(1, int(float(dish_data.get("weight", weight_grams)))),
+            "calories": max(0, int(float(dish_data.get("calories", 0)))),
+            "proteins": round(max(0, float(dish_data.get("proteins", 0))), 2),
+            "fats": round(max(0, float(dish_data.get("fats", 0))), 2),
+            "carbohydrates": round(max(0, float(dish_data.get("carbohydrates", 0))), 2),
+        }
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Ошибка парсинга JSON из ответа: {str(e)}, content: {content_cleaned[:200]}")
+        return None
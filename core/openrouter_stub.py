@@ -0,0 +1,265 @@
+"""
+Локальная заглушка OpenRouter (/api/v1/chat/completions) для тестов и нагрузки
+
+Отвечает в формате chat completions детерминированным JSON блюда (или
+заготовленными ответами из файла) после задержки с заданным
+распределением. Часть запросов может завершаться ошибками OpenRouter
+(402 - нет кредитов, 429 - лимит, 5xx) или некорректным ответом.
+Сервер направляется на заглушку через OPENROUTER_API_URL:
+
+    python manage.py openrouter_stub --port 8090 --latency-ms 800 --jitter-ms 300 \\
+        --distribution lognormal --fail 429:0.05 --fail 502:0.01 --malformed-rate 0.02
+    OPENROUTER_API_URL=http://127.0.0.1:8090/api/v1/chat/completions gunicorn ...
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_COMPLETIONS_PATH = '/api/v1/chat/completions'
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+# body - обрезанный JSON ответа, content - текст без JSON вместо блюда,
+# choices - ответ без choices
+MALFORMED_MODES = ('body', 'content', 'choices')
+
+# Тела ошибок в формате OpenRouter
+ERROR_MESSAGES = {
+    400: 'Bad request',
+    401: 'No auth credentials found',
+    402: 'Insufficient credits',
+    429: 'Rate limit exceeded',
+    500: 'Internal server error',
+    502: 'Provider returned error',
+    503: 'No available provider',
+    504: 'Gateway timeout',
+}
+
+
+class StubConfig:
+    """
+    Поведение заглушки.
+
+    Args:
+        latency_ms: задержка ответа (медиана для lognormal)
+        jitter_ms: разброс задержки: полуширина для uniform, стандартное
+            отклонение для normal, для lognormal - σ = ln(1 + jitter/latency)
+        distribution: одно из DISTRIBUTIONS
+        failures: {статус: доля ответов}, например {429: 0.05, 502: 0.01}
+        error_rate: доля ответов 500 (сокращение для failures={500: ...})
+        malformed_rate: доля некорректных ответов со статусом 200
+        malformed_mode: одно из MALFORMED_MODES
+        canned: {название блюда в нижнем регистре: КБЖУ на 100 г}
+        seed: seed генератора (воспроизводимые задержки и ошибки)
+    """
+
+    def __init__(self, latency_ms=500, error_rate=0.0, seed=None, jitter_ms=0, distribution='fixed',
+                 failures=None, malformed_rate=0.0, malformed_mode='content', canned=None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'Неизвестное распределение задержки: {distribution}')
+        if malformed_mode not in MALFORMED_MODES:
+            raise ValueError(f'Неизвестный режим некорректного ответа: {malformed_mode}')
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.failures = dict(failures or {})
+        if error_rate:
+            self.failures[500] = self.failures.get(500, 0.0) + error_rate
+        if sum(self.failures.values()) + malformed_rate > 1:
+            raise ValueError('Суммарная доля ошибок больше 1')
+        self.malformed_rate = malformed_rate
+        self.malformed_mode = malformed_mode
+        self.canned = {name.lower(): values for name, values in (canned or {}).items()}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    @property
+    def error_rate(self):
+        return self.failures.get(500, 0.0)
+
+    @error_rate.setter
+    def error_rate(self, value):
+        self.failures[500] = value
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def latency(self):
+        """Задержка очередного ответа в миллисекундах"""
+        if self.distribution == 'fixed' or not self.jitter_ms:
+            return self.latency_ms
+        with self.lock:
+            if self.distribution == 'uniform':
+                value = self.random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            elif self.distribution == 'normal':
+                value = self.random.gauss(self.latency_ms, self.jitter_ms)
+            else:
+                sigma = math.log(1 + self.jitter_ms / self.latency_ms) if self.latency_ms else 0
+                value = self.random.lognormvariate(math.log(self.latency_ms or 1), sigma)
+        return max(0.0, value)
+
+    def outcome(self):
+        """
+        Исход очередного запроса.
+
+        Returns:
+            статус ошибки (int), 'malformed' или None для обычного ответа
+        """
+        value = self.roll()
+        for status_code, rate in sorted(self.failures.items()):
+            if value < rate:
+                return status_code
+            value -= rate
+        if value < self.malformed_rate:
+            return 'malformed'
+        return None
+
+
+def load_canned(path):
+    """
+    Заготовленные ответы из JSON-файла:
+
+        {"Плов": {"calories": 180, "proteins": 6, "fats": 7, "carbohydrates": 24}, ...}
+
+    Значения - на 100 г, масштабируются на вес из запроса.
+    """
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _prompt_text(payload):
+    """Текст промпта из messages (content - строка или список частей)"""
+    parts = []
+    for message in payload.get('messages', []):
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get('text', '') for part in content if isinstance(part, dict))
+    return '\n'.join(parts)
+
+
+def canned_dish(payload, canned=None):
+    """Детерминированный ответ модели: одно и то же блюдо для одного промпта"""
+    prompt = _prompt_text(payload)
+    match = re.search(r'для блюда: (.+?), вес (\d+)г', prompt)
+    name, weight = (match.group(1), int(match.group(2))) if match else ('Тестовое блюдо', 250)
+
+    values = (canned or {}).get(name.lower())
+    if values is not None:
+        return {
+            'name': values.get('name', name),
+            'weight': weight,
+            'calories': int(values.get('calories', 0) * weight / 100),
+            **{
+                field: round(values.get(field, 0) * weight / 100, 2)
+                for field in ('proteins', 'fats', 'carbohydrates')
+            },
+        }
+
+    factor = (sum(prompt.encode('utf-8')) % 200 + 50) / 100
+    return {
+        'name': name,
+        'weight': weight,
+        'calories': int(weight * factor),
+        'proteins': round(weight * factor / 20, 2),
+        'fats': round(weight * factor / 30, 2),
+        'carbohydrates': round(weight * factor / 8, 2),
+    }
+
+
+def completion(content):
+    return {
+        'id': 'stub-completion',
+        'object': 'chat.completion',
+        'model': 'stub',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+    }
+
+
+def malformed(mode, dish):
+    """Тело некорректного ответа со статусом 200"""
+    if mode == 'body':
+        data = json.dumps(completion(json.dumps(dish, ensure_ascii=False)), ensure_ascii=False).encode('utf-8')
+        return data[:len(data) // 2]
+    if mode == 'choices':
+        return {'id': 'stub-completion', 'object': 'chat.completion', 'model': 'stub', 'choices': []}
+    return completion('Извините, я не могу определить пищевую ценность этого блюда.')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = 'OpenRouterStub/1.0'
+
+    def log_message(self, format, *args):
+        # Логи запросов заглушки не нужны в выводе нагрузочного теста
+        pass
+
+    def _send(self, status_code, body, headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        # Счётчик - до отправки тела: клиент может проверить stats сразу после ответа
+        with self.server.stats_lock:
+            self.server.stats[status_code] += 1
+        self.wfile.write(data)
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+
+        if self.path.split('?')[0] != CHAT_COMPLETIONS_PATH:
+            return self._send(404, {'error': {'message': 'Not found', 'code': 404}})
+        try:
+            payload = json.loads(raw.decode('utf-8'))
+        except ValueError:
+            return self._send(400, {'error': {'message': 'Invalid JSON', 'code': 400}})
+
+        time.sleep(config.latency() / 1000)
+        outcome = config.outcome()
+        dish = canned_dish(payload, config.canned)
+        if outcome == 'malformed':
+            return self._send(200, malformed(config.malformed_mode, dish))
+        if outcome is not None:
+            headers = {'Retry-After': '1'} if outcome == 429 else None
+            message = ERROR_MESSAGES.get(outcome, 'Injected upstream error')
+            return self._send(outcome, {'error': {'message': message, 'code': outcome}}, headers)
+        return self._send(200, completion(json.dumps(dish, ensure_ascii=False)))
+
+
+def make_server(host='127.0.0.1', port=8090, config=None):
+    """
+    HTTP-сервер заглушки (каждый запрос - в своём потоке).
+
+    server.stats - счётчик ответов по статусам.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = config or StubConfig()
+    server.stats = Counter()
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def start_in_thread(host='127.0.0.1', port=0, config=None):
+    """
+    Запускает заглушку в фоновом потоке.
+
+    Returns:
+        tuple (server, url) - url указывает на chat completions
+    """
+    server = make_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, name='openrouter-stub', daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f'http://{bound_host}:{bound_port}{CHAT_COMPLETIONS_PATH}'
@@ -0,0 +1,389 @@
+"""
+Профилирование отдельных запросов (включается PROFILING_ENABLED)
+
+Запрос попадает в выборку:
+- с вероятностью PROFILING_SAMPLE_RATE;
+- если пользователь из PROFILING_USERS (id из JWT access-токена);
+- по заголовку PROFILING_HEADER со значением PROFILING_TOKEN.
+
+Для запроса из выборки считается разбивка времени: SQL (число и время),
+сериализаторы, обращения к OpenRouter, рендеринг ответа. Она отдаётся
+в заголовке Server-Timing (видна в DevTools), пишется в лог и, при заданном
+PROFILING_DIR, в <id>.json. PROFILING_CAPTURE дополнительно снимает профиль:
+cprofile - <id>.prof (pstats), stack - <id>.folded (сэмплы стека раз
+в PROFILING_STACK_INTERVAL_MS, формат flamegraph.pl/speedscope).
+Просмотр и агрегация по view - команда profiles.
+"""
+import cProfile
+import functools
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import QueryTimer, track_queries
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('sql', 'serializer', 'upstream', 'render')
+
+CAPTURE_MODES = ('cprofile', 'stack')
+
+_current = ContextVar('calorio_profile', default=None)
+
+
+class RequestProfile:
+    """Разбивка времени одного запроса по фазам (секунды)"""
+
+    def __init__(self, request, reason):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = request.method
+        self.path = request.path
+        self.reason = reason
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.sql_count = 0
+        self.total = 0.0
+        self.view = None
+        self.status_code = None
+        self._depth = 0
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'view': self.view,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status_code,
+            'reason': self.reason,
+            'total_ms': round(self.total * 1000, 3),
+            'sql_count': self.sql_count,
+            **{f'{phase}_ms': round(value * 1000, 3) for phase, value in self.phases.items()},
+        }
+
+    def server_timing(self):
+        parts = [f'{phase};dur={value * 1000:.1f}' for phase, value in self.phases.items()]
+        parts.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def add_time(phase, seconds):
+    """Добавляет время к фазе профилируемого запроса (без профиля - ничего)"""
+    profile = _current.get()
+    if profile is not None:
+        profile.phases[phase] += seconds
+
+
+def _timed(phase, method):
+    """
+    Обёртка метода: время вызова добавляется к фазе.
+
+    Вложенные вызовы (сериализатор внутри сериализатора) не учитываются
+    повторно.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None or profile._depth:
+            return method(*args, **kwargs)
+        profile._depth += 1
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile._depth -= 1
+            profile.phases[phase] += time.perf_counter() - started
+
+    return wrapper
+
+
+def timed(phase):
+    """Декоратор: время вызова функции добавляется к фазе (как у сериализаторов)"""
+    def decorator(function):
+        return _timed(phase, function)
+    return decorator
+
+
+_patch_lock = threading.Lock()
+_patch_depth = 0
+_serializer_originals = None
+
+
+@contextmanager
+def _serializer_timing():
+    """
+    Время is_valid() и .data сериализаторов DRF на время профилируемого запроса.
+
+    Методы BaseSerializer подменяются, пока идёт хотя бы один профилируемый
+    запрос (параллельные учитываются счётчиком), и восстанавливаются после
+    последнего. Вне профиля обёртка сразу вызывает исходный метод.
+    """
+    global _patch_depth, _serializer_originals
+    from rest_framework.serializers import BaseSerializer
+
+    with _patch_lock:
+        if not _patch_depth:
+            _serializer_originals = (BaseSerializer.is_valid, BaseSerializer.data)
+            BaseSerializer.is_valid = _timed('serializer', BaseSerializer.is_valid)
+            BaseSerializer.data = property(_timed('serializer', BaseSerializer.data.fget))
+        _patch_depth += 1
+    try:
+        yield
+    finally:
+        with _patch_lock:
+            _patch_depth -= 1
+            if not _patch_depth:
+                BaseSerializer.is_valid, BaseSerializer.data = _serializer_originals
+                _serializer_originals = None
+
+
+class StackSampler:
+    """Сэмплирование стека потока запроса в фоновом потоке (folded stacks)"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _user_id(request):
+    """id пользователя из JWT access-токена (подпись проверяется) или None"""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    try:
+        return str(AccessToken(header[len('Bearer '):])[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError):
+        return None
+
+
+def sample_reason(request):
+    """Причина попадания запроса в выборку или None"""
+    token = getattr(settings, 'PROFILING_TOKEN', '')
+    header = getattr(settings, 'PROFILING_HEADER', 'X-Calorio-Profile')
+    if token and request.headers.get(header) == token:
+        return 'header'
+    users = {str(user_id) for user_id in getattr(settings, 'PROFILING_USERS', [])}
+    if users and _user_id(request) in users:
+        return 'user'
+    rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+    if rate and random.random() < rate:
+        return 'rate'
+    return None
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+def _save(profile, profiler=None, sampler=None):
+    directory = getattr(settings, 'PROFILING_DIR', '')
+    if not directory:
+        return
+    path = Path(directory)
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+        meta = profile.as_dict()
+        if profiler is not None:
+            profiler.dump_stats(path / f'{profile.id}.prof')
+            meta['capture'] = f'{profile.id}.prof'
+        elif sampler is not None:
+            (path / f'{profile.id}.folded').write_text(sampler.folded())
+            meta['capture'] = f'{profile.id}.folded'
+        (path / f'{profile.id}.json').write_text(json.dumps(meta, ensure_ascii=False))
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить профиль {profile.id}: {e}")
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов из выборки.
+
+    Ставится сразу после MetricsMiddleware. При выключенном PROFILING_ENABLED
+    исключается из цепочки (MiddlewareNotUsed) и ничего не стоит. Поддерживает
+    синхронную и асинхронную (ASGI) цепочку; в асинхронной cprofile и stack
+    снимают поток event loop, а фазы и SQL учитываются и в потоках sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        capture = getattr(settings, 'PROFILING_CAPTURE', '')
+        if capture and capture not in CAPTURE_MODES:
+            raise ValueError(f'PROFILING_CAPTURE: ожидается одно из {CAPTURE_MODES}, получено {capture}')
+        self.capture = capture
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = sample_reason(request)
+        if reason is None:
+            return self.get_response(request)
+        with self._profiling(request, reason) as profile:
+            response = self.get_response(request)
+            profile.status_code = response.status_code
+        return self._annotate(response, profile)
+
+    async def __acall__(self, request):
+        reason = sample_reason(request)
+        if reason is None:
+            return await self.get_response(request)
+        with self._profiling(request, reason) as profile:
+            response = await self.get_response(request)
+            profile.status_code = response.status_code
+        return self._annotate(response, profile)
+
+    @contextmanager
+    def _profiling(self, request, reason):
+        """Снимает профиль на время блока; после блока пишет его в лог и PROFILING_DIR"""
+        profile = RequestProfile(request, reason)
+        token = _current.set(profile)
+        timer = QueryTimer()
+        profiler = cProfile.Profile() if self.capture == 'cprofile' else None
+        sampler = None
+        if self.capture == 'stack':
+            interval = getattr(settings, 'PROFILING_STACK_INTERVAL_MS', 5) / 1000
+            sampler = StackSampler(threading.get_ident(), interval)
+
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Уже работает другой профилировщик (например, под отладчиком)
+                    profiler = None
+            if sampler is not None:
+                sampler.start()
+            with track_queries(timer), _serializer_timing():
+                yield profile
+        finally:
+            finished = time.perf_counter()
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            _current.reset(token)
+        profile.total = finished - started
+        rendered_at = getattr(request, '_profiling_render_started', None)
+        if rendered_at is not None:
+            profile.phases['render'] = finished - rendered_at
+
+        profile.phases['sql'] = timer.duration
+        profile.sql_count = timer.count
+        profile.view = _view_name(request)
+
+        logger.info(f"Профиль {profile.id}: {json.dumps(profile.as_dict(), ensure_ascii=False)}")
+        _save(profile, profiler, sampler)
+
+    @staticmethod
+    def _annotate(response, profile):
+        response['Server-Timing'] = profile.server_timing()
+        response['X-Profile-Id'] = profile.id
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response рендерится после view: время до конца цепочки - рендеринг
+        if _current.get() is not None:
+            request._profiling_render_started = time.perf_counter()
+        return response
+
+
+# --- Просмотр сохранённых профилей ---
+
+def load_profiles(directory, view=None):
+    """Сохранённые профили (метаданные <id>.json), новые первыми"""
+    profiles = []
+    for path in Path(directory).glob('*.json'):
+        try:
+            profile = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if view is None or profile.get('view') == view:
+            profiles.append(profile)
+    return sorted(profiles, key=lambda profile: profile['id'], reverse=True)
+
+
+def aggregate(profiles):
+    """
+    Сводка по view: число запросов, перцентили общего времени, средние по фазам.
+
+    Returns:
+        dict {view: {'requests', 'p50_ms', 'p95_ms', 'sql_count', '<фаза>_ms', ...}}
+    """
+    from .benchmarks import percentile
+
+    by_view = {}
+    for profile in profiles:
+        by_view.setdefault(profile['view'], []).append(profile)
+
+    summary = {}
+    for view, items in sorted(by_view.items()):
+        totals = [item['total_ms'] for item in items]
+        summary[view] = {
+            'requests': len(items),
+            'p50_ms': round(percentile(totals, 50), 3),
+            'p95_ms': round(percentile(totals, 95), 3),
+            'sql_count': round(sum(item['sql_count'] for item in items) / len(items), 2),
+            **{
+                f'{phase}_ms': round(sum(item[f'{phase}_ms'] for item in items) / len(items), 3)
+                for phase in PHASES
+            },
+        }
+    return summary
+
+
+def merge_folded(paths):
+    """Суммирует folded stacks нескольких профилей"""
+    stacks = Counter()
+    for path in paths:
+        for line in Path(path).read_text().splitlines():
+            stack, _, count = line.rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
@@ -0,0 +1,223 @@
+"""
+Квоты на дорогие операции (распознавание по фото, LLM-поиск КБЖУ)
+
+Квоты считаются по пользователю и его тарифному плану, а не по IP:
+у каждой операции есть дневной и месячный бюджет (settings.QUOTA_PLANS).
+Счётчики - целые числа в общем кэше с атомарным incr, чтение - один get_many.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+from .cache import get_cache
+from .exceptions import QuotaExceededException
+
+RECOGNITION = 'recognition'
+NUTRITION_LOOKUP = 'nutrition_lookup'
+
+# План для пользователей без активной подписки
+FREE_PLAN = 'free'
+# Бюджеты для платных планов, не перечисленных в QUOTA_PLANS явно
+DEFAULT_PAID_PLAN = 'default'
+
+DEFAULT_QUOTA_PLANS = {
+    FREE_PLAN: {
+        RECOGNITION: {'day': 10, 'month': 100},
+        NUTRITION_LOOKUP: {'day': 30, 'month': 300},
+    },
+    DEFAULT_PAID_PLAN: {
+        RECOGNITION: {'day': 100, 'month': 2000},
+        NUTRITION_LOOKUP: {'day': 300, 'month': 6000},
+    },
+}
+
+PLAN_CACHE_TIMEOUT = 300
+
+cache = get_cache('quota')
+
+
+class QuotaStatus:
+    """Состояние квоты пользователя на операцию"""
+
+    def __init__(self, plan, kind, limits, used, reset_at):
+        self.plan = plan
+        self.kind = kind
+        self.limits = limits
+        self.used = used
+        self.reset_at = reset_at
+
+    def remaining(self, period):
+        return max(0, self.limits[period] - self.used[period])
+
+    @property
+    def exceeded(self):
+        return any(self.used[period] > self.limits[period] for period in self.limits)
+
+    @property
+    def exhausted(self):
+        return any(self.remaining(period) == 0 for period in self.limits)
+
+    def retry_after(self, now=None):
+        """Секунды до сброса исчерпанного периода"""
+        now = now or datetime.now(dt_timezone.utc)
+        periods = [period for period in self.limits if self.remaining(period) == 0] or ['day']
+        return max(1, int(max((self.reset_at[period] - now).total_seconds() for period in periods)))
+
+    def headers(self):
+        """Заголовки ответа с остатком квоты"""
+        return {
+            # Значения заголовков должны быть ASCII: кириллические имена планов не передаём
+            'X-Quota-Plan': self.plan.encode('ascii', 'ignore').decode().strip() or 'paid',
+            'X-Quota-Limit-Day': str(self.limits['day']),
+            'X-Quota-Remaining-Day': str(self.remaining('day')),
+            'X-Quota-Limit-Month': str(self.limits['month']),
+            'X-Quota-Remaining-Month': str(self.remaining('month')),
+            'X-Quota-Reset': str(int(self.reset_at['day'].timestamp())),
+        }
+
+
+def _quota_plans():
+    """
+    DEFAULT_QUOTA_PLANS, дополненные settings.QUOTA_PLANS.
+
+    Переопределение сливается с умолчаниями по планам, операциям и периодам:
+    можно задать только изменившиеся бюджеты.
+    """
+    plans = {plan: dict(budget) for plan, budget in DEFAULT_QUOTA_PLANS.items()}
+    for plan, budget in (getattr(settings, 'QUOTA_PLANS', None) or {}).items():
+        merged = plans.setdefault(plan, {})
+        for kind, periods in budget.items():
+            merged[kind] = {**merged.get(kind, {}), **periods}
+    return plans
+
+
+def _plan_key(user_id):
+    return f'plan:{user_id}'
+
+
+def invalidate_user_plan(user_id):
+    """Сбрасывает закэшированный план (вызывается при изменении подписки)"""
+    cache.delete(_plan_key(user_id))
+
+
+def _load_plan(user_id):
+    from subscriptions.models import Subscription
+
+    row = Subscription.objects.filter(user_id=user_id).values_list('status', 'end_date', 'plan__name').first()
+    if row is None:
+        return ('expired', None, None)
+    return row
+
+
+def get_user_plan(user, now=None):
+    """
+    Имя плана для квот: план активной подписки или 'free'.
+
+    Статус и дата окончания кэшируются, активность проверяется при каждом
+    вызове, поэтому истечение подписки не требует инвалидации.
+    """
+    status, end_date, plan_name = cache.get_or_set(
+        _plan_key(user.pk), lambda: _load_plan(user.pk), PLAN_CACHE_TIMEOUT
+    )
+    now = now or datetime.now(dt_timezone.utc)
+    if status != 'active' or not end_date or end_date <= now or not plan_name:
+        return FREE_PLAN
+    return plan_name
+
+
+def _limits(plan, kind):
+    """Бюджет плана на операцию; чего нет у плана - берётся из плана 'default'"""
+    plans = _quota_plans()
+    return {**plans[DEFAULT_PAID_PLAN][kind], **plans.get(plan, {}).get(kind, {})}
+
+
+def _periods(now):
+    """Ключи и моменты сброса календарных периодов (UTC)"""
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = day_start.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    return {
+        'day': (now.strftime('%Y%m%d'), day_start + timedelta(days=1)),
+        'month': (now.strftime('%Y%m'), next_month),
+    }
+
+
+def _usage_key(user_id, kind, period, stamp):
+    return f'usage:{user_id}:{kind}:{period}:{stamp}'
+
+
+def get_quota_status(user, kind, now=None):
+    """Текущее состояние квоты без расходования (один get_many)"""
+    now = now or datetime.now(dt_timezone.utc)
+    plan = get_user_plan(user, now)
+    periods = _periods(now)
+    keys = {period: _usage_key(user.pk, kind, period, stamp) for period, (stamp, _) in periods.items()}
+    values = cache.get_many(list(keys.values()))
+    used = {period: int(values.get(key, 0)) for period, key in keys.items()}
+    reset_at = {period: reset for period, (_, reset) in periods.items()}
+    return QuotaStatus(plan, kind, _limits(plan, kind), used, reset_at)
+
+
+def consume_quota(user, kind, now=None):
+    """
+    Расходует одну единицу квоты.
+
+    Raises:
+        QuotaExceededException: если дневной или месячный бюджет исчерпан
+            (счётчики при этом откатываются)
+
+    Returns:
+        QuotaStatus после списания
+    """
+    now = now or datetime.now(dt_timezone.utc)
+    plan = get_user_plan(user, now)
+    limits = _limits(plan, kind)
+    periods = _periods(now)
+    used = {}
+    for period, (stamp, reset) in periods.items():
+        key = _usage_key(user.pk, kind, period, stamp)
+        timeout = int((reset - now).total_seconds()) + 60
+        cache.add(key, 0, timeout)
+        try:
+            used[period] = cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout)
+            used[period] = 1
+
+    status = QuotaStatus(plan, kind, limits, used, {period: reset for period, (_, reset) in periods.items()})
+    if status.exceeded:
+        for period, (stamp, _) in periods.items():
+            try:
+                cache.decr(_usage_key(user.pk, kind, period, stamp))
+            except ValueError:
+                pass
+        status.used = {period: value - 1 for period, value in used.items()}
+        raise QuotaExceededException(status)
+    return status
+
+
+def apply_quota_headers(response, status):
+    """Добавляет заголовки квоты в ответ"""
+    if status is not None:
+        for header, value in status.headers().items():
+            response[header] = value
+    return response
+
+
+class QuotaHeadersMixin:
+    """
+    Mixin для view с квотами: списание квоты и заголовки X-Quota-* в ответе
+    (в том числе в ответе 429 при исчерпании).
+    """
+
+    def consume_quota(self, request, kind):
+        try:
+            request.quota_status = consume_quota(request.user, kind)
+        except QuotaExceededException as exc:
+            request.quota_status = exc.quota_status
+            raise
+        return request.quota_status
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return apply_quota_headers(response, getattr(request, 'quota_status', None))
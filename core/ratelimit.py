@@ -0,0 +1,102 @@
+"""
+Rate limiting с постоянной памятью на ключ (sliding window counter)
+
+Для каждого окна хранятся два целочисленных счётчика: текущего и
+предыдущего интервала. Оценка числа запросов за последние W секунд:
+
+    prev * (W - elapsed) / W + current
+
+Счётчики увеличиваются атомарно (cache.incr, в Redis - INCRBY), поэтому
+лимиты корректны при параллельных запросах из разных воркеров.
+"""
+import math
+import time
+
+from .cache import get_cache
+
+
+class SlidingWindowLimiter:
+    """
+    Лимитер с несколькими окнами (например, 10 в минуту и 100 в день).
+
+    Args:
+        name: имя лимитера (часть ключа кэша)
+        windows: список пар (limit, seconds)
+        cache: NamespacedCache (по умолчанию пространство 'throttle')
+    """
+
+    def __init__(self, name, windows, cache=None):
+        self.name = name
+        self.windows = [(int(limit), int(seconds)) for limit, seconds in windows]
+        self.cache = cache or get_cache('throttle')
+
+    def _key(self, ident, seconds, index):
+        return f'{self.name}:{ident}:{seconds}:{index}'
+
+    def _incr(self, key, seconds):
+        # add() создаёт счётчик только если его ещё нет; incr атомарен
+        self.cache.add(key, 0, seconds * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Счётчик успел истечь между add и incr
+            self.cache.set(key, 1, seconds * 2)
+            return 1
+
+    @staticmethod
+    def _wait(limit, seconds, elapsed, previous, current):
+        """
+        Через сколько секунд оценка опустится настолько, чтобы пропустить запрос.
+
+        current - число запросов в текущем интервале без отклонённого.
+        """
+        if current + 1 <= limit:
+            if previous <= 0:
+                return 0.0
+            # previous * (W - t) / W + current + 1 <= limit
+            needed = seconds * (1 - (limit - current - 1) / previous)
+            return max(0.0, needed - elapsed)
+        # Текущий интервал исчерпан: ждём следующего, где он станет "предыдущим"
+        needed = seconds * (1 - (limit - 1) / current) if current > 0 else 0.0
+        return (seconds - elapsed) + max(0.0, needed)
+
+    def hit(self, ident, now=None):
+        """
+        Учитывает запрос и проверяет все окна.
+
+        Отклонённый запрос не расходует лимит (счётчики откатываются).
+
+        Returns:
+            tuple (allowed, wait) - разрешён ли запрос и сколько секунд ждать
+        """
+        now = time.time() if now is None else now
+        states = []
+        for limit, seconds in self.windows:
+            index = int(now // seconds)
+            states.append((limit, seconds, index, now - index * seconds))
+
+        previous_counts = self.cache.get_many(
+            [self._key(ident, seconds, index - 1) for limit, seconds, index, elapsed in states]
+        )
+
+        incremented = []
+        rejected = False
+        wait = 0.0
+        for limit, seconds, index, elapsed in states:
+            key = self._key(ident, seconds, index)
+            current = self._incr(key, seconds)
+            incremented.append(key)
+            previous = previous_counts.get(self._key(ident, seconds, index - 1), 0)
+            estimated = previous * (seconds - elapsed) / seconds + current
+            if estimated > limit:
+                rejected = True
+                wait = max(wait, self._wait(limit, seconds, elapsed, previous, current - 1))
+
+        if rejected:
+            for key in incremented:
+                try:
+                    self.cache.decr(key)
+                except ValueError:
+                    pass
+            return False, math.ceil(wait * 1000) / 1000
+        return True, 0.0
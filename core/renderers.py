@@ -0,0 +1,74 @@
+"""
+Рендереры ответов API
+
+FastJSONRenderer - JSON на orjson. Вывод совпадает со стандартным
+JSONRenderer DRF (компактный UTF-8, Decimal как число, datetime в формате
+DRF с 'Z', ленивые строки, UUID и т.п.), но сериализация в несколько раз
+быстрее. Без orjson или при запросе отступов (Accept: application/json;
+indent=N) используется стандартный рендерер.
+
+MessagePackRenderer - та же схема ответа в MessagePack
+(Accept: application/msgpack или ?format=msgpack): даты и Decimal
+передаются так же, как в JSON, меньше размер и быстрее разбор на клиенте.
+Подключается в REST_FRAMEWORK, только если установлен msgpack.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson указан в requirements
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack указан в requirements
+    msgpack = None
+
+# Типы, которые orjson не сериализует сам (Decimal, ленивые строки, QuerySet
+# и т.п.), а также даты (OPT_PASSTHROUGH_DATETIME) - как в DRF
+_fallback_encoder = JSONEncoder()
+
+# Разделители строк, которые DRF экранирует для безопасной вставки JSON в <script>
+_LINE_SEPARATOR = '\u2028'.encode('utf-8')
+_PARAGRAPH_SEPARATOR = '\u2029'.encode('utf-8')
+
+
+def dumps(data):
+    """JSON в байтах (UTF-8), как у FastJSONRenderer"""
+    content = orjson.dumps(
+        data, default=_fallback_encoder.default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+    if _LINE_SEPARATOR in content or _PARAGRAPH_SEPARATOR in content:
+        content = content.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson (media type и формат ответа прежние)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def packb(data):
+    """MessagePack в байтах, как у MessagePackRenderer"""
+    return msgpack.packb(data, default=_fallback_encoder.default, use_bin_type=True)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в MessagePack с той же схемой, что и JSON"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data)
@@ -0,0 +1,193 @@
+"""
+Версионированный кэш ответов для данных за день
+
+Ключ кэша: (пользователь, дата, версия, путь, media type). Версия дня хранится
+в кэше и увеличивается при любой записи Dish / Meal / DailyGoal, а версия
+шаблонов целей пользователя - при записи GoalTemplate (см. core.signals),
+поэтому старые записи просто перестают читаться. Так же кэшируется дашборд
+(данные за день + профиль и подписка): в его версию входит ещё версия
+аккаунта пользователя.
+В кэше лежит уже отрендеренное тело ответа: попадание в кэш не трогает
+ORM, сериализаторы и рендерер. Рядом с телом хранятся его сжатые варианты
+(по одному на кодировку, см. core.compression): попадание отдаёт готовые
+сжатые байты.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from . import compression
+from .cache import get_cache
+from .db_router import pin_to_primary
+
+cache = get_cache('day')
+
+# Версии живут дольше ответов: потеря версии безопасна (новая версия уникальна),
+# но приводит к лишнему промаху кэша
+VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _response_timeout():
+    return getattr(settings, 'DAY_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _version_key(user_id, date_obj):
+    return f'version:{user_id}:{date_obj.isoformat()}'
+
+
+def _goals_version_key(user_id):
+    return f'version:{user_id}:goals'
+
+
+def _account_version_key(user_id):
+    return f'version:{user_id}:account'
+
+
+def _response_key(request, user_id, date_obj, version):
+    # Путь входит в ключ: в теле ответа дата повторяется в том виде, в каком пришла
+    return f'response:{user_id}:{date_obj.isoformat()}:{version}:{request.path}:{request.accepted_media_type}'
+
+
+def _new_version():
+    """Начальная версия - время в микросекундах, чтобы не совпасть с вытесненной"""
+    return time.time_ns() // 1000
+
+
+def _init_version(key):
+    version = _new_version()
+    if not cache.add(key, version, VERSION_TIMEOUT):
+        version = cache.get(key, version)
+    return version
+
+
+def get_day_version(user_id, date_obj):
+    """
+    Текущая версия данных пользователя за день.
+
+    Составная: версия самого дня и версия шаблонов целей пользователя
+    (шаблон меняет цели сразу многих дней, см. bump_goals_version).
+    Обе читаются одним обращением к кэшу.
+    """
+    return _get_versions((_version_key(user_id, date_obj), _goals_version_key(user_id)))
+
+
+def get_dashboard_version(user_id, date_obj):
+    """Версия дашборда: версия дня, шаблонов целей и аккаунта (профиль, подписка)"""
+    return _get_versions((
+        _version_key(user_id, date_obj), _goals_version_key(user_id), _account_version_key(user_id),
+    ))
+
+
+def _get_versions(keys):
+    found = cache.get_many(keys)
+    return ':'.join(str(found[key] if key in found else _init_version(key)) for key in keys)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Версии нет в кэше - заводим новую уникальную
+        cache.set(key, _new_version(), VERSION_TIMEOUT)
+
+
+def _bump_twice(key):
+    """
+    Внутри транзакции версия увеличивается ещё раз после коммита: иначе
+    параллельный запрос мог бы закэшировать незакоммиченное состояние
+    под новой версией.
+    """
+    _bump(key)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(key))
+
+
+def _invalidate(user_id, key):
+    """
+    Пользователь закрепляется за основной БД до смены версии: иначе его
+    параллельный GET прочитал бы отстающую реплику и закэшировал устаревшие
+    данные под новой версией.
+    """
+    pin_to_primary(user_id)
+    _bump_twice(key)
+
+
+def bump_day_version(user_id, date_obj):
+    """Инвалидирует кэш ответов за день"""
+    if user_id is None or date_obj is None:
+        return
+    _invalidate(user_id, _version_key(user_id, date_obj))
+
+
+def bump_goals_version(user_id):
+    """Инвалидирует кэш ответов за все дни пользователя (изменились шаблоны целей)"""
+    if user_id is None:
+        return
+    _invalidate(user_id, _goals_version_key(user_id))
+
+
+def bump_account_version(user_id):
+    """Инвалидирует кэш дашборда пользователя (изменились профиль, email или подписка)"""
+    if user_id is None:
+        return
+    _invalidate(user_id, _account_version_key(user_id))
+
+
+def get_cached_day_response(request, user_id, date_obj, version):
+    """
+    Возвращает готовый HttpResponse из кэша (или 304) либо None при промахе.
+    """
+    entry = cache.get(_response_key(request, user_id, date_obj, version))
+    if entry is None:
+        return None
+
+    django_request = getattr(request, '_request', request)
+    not_modified = get_conditional_response(django_request, etag=entry['etag'])
+    if not_modified is not None:
+        response = not_modified
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        patch_cache_control(response, private=True, no_cache=True)
+        key = _response_key(request, user_id, date_obj, version)
+        response.precompressed = entry.get('encoded', {})
+        response.store_compressed = lambda coding, body: _store_encoded(key, entry, coding, body)
+    patch_vary_headers(response, ('Accept',))
+    if entry['etag']:
+        response['ETag'] = entry['etag']
+    return response
+
+
+def _store_encoded(key, entry, coding, body):
+    """Дописывает в запись кэша вариант тела, сжатый при отдаче"""
+    cache.set(key, {**entry, 'encoded': {**entry.get('encoded', {}), coding: body}}, _response_timeout())
+
+
+def store_day_response(response, request, user_id, date_obj, version, etag=None):
+    """
+    Сохраняет тело ответа в кэш после рендеринга (post-render callback).
+    """
+    if response.status_code != 200:
+        return response
+
+    key = _response_key(request, user_id, date_obj, version)
+
+    def _store(rendered):
+        # Тело сразу сжимается кодировкой этого клиента; middleware возьмёт готовый вариант
+        encoded = {}
+        variant = compression.encode_for(request, rendered)
+        if variant is not None:
+            coding, body = variant
+            encoded[coding] = body
+        rendered.precompressed = encoded
+        cache.set(key, {
+            'content': rendered.content,
+            'content_type': rendered['Content-Type'],
+            'etag': etag,
+            'encoded': encoded,
+        }, _response_timeout())
+
+    response.add_post_render_callback(_store)
+    return response
@@ -1,5 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Dish, DailyGoal, Meal
+from .batch import BATCH_PATH
+from .fields import centigrams, format_centigrams
+from .models import Dish, DailyGoal, GoalTemplate, Meal
+from .profiling import timed
+from django.utils import timezone
 from django.utils.dateparse import parse_date
 from .utils import auto_calculate_goals
 
@@ -136,6 +141,95 @@ class DishSerializer(serializers.ModelSerializer):
         return representation
 
 
+# --- Быстрые пути чтения ---
+#
+# Строки ответа собираются напрямую из values_list() без экземпляров моделей
+# и пофилдовой обработки DRF. Вывод совпадает с DishSerializer и
+# DailyGoalSerializer байт в байт (tests/test_read_rows.py).
+
+# БЖУ читаются сырыми сантиграммами (int), без Decimal
+DISH_ROW_FIELDS = (
+    'id', 'name', 'weight', 'calories',
+    centigrams('proteins'), centigrams('fats'), centigrams('carbohydrates'),
+    'created_at', 'updated_at', 'meal__date', 'meal__meal_type',
+)
+
+GOAL_ROW_FIELDS = (
+    'id', 'date', 'calories',
+    centigrams('proteins'), centigrams('fats'), centigrams('carbohydrates'),
+    'is_auto_calculated', 'created_at', 'updated_at',
+)
+
+# Позиции калорий и БЖУ в строках (для core.nutrition_math)
+DISH_MACRO_INDEXES = (3, 4, 5, 6)
+GOAL_MACRO_INDEXES = (2, 3, 4, 5)
+
+
+def _grams(value):
+    """Как DecimalField(decimal_places=2).to_representation: строка с двумя знаками"""
+    return None if value is None else format_centigrams(value)
+
+
+def _datetime(value, tz):
+    """Как DateTimeField.to_representation при ISO 8601 (UTC как 'Z')"""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(tz)
+    representation = value.isoformat()
+    if representation.endswith('+00:00'):
+        representation = representation[:-6] + 'Z'
+    return representation
+
+
+def dish_row(values, tz=None):
+    """Представление блюда из кортежа DISH_ROW_FIELDS (как DishSerializer(...).data)"""
+    tz = tz or timezone.get_current_timezone()
+    (pk, name, weight, calories, proteins, fats, carbohydrates,
+     created_at, updated_at, meal_date, meal_type) = values
+    row = {
+        'id': pk,
+        'name': name,
+        'weight': weight,
+        'calories': calories,
+        'proteins': _grams(proteins),
+        'fats': _grams(fats),
+        'carbohydrates': _grams(carbohydrates),
+        'created_at': _datetime(created_at, tz),
+        'updated_at': _datetime(updated_at, tz),
+    }
+    # Без приёма пищи date и meal_type не выводятся (как в DishSerializer)
+    if meal_date is not None:
+        row['date'] = meal_date.strftime('%Y-%m-%d')
+        row['meal_type'] = meal_type
+    return row
+
+
+@timed('serializer')
+def dish_rows(values_list):
+    """Представления блюд из queryset.values_list(*DISH_ROW_FIELDS) (или его страницы)"""
+    tz = timezone.get_current_timezone()
+    return [dish_row(values, tz) for values in values_list]
+
+
+@timed('serializer')
+def goal_row(values, tz=None):
+    """Представление цели из кортежа GOAL_ROW_FIELDS (как DailyGoalSerializer(...).data)"""
+    tz = tz or timezone.get_current_timezone()
+    pk, goal_date, calories, proteins, fats, carbohydrates, is_auto_calculated, created_at, updated_at = values
+    return {
+        'id': pk,
+        'date': goal_date.strftime('%Y-%m-%d'),
+        'calories': calories,
+        'proteins': _grams(proteins),
+        'fats': _grams(fats),
+        'carbohydrates': _grams(carbohydrates),
+        'is_auto_calculated': is_auto_calculated,
+        'created_at': _datetime(created_at, tz),
+        'updated_at': _datetime(updated_at, tz),
+    }
+
+
 class DailyGoalSerializer(serializers.ModelSerializer):
     """Сериализатор для целей КБЖУ на день"""
     date = serializers.DateField(format='%Y-%m-%d', input_formats=['%Y-%m-%d'], read_only=True)
@@ -187,6 +281,41 @@ class DailyGoalSerializer(serializers.ModelSerializer):
         return value
 
 
+class GoalTemplateSerializer(DailyGoalSerializer):
+    """Сериализатор шаблона целей (те же правила для КБЖУ, что и у цели на день)"""
+    date = None
+    effective_from = serializers.DateField(format='%Y-%m-%d', input_formats=['%Y-%m-%d'])
+    effective_to = serializers.DateField(format='%Y-%m-%d', input_formats=['%Y-%m-%d'], required=False, allow_null=True)
+    
+    class Meta:
+        model = GoalTemplate
+        fields = (
+            'id', 'effective_from', 'effective_to', 'weekday', 'calories', 'proteins', 'fats',
+            'carbohydrates', 'is_auto_calculated', 'created_at', 'updated_at'
+        )
+        read_only_fields = ('id', 'is_auto_calculated', 'created_at', 'updated_at')
+    
+    def validate(self, attrs):
+        """Один шаблон на пользователя, дату начала и день недели; окончание не раньше начала"""
+        effective_from = attrs.get('effective_from', getattr(self.instance, 'effective_from', None))
+        effective_to = attrs.get('effective_to', getattr(self.instance, 'effective_to', None))
+        if effective_to is not None and effective_to < effective_from:
+            raise serializers.ValidationError(
+                {'effective_to': ["Дата окончания не может быть раньше даты начала."]}
+            )
+        weekday = attrs.get('weekday', getattr(self.instance, 'weekday', None))
+        duplicates = GoalTemplate.objects.filter(
+            user=self.context['request'].user, effective_from=effective_from, weekday=weekday,
+        )
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError(
+                {'effective_from': ["Шаблон с этой датой начала и днём недели уже существует."]}
+            )
+        return attrs
+
+
 class DishRecognitionSerializer(serializers.Serializer):
     """Сериализатор для распознавания блюда по фотографии"""
     image_base64 = serializers.CharField(required=True, allow_blank=False)
@@ -249,6 +378,21 @@ class DishRecognitionSerializer(serializers.Serializer):
         return value
 
 
+ACTIVITY_LEVEL_CHOICES = [
+    ('sedentary', 'Малоподвижный'),
+    ('light', 'Лёгкая активность'),
+    ('moderate', 'Умеренная активность'),
+    ('active', 'Высокая активность'),
+    ('very_active', 'Очень высокая активность'),
+]
+
+GOAL_CHOICES = [
+    ('lose', 'Похудение'),
+    ('maintain', 'Поддержание'),
+    ('gain', 'Набор массы'),
+]
+
+
 class AutoCalculateGoalsSerializer(serializers.Serializer):
     """Сериализатор для автоматического расчёта целей КБЖУ"""
     weight = serializers.DecimalField(
@@ -270,13 +414,7 @@ class AutoCalculateGoalsSerializer(serializers.Serializer):
         help_text="Возраст в годах"
     )
     activity_level = serializers.ChoiceField(
-        choices=[
-            ('sedentary', 'Малоподвижный'),
-            ('light', 'Лёгкая активность'),
-            ('moderate', 'Умеренная активность'),
-            ('active', 'Высокая активность'),
-            ('very_active', 'Очень высокая активность'),
-        ],
+        choices=ACTIVITY_LEVEL_CHOICES,
         required=True,
         help_text="Уровень физической активности"
     )
@@ -287,11 +425,7 @@ class AutoCalculateGoalsSerializer(serializers.Serializer):
         help_text="Пол"
     )
     goal = serializers.ChoiceField(
-        choices=[
-            ('lose', 'Похудение'),
-            ('maintain', 'Поддержание'),
-            ('gain', 'Набор массы'),
-        ],
+        choices=GOAL_CHOICES,
         default='maintain',
         required=False,
         help_text="Цель"
@@ -322,6 +456,67 @@ class AutoCalculateGoalsSerializer(serializers.Serializer):
         return value
 
 
+class GoalScenarioSerializer(serializers.Serializer):
+    """Сценарий для дней недели: другой уровень активности и/или цель"""
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        min_length=1,
+        help_text="Дни недели (0 - понедельник, 6 - воскресенье)"
+    )
+    activity_level = serializers.ChoiceField(
+        choices=ACTIVITY_LEVEL_CHOICES,
+        required=False,
+        help_text="Уровень активности в эти дни"
+    )
+    goal = serializers.ChoiceField(
+        choices=GOAL_CHOICES,
+        required=False,
+        help_text="Цель в эти дни"
+    )
+
+
+class AutoCalculateGoalsRangeSerializer(AutoCalculateGoalsSerializer):
+    """Расчёт целей на диапазон дат; сценарии переопределяют параметры по дням недели"""
+    MAX_DAYS = 366
+    
+    date = None
+    start_date = serializers.DateField(
+        format='%Y-%m-%d',
+        input_formats=['%Y-%m-%d'],
+        required=True,
+        help_text="Первый день диапазона"
+    )
+    end_date = serializers.DateField(
+        format='%Y-%m-%d',
+        input_formats=['%Y-%m-%d'],
+        required=True,
+        help_text="Последний день диапазона (включительно)"
+    )
+    scenarios = GoalScenarioSerializer(
+        many=True,
+        required=False,
+        help_text="Сценарии по дням недели (остальные дни - по основным параметрам)"
+    )
+    
+    def validate_scenarios(self, value):
+        """Дни недели разных сценариев не пересекаются"""
+        seen = set()
+        for scenario in value:
+            weekdays = set(scenario['weekdays'])
+            if weekdays & seen:
+                raise serializers.ValidationError("Дни недели в сценариях не должны повторяться.")
+            seen |= weekdays
+        return value
+    
+    def validate(self, attrs):
+        start, end = attrs['start_date'], attrs['end_date']
+        if start > end:
+            raise serializers.ValidationError({'end_date': ["Дата окончания раньше даты начала."]})
+        if (end - start).days + 1 > self.MAX_DAYS:
+            raise serializers.ValidationError({'end_date': [f"Диапазон не должен превышать {self.MAX_DAYS} дней."]})
+        return attrs
+
+
 class FoodSearchSerializer(serializers.Serializer):
     """Сериализатор для поиска КБЖУ по названию продукта"""
     food_name = serializers.CharField(
@@ -336,3 +531,41 @@ class FoodSearchSerializer(serializers.Serializer):
         help_text="Вес в граммах (по умолчанию 100г)"
     )
 
+
+class BatchItemSerializer(serializers.Serializer):
+    """Подзапрос пакета"""
+    method = serializers.ChoiceField(
+        choices=['GET'],
+        default='GET',
+        help_text="HTTP-метод (поддерживается только GET)"
+    )
+    path = serializers.CharField(
+        max_length=2048,
+        help_text="Путь с query string, например /api/days/2025-01-15/"
+    )
+    
+    def validate_path(self, value):
+        if not value.startswith('/api/'):
+            raise serializers.ValidationError("Путь должен начинаться с /api/.")
+        if value.split('?', 1)[0] == BATCH_PATH:
+            raise serializers.ValidationError("Вложенные пакеты не поддерживаются.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Сериализатор пакета GET-запросов"""
+    requests = BatchItemSerializer(
+        many=True,
+        allow_empty=False,
+        help_text="Подзапросы; ответы возвращаются в том же порядке"
+    )
+    parallel = serializers.BooleanField(
+        default=False,
+        help_text="Выполнять подзапросы параллельно"
+    )
+    
+    def validate_requests(self, value):
+        limit = settings.BATCH_MAX_REQUESTS
+        if len(value) > limit:
+            raise serializers.ValidationError(f"Не более {limit} подзапросов в пакете.")
+        return value
@@ -0,0 +1,60 @@
+"""
+Сигналы core: инвалидация кэша ответов за день, дашборда и шаблонов целей при изменении данных
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Profile
+
+from .goal_schedule import invalidate_schedule
+from .models import DailyGoal, Dish, GoalTemplate, Meal
+from .response_cache import bump_account_version, bump_day_version, bump_goals_version
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+def invalidate_day_on_dish_change(sender, instance, **kwargs):
+    """Изменение блюда меняет данные дня, к которому привязан приём пищи"""
+    if not instance.meal_id:
+        return
+    try:
+        meal = instance.meal
+    except Meal.DoesNotExist:
+        # Приём пищи удаляется каскадно - его сигнал инвалидирует день сам
+        return
+    bump_day_version(meal.user_id, meal.date)
+
+
+@receiver(post_save, sender=Meal)
+@receiver(post_delete, sender=Meal)
+def invalidate_day_on_meal_change(sender, instance, **kwargs):
+    """Создание или удаление приёма пищи"""
+    bump_day_version(instance.user_id, instance.date)
+
+
+@receiver(post_save, sender=DailyGoal)
+@receiver(post_delete, sender=DailyGoal)
+def invalidate_day_on_goal_change(sender, instance, **kwargs):
+    """Изменение цели на день"""
+    bump_day_version(instance.user_id, instance.date)
+
+
+@receiver(post_save, sender=GoalTemplate)
+@receiver(post_delete, sender=GoalTemplate)
+def invalidate_goals_on_template_change(sender, instance, **kwargs):
+    """Шаблон меняет цели всех дней с effective_from: сбрасываем шаблоны и все дни пользователя"""
+    invalidate_schedule(instance.user_id)
+    bump_goals_version(instance.user_id)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_dashboard_on_profile_change(sender, instance, **kwargs):
+    """Профиль входит в дашборд"""
+    bump_account_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_dashboard_on_user_change(sender, instance, **kwargs):
+    """Email пользователя входит в дашборд"""
+    bump_account_version(instance.pk)
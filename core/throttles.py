@@ -1,8 +1,21 @@
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
-from rest_framework.exceptions import Throttled
-from django.core.cache import cache
-from django.utils import timezone
-from datetime import timedelta
+from rest_framework.throttling import AnonRateThrottle, BaseThrottle, UserRateThrottle
+
+from .cache import get_cache
+from .ratelimit import SlidingWindowLimiter
+
+# Счётчики throttling хранятся в общем кэше (Redis в production),
+# чтобы лимиты были едиными для всех воркеров gunicorn
+cache = get_cache('throttle')
+
+
+class AnonThrottle(AnonRateThrottle):
+    """Стандартный throttle для анонимных запросов на общем кэше"""
+    cache = cache
+
+
+class UserThrottle(UserRateThrottle):
+    """Стандартный throttle для авторизованных запросов на общем кэше"""
+    cache = cache
 
 
 class RegistrationThrottle(AnonRateThrottle):
@@ -10,6 +23,7 @@ class RegistrationThrottle(AnonRateThrottle):
     Throttle для эндпоинта регистрации.
     Ограничения: 5 запросов в час с одного IP.
     """
+    cache = cache
     rate = '5/h'
     
     def get_cache_key(self, request, view):
@@ -23,6 +37,7 @@ class LoginThrottle(AnonRateThrottle):
     Throttle для эндпоинта логина.
     Ограничения: 10 запросов в минуту с одного IP.
     """
+    cache = cache
     rate = '10/m'
     
     def get_cache_key(self, request, view):
@@ -31,64 +46,34 @@ class LoginThrottle(AnonRateThrottle):
         return f'throttle_login_{ident}'
 
 
-class DishRecognitionThrottle(AnonRateThrottle):
+class DishRecognitionThrottle(BaseThrottle):
     """
     Кастомный throttle для endpoint распознавания блюд.
-    Ограничения: 10 запросов в минуту и 100 запросов в день с одного IP.
+    Ограничения: 10 запросов в минуту и 100 запросов в день на пользователя
+    (для анонимных запросов - на IP).
+    
+    Защищает от всплесков; бюджет расходов по тарифу задают квоты (core.quotas).
+    Использует sliding window counter: O(1) памяти на ключ и атомарные
+    инкременты в общем кэше вместо списка временных меток.
     """
-    rate = '10/minute'
-    daily_rate = 100
+    limiter = SlidingWindowLimiter('dish_recognition', [(10, 60), (100, 86400)], cache)
     
-    def get_cache_key(self, request, view):
-        """Получаем ключ кэша на основе IP адреса"""
-        ident = self.get_ident(request)
-        return f'throttle_dish_recognition_{ident}'
+    def get_ident(self, request):
+        """Пользователи за одним NAT не делят лимит: ключ - id пользователя"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{super().get_ident(request)}'
     
     def allow_request(self, request, view):
         """
-        Проверяем оба лимита: по минутам и по дням
+        Проверяем оба лимита (по минутам и по дням) за одно обращение к лимитеру
         """
-        # Получаем IP адрес
-        ident = self.get_ident(request)
-        
-        # Проверяем лимит по минутам
-        minute_key = f'throttle_dish_recognition_minute_{ident}'
-        minute_history = cache.get(minute_key, [])
-        
-        # Удаляем старые записи (старше минуты)
-        now = timezone.now()
-        minute_history = [timestamp for timestamp in minute_history if now - timestamp < timedelta(minutes=1)]
-        
-        # Проверяем лимит по минутам
-        if len(minute_history) >= 10:
-            return False
-        
-        # Проверяем лимит по дням
-        day_key = f'throttle_dish_recognition_day_{ident}'
-        day_history = cache.get(day_key, [])
-        
-        # Удаляем старые записи (старше дня)
-        day_history = [timestamp for timestamp in day_history if now - timestamp < timedelta(days=1)]
-        
-        # Проверяем лимит по дням
-        if len(day_history) >= 100:
-            return False
-        
-        # Если оба лимита не превышены, разрешаем запрос
-        # Обновляем историю
-        minute_history.append(now)
-        day_history.append(now)
-        
-        # Сохраняем в кэш
-        cache.set(minute_key, minute_history, timeout=60)  # 60 секунд
-        cache.set(day_key, day_history, timeout=86400)  # 24 часа
-        
-        return True
+        allowed, self._wait = self.limiter.hit(self.get_ident(request))
+        return allowed
     
     def wait(self):
         """
         Возвращаем время ожидания до следующего разрешенного запроса
         """
-        # Возвращаем время до сброса минутного лимита
-        return 60
-
+        return getattr(self, '_wait', None)
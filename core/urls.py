@@ -1,12 +1,18 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     DishViewSet, 
     DailyGoalView, 
+    GoalTemplateViewSet,
     DishRecognitionView,
     AutoCalculateGoalsView,
+    AutoCalculateGoalsRangeView,
+    BatchView,
+    DashboardView,
     DayDataView,
-    FoodSearchView
+    FoodSearchView,
+    StatsRangeView,
 )
 
 app_name = 'core'
@@ -15,11 +21,36 @@ router = DefaultRouter()
 router.register(r'dishes', DishViewSet, basename='dish')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('days/<str:date>/', DayDataView.as_view(), name='day-data'),
+    path('stats/', StatsRangeView.as_view(), name='stats-range'),
+    path('stats/week/<str:date>/', StatsRangeView.as_view(), name='stats-week'),
     path('goals/auto-calculate/', AutoCalculateGoalsView.as_view(), name='goal-auto-calculate'),
+    path('goals/auto-calculate/range/', AutoCalculateGoalsRangeView.as_view(), name='goal-auto-calculate-range'),
+    path(
+        'goals/templates/',
+        GoalTemplateViewSet.as_view({'get': 'list', 'post': 'create'}),
+        name='goal-template-list',
+    ),
+    path(
+        'goals/templates/<int:pk>/',
+        GoalTemplateViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}),
+        name='goal-template-detail',
+    ),
     path('goals/<str:date>/', DailyGoalView.as_view(), name='goal-detail'),
     path('dishes/recognize/', DishRecognitionView.as_view(), name='dish-recognize'),
     path('dishes/search-nutrition/', FoodSearchView.as_view(), name='food-search'),
     path('', include(router.urls)),
 ]
 
+if settings.ASYNC_UPSTREAM_VIEWS:
+    # ASGI-режим: endpoint'ы, ожидающие OpenRouter, обслуживаются асинхронными view
+    from .async_views import AsyncDishRecognitionView, AsyncFoodSearchView, dish_collection
+
+    urlpatterns = [
+        path('dishes/', dish_collection, name='dish-list'),
+        path('dishes/recognize/', AsyncDishRecognitionView.as_view(), name='dish-recognize'),
+        path('dishes/search-nutrition/', AsyncFoodSearchView.as_view(), name='food-search'),
+    ] + urlpatterns
+
@@ -2,6 +2,7 @@
 Утилиты для расчёта КБЖУ
 """
 from decimal import Decimal
+from functools import lru_cache
 from typing import Optional
 
 
@@ -276,13 +277,72 @@ def _search_local_database(food_name, weight_grams):
     
     return None
 
-def search_food_nutrition(food_name, weight_grams=100):
+def _prepare_food_search(food_name, weight_grams, user):
+    """
+    Общая часть синхронного и асинхронного поиска до запроса к LLM.
+    
+    Returns:
+        tuple (result, use_llm): результат из локальной базы или необходимость
+        обращения к OpenRouter (квота к этому моменту уже списана)
+    """
+    import logging
+    from django.conf import settings
+    
+    logger = logging.getLogger(__name__)
+    
+    # Сначала пробуем локальную базу данных
+    local_result = _search_local_database(food_name, weight_grams)
+    if local_result:
+        logger.info(f"Найдено в локальной базе: {food_name}")
+        return local_result, False
+    
+    # Получаем API ключ из настроек
+    api_key = getattr(settings, 'OPENROUTER_API_KEY', '')
+    
+    if not api_key:
+        logger.warning("OpenRouter API ключ не настроен, используем только локальную базу")
+        return None, False
+    
+    if user is not None:
+        from .quotas import NUTRITION_LOOKUP, consume_quota
+        consume_quota(user, NUTRITION_LOOKUP)
+    
+    logger.info(f"Отправка запроса к OpenRouter для: {food_name}")
+    return None, True
+
+
+def _food_search_result(status_code, body, food_name, weight_grams):
+    """Разбор ответа OpenRouter на запрос КБЖУ"""
+    import logging
+    from . import openrouter
+    
+    logger = logging.getLogger(__name__)
+    
+    if status_code != 200:
+        logger.error(f"OpenRouter API вернул статус {status_code}: {openrouter.error_text(body)[:200]}")
+        
+        # Если ошибка 402 (недостаточно кредитов), пробуем локальную базу
+        if status_code == 402:
+            logger.warning("OpenRouter API: недостаточно кредитов, пробуем локальную базу")
+            return _search_local_database(food_name, weight_grams)
+        
+        return None
+    
+    return openrouter.parse_nutrition(body, food_name, weight_grams)
+
+
+def search_food_nutrition(food_name, weight_grams=100, user=None):
     """
     Поиск КБЖУ по названию продукта через OpenRouter API (LLM) с fallback на локальную базу.
     
     Args:
         food_name: Название продукта/блюда
         weight_grams: Вес в граммах (по умолчанию 100г)
+        user: пользователь, с квоты которого списывается запрос к LLM
+            (поиск в локальной базе квоту не расходует)
+    
+    Raises:
+        QuotaExceededException: если квота пользователя на LLM-поиск исчерпана
     
     Returns:
         dict: {
@@ -294,153 +354,55 @@ def search_food_nutrition(food_name, weight_grams=100):
             'carbohydrates': углеводы
         } или None если не найдено
     """
-    import requests
-    import json
     import logging
-    from django.conf import settings
+    from . import openrouter
     
     logger = logging.getLogger(__name__)
     
-    # Сначала пробуем локальную базу данных
-    local_result = _search_local_database(food_name, weight_grams)
-    if local_result:
-        logger.info(f"Найдено в локальной базе: {food_name}")
-        return local_result
+    result, use_llm = _prepare_food_search(food_name, weight_grams, user)
+    if not use_llm:
+        return result
     
-    # Получаем API ключ из настроек
-    api_key = getattr(settings, 'OPENROUTER_API_KEY', '')
-    
-    if not api_key:
-        logger.warning("OpenRouter API ключ не настроен, используем только локальную базу")
+    try:
+        status_code, body = openrouter.post(
+            openrouter.nutrition_payload(food_name, weight_grams),
+            openrouter.NUTRITION_TITLE,
+            openrouter.NUTRITION_TIMEOUT,
+        )
+        return _food_search_result(status_code, body, food_name, weight_grams)
+    except openrouter.OpenRouterTransportError as e:
+        logger.error(f"Ошибка при обращении к OpenRouter API: {str(e)}", exc_info=True)
         return None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при поиске КБЖУ: {str(e)}", exc_info=True)
+        return None
+
+
+async def asearch_food_nutrition(food_name, weight_grams=100, user=None):
+    """
+    Асинхронный вариант search_food_nutrition для ASGI-view.
+    
+    Локальная база и списание квоты выполняются в потоке (кэш и ORM
+    синхронные), ожидание ответа LLM не занимает поток.
+    """
+    import logging
+    from asgiref.sync import sync_to_async
+    from . import openrouter
+    
+    logger = logging.getLogger(__name__)
+    
+    result, use_llm = await sync_to_async(_prepare_food_search)(food_name, weight_grams, user)
+    if not use_llm:
+        return result
     
     try:
-        # Используем OpenRouter API для определения КБЖУ по названию
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        
-        site_url = getattr(settings, 'SITE_URL', 'http://217.26.29.106')
-        # ВАЖНО: значения HTTP-заголовков должны быть ASCII (latin-1) для urllib3/requests.
-        # Кириллица в X-Title приводит к UnicodeEncodeError и полностью ломает поиск.
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json; charset=utf-8",
-            "HTTP-Referer": site_url,
-            "X-Title": "Calorio - Nutrition Search",
-        }
-        
-        # Формируем промпт для определения КБЖУ по названию блюда
-        prompt = f"""Определи пищевую ценность (КБЖУ) для блюда: {food_name}, вес {weight_grams}г.
-
-Верни ТОЛЬКО JSON:
-{{
-  "name": "название на русском",
-  "weight": {weight_grams},
-  "calories": число,
-  "proteins": число,
-  "fats": число,
-  "carbohydrates": число
-}}
-
-Используй реалистичные значения для указанного веса."""
-        
-        payload = {
-            "model": "openai/gpt-4o-mini",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 300,
-            "temperature": 0.1,
-        }
-        
-        logger.info(f"Отправка запроса к OpenRouter для: {food_name}")
-        
-        # Сериализуем в JSON с ensure_ascii=False для поддержки русского языка
-        json_str = json.dumps(payload, ensure_ascii=False)
-        json_bytes = json_str.encode('utf-8')
-        
-        headers_final = headers.copy()
-        headers_final['Content-Type'] = 'application/json; charset=utf-8'
-        headers_final['Content-Length'] = str(len(json_bytes))
-        
-        # Отправляем запрос
-        response = requests.post(
-            url,
-            headers=headers_final,
-            data=json_bytes,
-            timeout=30
+        status_code, body = await openrouter.apost(
+            openrouter.nutrition_payload(food_name, weight_grams),
+            openrouter.NUTRITION_TITLE,
+            openrouter.NUTRITION_TIMEOUT,
         )
-        
-        response.encoding = 'utf-8'
-        
-        # Проверяем статус ответа
-        if response.status_code != 200:
-            error_text = response.text[:200] if hasattr(response, 'text') else "Не удалось прочитать ответ"
-            logger.error(f"OpenRouter API вернул статус {response.status_code}: {error_text}")
-            
-            # Если ошибка 402 (недостаточно кредитов), пробуем локальную базу
-            if response.status_code == 402:
-                logger.warning("OpenRouter API: недостаточно кредитов, пробуем локальную базу")
-                return _search_local_database(food_name, weight_grams)
-            
-            return None
-        
-        # Парсим JSON ответа
-        try:
-            result = response.json()
-        except Exception as e:
-            logger.error(f"Ошибка парсинга JSON ответа: {str(e)}")
-            try:
-                result = json.loads(response.content.decode('utf-8'))
-            except Exception as e2:
-                logger.error(f"Ошибка декодирования ответа: {str(e2)}")
-                return None
-        
-        # Извлекаем ответ из API
-        if 'choices' in result and len(result['choices']) > 0:
-            content_raw = result['choices'][0]['message']['content']
-            if isinstance(content_raw, bytes):
-                content = content_raw.decode('utf-8')
-            else:
-                content = str(content_raw)
-            
-            # Парсим JSON из ответа
-            import re
-            # Убираем markdown код блоки если есть
-            content_cleaned = content.replace('```json', '').replace('```', '').strip()
-            
-            # Ищем JSON объект
-            start_idx = content_cleaned.find('{')
-            end_idx = content_cleaned.rfind('}')
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                json_str = content_cleaned[start_idx:end_idx+1]
-                try:
-                    dish_data = json.loads(json_str)
-                    
-                    # Валидация и округление данных
-                    nutrition_data = {
-                        "name": str(dish_data.get("name", food_name)).strip(),
-                        "weight": max(1, int(float(dish_data.get("weight", weight_grams)))),
-                        "calories": max(0, int(float(dish_data.get("calories", 0)))),
-                        "proteins": round(max(0, float(dish_data.get("proteins", 0))), 2),
-                        "fats": round(max(0, float(dish_data.get("fats", 0))), 2),
-                        "carbohydrates": round(max(0, float(dish_data.get("carbohydrates", 0))), 2),
-                    }
-                    
-                    return nutrition_data
-                except json.JSONDecodeError as e:
-                    logger.error(f"Ошибка парсинга JSON из ответа: {str(e)}, content: {content_cleaned[:200]}")
-                    return None
-        
-        logger.error("Неожиданный формат ответа от OpenRouter API")
-        logger.error(f"Ответ API (первые 500 символов): {str(result)[:500] if 'result' in locals() else 'N/A'}")
-        if 'result' in locals() and isinstance(result, dict):
-            logger.error(f"Ключи в ответе: {list(result.keys())}")
-        return None
-        
-    except requests.exceptions.RequestException as e:
+        return _food_search_result(status_code, body, food_name, weight_grams)
+    except openrouter.OpenRouterTransportError as e:
         logger.error(f"Ошибка при обращении к OpenRouter API: {str(e)}", exc_info=True)
         return None
     except Exception as e:
@@ -493,3 +455,17 @@ def auto_calculate_goals(weight, height, age, activity_level, gender='male', goa
         'carbohydrates': macros['carbohydrates'],
     }
 
+
+@lru_cache(maxsize=1024)
+def memoized_goals(weight, height, age, activity_level, gender='male', goal='maintain'):
+    """
+    auto_calculate_goals с мемоизацией по кортежу параметров (как Profile.goal_params())
+    
+    Returns:
+        tuple (calories, proteins, fats, carbohydrates) - неизменяемый, общий для всех вызовов
+    """
+    calculated = auto_calculate_goals(
+        weight=float(weight), height=height, age=age,
+        activity_level=activity_level, gender=gender, goal=goal,
+    )
+    return calculated['calories'], calculated['proteins'], calculated['fats'], calculated['carbohydrates']
@@ -7,17 +7,41 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils.dateparse import parse_date
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Count, Sum
+from datetime import timedelta
 from decimal import Decimal
 
-from .models import Dish, DailyGoal, Meal
+from .models import Dish, DailyGoal, GoalTemplate, Meal
 from .serializers import (
     DishSerializer, 
     DailyGoalSerializer, 
+    GoalTemplateSerializer,
     AutoCalculateGoalsSerializer,
+    AutoCalculateGoalsRangeSerializer,
+    BatchSerializer,
     DishRecognitionSerializer,
-    FoodSearchSerializer
+    FoodSearchSerializer,
+    DISH_MACRO_INDEXES,
+    DISH_ROW_FIELDS,
+    GOAL_MACRO_INDEXES,
+    GOAL_ROW_FIELDS,
+    dish_rows,
+    goal_row,
 )
+from .fields import centigrams, format_centigrams, to_centigrams
 from .utils import auto_calculate_goals, search_food_nutrition
+from . import batch, goal_schedule, nutrition_math, openrouter
+from .conditional import day_validators, goal_validators, make_etag, not_modified_response, set_validators
+from .response_cache import (
+    bump_day_version, get_cached_day_response, get_dashboard_version, get_day_version, store_day_response,
+)
+from .exceptions import QuotaExceededException
+from .quotas import NUTRITION_LOOKUP, RECOGNITION, QuotaHeadersMixin, get_quota_status
+from .db_router import ReadReplicaMixin
+from subscriptions.serializers import SubscriptionSerializer
+from subscriptions.views import get_or_create_subscription
+from users.models import Profile
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.views.decorators.cache import never_cache
@@ -45,6 +69,124 @@ class ReactAppView(TemplateView):
         return ['index.html']
 
 
+def _prepare_dish(user, validated_data):
+    """
+    Подготовка блюда к созданию (общая для sync и async view).
+    
+    Returns:
+        tuple (meal, fields, needs_lookup) - приём пищи, поля Dish и признак
+        того, что КБЖУ не указаны и их нужно найти автоматически
+    """
+    date_str = validated_data.get('date')
+    meal_type = validated_data.get('meal_type')
+    
+    if not date_str or not meal_type:
+        from rest_framework.exceptions import ValidationError
+        raise ValidationError("Дата и тип приёма пищи обязательны.")
+    
+    # Парсим дату
+    date_obj = parse_date(str(date_str))
+    if not date_obj:
+        from rest_framework.exceptions import ValidationError
+        raise ValidationError("Неверный формат даты. Используйте YYYY-MM-DD.")
+    
+    # Находим или создаём приём пищи
+    meal, created = Meal.objects.get_or_create(
+        user=user,
+        date=date_obj,
+        meal_type=meal_type,
+        defaults={}
+    )
+    
+    # Сохраняем блюдо с user и meal
+    # Удаляем date и meal_type из validated_data перед сохранением
+    validated_data = validated_data.copy()
+    # Удаляем поля, которые не являются полями модели Dish
+    validated_data.pop('date', None)
+    validated_data.pop('meal_type', None)
+    
+    # Убеждаемся, что вес указан
+    if 'weight' not in validated_data or validated_data['weight'] is None:
+        validated_data['weight'] = 100
+    
+    # Получаем значения КБЖУ (если не указаны, считаем их равными 0)
+    dish_name = validated_data.get('name', '').strip()
+    dish_weight = int(validated_data.get('weight', 100))
+    
+    # ВАЖНО: проверяем, были ли КБЖУ переданы вообще (None) или переданы как 0
+    # Если поля отсутствуют в validated_data, значит они не были отправлены
+    calories_raw = validated_data.get('calories', None)
+    proteins_raw = validated_data.get('proteins', None)
+    fats_raw = validated_data.get('fats', None)
+    carbohydrates_raw = validated_data.get('carbohydrates', None)
+    
+    # Если поля не переданы или равны 0, считаем что КБЖУ не указаны
+    calories = int(calories_raw) if calories_raw is not None else 0
+    proteins_raw = proteins_raw if proteins_raw is not None else None
+    fats_raw = fats_raw if fats_raw is not None else None
+    carbohydrates_raw = carbohydrates_raw if carbohydrates_raw is not None else None
+    
+    # Преобразуем в Decimal, если указаны, иначе 0
+    if proteins_raw is not None:
+        proteins = Decimal(str(proteins_raw)) if not isinstance(proteins_raw, Decimal) else proteins_raw
+    else:
+        proteins = Decimal('0')
+    
+    if fats_raw is not None:
+        fats = Decimal(str(fats_raw)) if not isinstance(fats_raw, Decimal) else fats_raw
+    else:
+        fats = Decimal('0')
+    
+    if carbohydrates_raw is not None:
+        carbohydrates = Decimal(str(carbohydrates_raw)) if not isinstance(carbohydrates_raw, Decimal) else carbohydrates_raw
+    else:
+        carbohydrates = Decimal('0')
+    
+    # Преобразуем Decimal в float для корректного сравнения с нулем
+    proteins_float = float(proteins)
+    fats_float = float(fats)
+    carbohydrates_float = float(carbohydrates)
+    
+    # ВСЕГДА пытаемся найти КБЖУ автоматически, если они не указаны (все равны 0) и есть название блюда
+    # Проверяем: либо поля не были переданы (None), либо были переданы как 0
+    kbru_not_provided = (
+        (calories_raw is None or calories == 0) and
+        (proteins_raw is None or proteins_float == 0) and
+        (fats_raw is None or fats_float == 0) and
+        (carbohydrates_raw is None or carbohydrates_float == 0) and
+        dish_name
+    )
+    
+    fields = {
+        'name': dish_name,
+        'weight': dish_weight,
+        'calories': calories,
+        'proteins': proteins,
+        'fats': fats,
+        'carbohydrates': carbohydrates,
+    }
+    return meal, fields, bool(kbru_not_provided)
+
+
+def _apply_nutrition(fields, nutrition_data):
+    """Подставляет найденные КБЖУ в поля блюда"""
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    if nutrition_data:
+        fields['calories'] = int(nutrition_data.get('calories', 0))
+        fields['proteins'] = Decimal(str(nutrition_data.get('proteins', 0)))
+        fields['fats'] = Decimal(str(nutrition_data.get('fats', 0)))
+        fields['carbohydrates'] = Decimal(str(nutrition_data.get('carbohydrates', 0)))
+        logger.info(
+            f"✅ КБЖУ найдены автоматически: {fields['calories']} ккал, Б: {fields['proteins']}г, "
+            f"Ж: {fields['fats']}г, У: {fields['carbohydrates']}г"
+        )
+    else:
+        logger.warning(f"❌ Не удалось найти КБЖУ для блюда: '{fields['name']}'")
+    return fields
+
+
 class DishViewSet(viewsets.ModelViewSet):
     """ViewSet для управления блюдами"""
     serializer_class = DishSerializer
@@ -69,119 +211,35 @@ class DishViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-created_at')
     
+    def list(self, request, *args, **kwargs):
+        """Список блюд: строки собираются из values_list() без экземпляров моделей"""
+        rows = self.filter_queryset(self.get_queryset()).values_list(*DISH_ROW_FIELDS)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(dish_rows(page))
+        return Response(dish_rows(rows))
+    
     def perform_create(self, serializer):
         """Создание блюда с привязкой к пользователю и приёму пищи"""
+        import logging
+        logger = logging.getLogger(__name__)
         user = self.request.user
-        date_str = serializer.validated_data.get('date')
-        meal_type = serializer.validated_data.get('meal_type')
-        
-        if not date_str or not meal_type:
-            from rest_framework.exceptions import ValidationError
-            raise ValidationError("Дата и тип приёма пищи обязательны.")
-        
-        # Парсим дату
-        date_obj = parse_date(str(date_str))
-        if not date_obj:
-            from rest_framework.exceptions import ValidationError
-            raise ValidationError("Неверный формат даты. Используйте YYYY-MM-DD.")
-        
-        # Находим или создаём приём пищи
-        meal, created = Meal.objects.get_or_create(
-            user=user,
-            date=date_obj,
-            meal_type=meal_type,
-            defaults={}
-        )
-        
-        # Сохраняем блюдо с user и meal
-        # Удаляем date и meal_type из validated_data перед сохранением
-        validated_data = serializer.validated_data.copy()
-        # Удаляем поля, которые не являются полями модели Dish
-        validated_data.pop('date', None)
-        validated_data.pop('meal_type', None)
-        
-        # Убеждаемся, что вес указан
-        if 'weight' not in validated_data or validated_data['weight'] is None:
-            validated_data['weight'] = 100
-        
-        # Получаем значения КБЖУ (если не указаны, считаем их равными 0)
-        dish_name = validated_data.get('name', '').strip()
-        dish_weight = int(validated_data.get('weight', 100))
-        
-        # ВАЖНО: проверяем, были ли КБЖУ переданы вообще (None) или переданы как 0
-        # Если поля отсутствуют в validated_data, значит они не были отправлены
-        calories_raw = validated_data.get('calories', None)
-        proteins_raw = validated_data.get('proteins', None)
-        fats_raw = validated_data.get('fats', None)
-        carbohydrates_raw = validated_data.get('carbohydrates', None)
-        
-        # Если поля не переданы или равны 0, считаем что КБЖУ не указаны
-        calories = int(calories_raw) if calories_raw is not None else 0
-        proteins_raw = proteins_raw if proteins_raw is not None else None
-        fats_raw = fats_raw if fats_raw is not None else None
-        carbohydrates_raw = carbohydrates_raw if carbohydrates_raw is not None else None
-        
-        # Преобразуем в Decimal, если указаны, иначе 0
-        if proteins_raw is not None:
-            proteins = Decimal(str(proteins_raw)) if not isinstance(proteins_raw, Decimal) else proteins_raw
-        else:
-            proteins = Decimal('0')
+        meal, fields, needs_lookup = _prepare_dish(user, serializer.validated_data)
         
-        if fats_raw is not None:
-            fats = Decimal(str(fats_raw)) if not isinstance(fats_raw, Decimal) else fats_raw
-        else:
-            fats = Decimal('0')
-        
-        if carbohydrates_raw is not None:
-            carbohydrates = Decimal(str(carbohydrates_raw)) if not isinstance(carbohydrates_raw, Decimal) else carbohydrates_raw
-        else:
-            carbohydrates = Decimal('0')
-        
-        # Преобразуем Decimal в float для корректного сравнения с нулем
-        proteins_float = float(proteins)
-        fats_float = float(fats)
-        carbohydrates_float = float(carbohydrates)
-        
-        # ВСЕГДА пытаемся найти КБЖУ автоматически, если они не указаны (все равны 0) и есть название блюда
-        # Проверяем: либо поля не были переданы (None), либо были переданы как 0
-        kbru_not_provided = (
-            (calories_raw is None or calories == 0) and
-            (proteins_raw is None or proteins_float == 0) and
-            (fats_raw is None or fats_float == 0) and
-            (carbohydrates_raw is None or carbohydrates_float == 0) and
-            dish_name
-        )
-        
-        if kbru_not_provided:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"🔍 Автоматический поиск КБЖУ для блюда: '{dish_name}' ({dish_weight}г)")
-            
-            nutrition_data = search_food_nutrition(dish_name, dish_weight)
-            if nutrition_data:
-                calories = int(nutrition_data.get('calories', 0))
-                proteins = Decimal(str(nutrition_data.get('proteins', 0)))
-                fats = Decimal(str(nutrition_data.get('fats', 0)))
-                carbohydrates = Decimal(str(nutrition_data.get('carbohydrates', 0)))
-                logger.info(f"✅ КБЖУ найдены автоматически: {calories} ккал, Б: {proteins}г, Ж: {fats}г, У: {carbohydrates}г")
-            else:
-                logger.warning(f"❌ Не удалось найти КБЖУ для блюда: '{dish_name}'")
+        # ВСЕГДА пытаемся найти КБЖУ автоматически, если они не указаны и есть название блюда
+        if needs_lookup:
+            logger.info(f"🔍 Автоматический поиск КБЖУ для блюда: '{fields['name']}' ({fields['weight']}г)")
+            try:
+                nutrition_data = search_food_nutrition(fields['name'], fields['weight'], user=user)
+            except QuotaExceededException:
+                # Квота на LLM-поиск исчерпана: блюдо всё равно создаём, КБЖУ остаются нулевыми
+                logger.warning(f"Квота на поиск КБЖУ исчерпана для пользователя {user.pk}")
+                nutrition_data = None
+            _apply_nutrition(fields, nutrition_data)
         
         # Создаем блюдо напрямую через модель, чтобы избежать проблем с date и meal_type в serializer
-        from .models import Dish
-        dish = Dish.objects.create(
-            user=user,
-            meal=meal,
-            name=dish_name,
-            weight=dish_weight,
-            calories=calories,
-            proteins=proteins,
-            fats=fats,
-            carbohydrates=carbohydrates,
-        )
-        
         # Обновляем instance в serializer для правильного ответа
-        serializer.instance = dish
+        serializer.instance = Dish.objects.create(user=user, meal=meal, **fields)
     
     def get_object(self):
         """Получение объекта с проверкой прав доступа"""
@@ -210,8 +268,35 @@ class DailyGoalView(generics.RetrieveUpdateAPIView, generics.CreateAPIView):
             goal = DailyGoal.objects.get(user=self.request.user, date=date_obj)
             return goal
         except DailyGoal.DoesNotExist:
+            pass
+        
+        # Цель из шаблона: несохранённый объект, обновление создаст явную цель на день
+        template_row = goal_schedule.get_schedule(self.request.user.pk).goal_row(date_obj)
+        if template_row is None:
             from rest_framework.exceptions import NotFound
             raise NotFound("Цель на указанную дату не найдена.")
+        _, _, calories, proteins, fats, carbohydrates, is_auto_calculated, created_at, updated_at = template_row
+        return DailyGoal(
+            user=self.request.user,
+            date=date_obj,
+            calories=calories,
+            proteins=Decimal(proteins).scaleb(-2),
+            fats=Decimal(fats).scaleb(-2),
+            carbohydrates=Decimal(carbohydrates).scaleb(-2),
+            is_auto_calculated=is_auto_calculated,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Получение цели с поддержкой условного GET (ETag)"""
+        date_obj = parse_date(kwargs.get('date') or '')
+        etag = goal_validators(request.user, date_obj) if date_obj else None
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag)
     
     def post(self, request, *args, **kwargs):
         """Создание или обновление цели (upsert)"""
@@ -239,6 +324,25 @@ class DailyGoalView(generics.RetrieveUpdateAPIView, generics.CreateAPIView):
         return Response(serializer.data, status=status_code)
 
 
+class GoalTemplateViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet для шаблонов целей КБЖУ
+    
+    Шаблон задаёт цели на все дни начиная с effective_from (или на один день
+    недели в этой версии); явная цель на день (/api/goals/<date>/) его
+    переопределяет.
+    """
+    serializer_class = GoalTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    
+    def get_queryset(self):
+        return GoalTemplate.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
 class AutoCalculateGoalsView(generics.CreateAPIView):
     """View для автоматического расчёта целей КБЖУ"""
     serializer_class = AutoCalculateGoalsSerializer
@@ -280,7 +384,160 @@ class AutoCalculateGoalsView(generics.CreateAPIView):
         return Response(response_serializer.data, status=status_code)
 
 
-class DayDataView(generics.RetrieveAPIView):
+class AutoCalculateGoalsRangeView(generics.CreateAPIView):
+    """
+    View для расчёта целей КБЖУ на диапазон дат
+    
+    Цели считаются один раз на сценарий (основные параметры и переопределения
+    по дням недели) и записываются одним bulk upsert вместо update_or_create
+    на каждый день. Ответ компактный: рассчитанные цели (targets) и для каждого
+    дня диапазона - индекс цели в targets (schedule).
+    """
+    serializer_class = AutoCalculateGoalsRangeSerializer
+    permission_classes = [IsAuthenticated]
+    
+    UPDATE_FIELDS = ['calories', 'proteins', 'fats', 'carbohydrates', 'is_auto_calculated', 'updated_at']
+    
+    def post(self, request, *args, **kwargs):
+        """Расчёт и сохранение целей на каждый день диапазона"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        validated_data = serializer.validated_data
+        start, end = validated_data['start_date'], validated_data['end_date']
+        base = {
+            'activity_level': validated_data['activity_level'],
+            'goal': validated_data.get('goal', 'maintain'),
+        }
+        by_weekday = {}
+        for scenario in validated_data.get('scenarios', []):
+            params = {**base, **{key: scenario[key] for key in base if key in scenario}}
+            by_weekday.update(dict.fromkeys(scenario['weekdays'], params))
+        
+        # Одна цель на набор параметров, а не на день
+        targets = []
+        target_index = {}
+        schedule = []
+        for offset in range((end - start).days + 1):
+            params = by_weekday.get((start + timedelta(days=offset)).weekday(), base)
+            key = (params['activity_level'], params['goal'])
+            if key not in target_index:
+                target_index[key] = len(targets)
+                targets.append({
+                    **params,
+                    **auto_calculate_goals(
+                        weight=float(validated_data['weight']),
+                        height=validated_data['height'],
+                        age=validated_data['age'],
+                        activity_level=params['activity_level'],
+                        gender=validated_data.get('gender', 'male'),
+                        goal=params['goal'],
+                    ),
+                })
+            schedule.append(target_index[key])
+        
+        goals = [
+            DailyGoal(
+                user=request.user,
+                date=start + timedelta(days=offset),
+                calories=targets[index]['calories'],
+                proteins=targets[index]['proteins'],
+                fats=targets[index]['fats'],
+                carbohydrates=targets[index]['carbohydrates'],
+                is_auto_calculated=True,
+            )
+            for offset, index in enumerate(schedule)
+        ]
+        
+        with transaction.atomic():
+            existing = DailyGoal.objects.filter(user=request.user, date__range=(start, end)).count()
+            DailyGoal.objects.bulk_create(
+                goals,
+                update_conflicts=True,
+                unique_fields=['user', 'date'],
+                update_fields=self.UPDATE_FIELDS,
+            )
+            # bulk_create не отправляет post_save - инвалидируем дни сами
+            for goal in goals:
+                bump_day_version(request.user.pk, goal.date)
+        
+        created = len(goals) - existing
+        return Response(
+            {
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat(),
+                'created': created,
+                'updated': existing,
+                'targets': [
+                    {
+                        'activity_level': target['activity_level'],
+                        'goal': target['goal'],
+                        'calories': target['calories'],
+                        **{
+                            macro: format_centigrams(to_centigrams(target[macro]))
+                            for macro in ('proteins', 'fats', 'carbohydrates')
+                        },
+                    }
+                    for target in targets
+                ],
+                'schedule': schedule,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+def day_data(user, date_obj, date_str):
+    """
+    Данные за день: цель, блюда по приёмам пищи и суммы КБЖУ.
+    
+    Два запроса (явная цель на день, блюда); цель из шаблона - из кэша
+    шаблонов. Общая часть /api/days/<date>/ и /api/dashboard/.
+    """
+    # Цель и блюда читаются кортежами values_list() и собираются в строки
+    # ответа напрямую (см. dish_row/goal_row), без моделей и сериализаторов
+    goal_values = DailyGoal.objects.filter(user=user, date=date_obj).values_list(*GOAL_ROW_FIELDS).first()
+    if goal_values is None:
+        goal_values = goal_schedule.get_schedule(user.pk).goal_row(date_obj)
+    goal_data = goal_row(goal_values) if goal_values is not None else None
+    
+    # Все блюда за день одним запросом: порядок как у приёмов пищи
+    # (по типу) и блюд внутри них (новые первыми)
+    dish_values = list(
+        Dish.objects.filter(meal__user=user, meal__date=date_obj)
+        .order_by('meal__meal_type', 'meal_id', '-created_at')
+        .values_list(*DISH_ROW_FIELDS)
+    )
+    
+    # Группируем блюда по типам приёмов пищи
+    meals_data = {
+        'breakfast': [],
+        'lunch': [],
+        'dinner': [],
+        'snack': []
+    }
+    for row in dish_rows(dish_values):
+        meals_data[row['meal_type']].append(row)
+    
+    # Суммы КБЖУ и проценты выполнения цели - целочисленно (см. core.nutrition_math)
+    totals = nutrition_math.sum_columns(dish_values, DISH_MACRO_INDEXES)
+    goals, _ = nutrition_math.goal_columns(
+        [goal_values] if goal_values is not None else [], GOAL_MACRO_INDEXES
+    )
+    progress = nutrition_math.percentages(totals, goals)
+    day_totals = nutrition_math.day_values(totals, 0)
+    
+    return {
+        'date': date_str,
+        'goal': goal_data,
+        'meals': meals_data,
+        'summary': {
+            **{f'total_{macro}': day_totals[macro] for macro in nutrition_math.MACROS},
+            'goal_progress': {f'{macro}_percent': progress[macro][0] for macro in nutrition_math.MACROS},
+        }
+    }
+
+
+class DayDataView(ReadReplicaMixin, generics.RetrieveAPIView):
     """View для получения всех данных за день"""
     permission_classes = [IsAuthenticated]
     
@@ -297,492 +554,440 @@ class DayDataView(generics.RetrieveAPIView):
         
         user = request.user
         
-        # Получаем цель
-        try:
-            goal = DailyGoal.objects.get(user=user, date=date_obj)
-            goal_data = DailyGoalSerializer(goal).data
-        except DailyGoal.DoesNotExist:
-            goal_data = None
-        
-        # Получаем все блюда за день с оптимизацией запросов
-        # prefetch_related загружает все dishes одним запросом
-        meals = Meal.objects.filter(
-            user=user, 
-            date=date_obj
-        ).prefetch_related('dishes').order_by('meal_type')
-        
-        # Группируем блюда по типам приёмов пищи
-        meals_data = {
-            'breakfast': [],
-            'lunch': [],
-            'dinner': [],
-            'snack': []
-        }
-        
-        all_dishes = []
-        # Используем prefetch_related, поэтому dishes.all() не делает дополнительных запросов
-        for meal in meals:
-            dishes = meal.dishes.all()
-            # Сериализуем все блюда разом для эффективности
-            dishes_serialized = DishSerializer(dishes, many=True).data
-            meals_data[meal.meal_type].extend(dishes_serialized)
-            all_dishes.extend(dishes)
-        
-        # Рассчитываем суммарные значения КБЖУ
-        total_calories = sum(int(dish.calories or 0) for dish in all_dishes)
-        total_proteins = sum(float(dish.proteins or 0) for dish in all_dishes)
-        total_fats = sum(float(dish.fats or 0) for dish in all_dishes)
-        total_carbohydrates = sum(float(dish.carbohydrates or 0) for dish in all_dishes)
-        
-        # Рассчитываем проценты выполнения целей
-        goal_progress = {
-            'calories_percent': Decimal('0.0'),
-            'proteins_percent': Decimal('0.0'),
-            'fats_percent': Decimal('0.0'),
-            'carbohydrates_percent': Decimal('0.0'),
-        }
-        
-        if goal_data:
-            goal_calories = goal_data.get('calories', 0)
-            goal_proteins = float(goal_data.get('proteins', 0))
-            goal_fats = float(goal_data.get('fats', 0))
-            goal_carbohydrates = float(goal_data.get('carbohydrates', 0))
-            
-            if goal_calories > 0:
-                goal_progress['calories_percent'] = Decimal(str((total_calories / goal_calories) * 100))
-            if goal_proteins > 0:
-                goal_progress['proteins_percent'] = Decimal(str((total_proteins / goal_proteins) * 100))
-            if goal_fats > 0:
-                goal_progress['fats_percent'] = Decimal(str((total_fats / goal_fats) * 100))
-            if goal_carbohydrates > 0:
-                goal_progress['carbohydrates_percent'] = Decimal(str((total_carbohydrates / goal_carbohydrates) * 100))
-        
-        # Преобразуем Decimal в float для JSON сериализации
-        return Response({
-            'date': date_str,
-            'goal': goal_data,
-            'meals': meals_data,
-            'summary': {
-                'total_calories': int(total_calories),
-                'total_proteins': float(total_proteins),
-                'total_fats': float(total_fats),
-                'total_carbohydrates': float(total_carbohydrates),
-                'goal_progress': {
-                    'calories_percent': float(goal_progress['calories_percent']),
-                    'proteins_percent': float(goal_progress['proteins_percent']),
-                    'fats_percent': float(goal_progress['fats_percent']),
-                    'carbohydrates_percent': float(goal_progress['carbohydrates_percent']),
-                }
-            }
+        # Версионированный кэш: готовое тело ответа без обращения к ORM и рендереру
+        version = get_day_version(user.pk, date_obj)
+        cached = get_cached_day_response(request, user.pk, date_obj, version)
+        if cached is not None:
+            return cached
+        
+        # Условный GET: если данные за день не менялись, отвечаем 304 без сериализации
+        etag = day_validators(user, date_obj)
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        response = Response(day_data(user, date_obj, date_str))
+        set_validators(response, etag)
+        return store_day_response(response, request, user.pk, date_obj, version, etag)
+
+
+# Статистика за диапазон дней
+MAX_STATS_DAYS = 366
+MAX_STATS_WINDOW = 31
+DEFAULT_STATS_WINDOW = 7
+
+
+def range_stats(user, start, end, window=DEFAULT_STATS_WINDOW):
+    """
+    Статистика КБЖУ за дни start..end: суммы, цели, проценты выполнения,
+    дефицит/профицит и скользящее среднее за window дней.
+
+    Суммы блюд группируются по дате в SQL (целые калории и сантиграммы),
+    дальше всё считается по столбцам в core.nutrition_math. Для скользящего
+    среднего первых дней захватываются window - 1 дней до start.
+    """
+    days = (end - start).days + 1
+    lead = window - 1
+    query_start = start - timedelta(days=lead)
+    span = days + lead
+    
+    dish_sums = (
+        Dish.objects.filter(meal__user=user, meal__date__range=(query_start, end))
+        .values('meal__date').order_by()
+        .annotate(
+            dishes=Count('id'),
+            total_calories=Sum('calories'),
+            total_proteins=Sum(centigrams('proteins')),
+            total_fats=Sum(centigrams('fats')),
+            total_carbohydrates=Sum(centigrams('carbohydrates')),
+        )
+        .values_list('meal__date', 'dishes', 'total_calories', 'total_proteins', 'total_fats', 'total_carbohydrates')
+    )
+    # Явные цели на дни диапазона, остальные дни - из шаблонов
+    goal_values = goal_schedule.get_schedule(user.pk).resolve(
+        start, end, DailyGoal.objects.filter(user=user, date__range=(start, end)).values_list(*GOAL_ROW_FIELDS),
+    )
+    
+    def day_of(row):
+        return (row[0] - query_start).days
+    
+    def goal_day_of(row):
+        return (row[1] - query_start).days
+    
+    dish_sums = list(dish_sums)
+    dishes = [0] * span
+    for row in dish_sums:
+        dishes[day_of(row)] = row[1]
+    totals = nutrition_math.sum_columns(dish_sums, (2, 3, 4, 5), span, day_of)
+    goals, has_goal = nutrition_math.goal_columns(goal_values, GOAL_MACRO_INDEXES, span, goal_day_of)
+    progress = nutrition_math.percentages(totals, goals)
+    balance = nutrition_math.balance(totals, goals, has_goal)
+    rolling = {macro: nutrition_math.rolling_average(totals[macro], window) for macro in nutrition_math.MACROS}
+    
+    day_rows = []
+    for day in range(lead, span):
+        day_rows.append({
+            'date': (query_start + timedelta(days=day)).isoformat(),
+            'dishes': dishes[day],
+            'totals': nutrition_math.day_values(totals, day),
+            'goal': nutrition_math.day_values(goals, day) if has_goal[day] else None,
+            'goal_progress': {f'{macro}_percent': progress[macro][day] for macro in nutrition_math.MACROS},
+            'balance': nutrition_math.day_values(balance, day) if has_goal[day] else None,
+            'rolling_average': nutrition_math.day_values(rolling, day),
         })
+    
+    logged = [day for day in range(lead, span) if dishes[day]]
+    goal_days = [day for day in range(lead, span) if has_goal[day]]
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'window': window,
+        'days': day_rows,
+        'summary': {
+            'days': days,
+            'days_logged': len(logged),
+            'days_with_goal': len(goal_days),
+            'average': {
+                macro: nutrition_math.to_units(macro, sum(totals[macro][day] for day in logged) / len(logged))
+                if logged else 0.0
+                for macro in nutrition_math.MACROS
+            },
+            'balance': {
+                macro: nutrition_math.to_units(macro, sum(balance[macro][day] for day in goal_days))
+                for macro in nutrition_math.MACROS
+            },
+        },
+    }
 
 
-class DishRecognitionView(generics.CreateAPIView):
-    """View для распознавания блюда по фотографии"""
-    serializer_class = DishRecognitionSerializer
+def _parse_day(value):
+    """Дата YYYY-MM-DD или None (в том числе для несуществующих дат вроде 2025-02-30)"""
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+class StatsRangeView(ReadReplicaMixin, generics.GenericAPIView):
+    """
+    Статистика за диапазон дат: /api/stats/?start=YYYY-MM-DD&end=YYYY-MM-DD[&window=7]
+    и за неделю (пн-вс), содержащую дату: /api/stats/week/<date>/
+    """
     permission_classes = [IsAuthenticated]
     
-    def get_throttles(self):
-        """Применяем throttling для распознавания"""
-        from core.throttles import DishRecognitionThrottle
-        return [DishRecognitionThrottle()]
-    
-    def post(self, request, *args, **kwargs):
-        """Распознавание блюда через OpenRouter API"""
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        image_base64 = serializer.validated_data['image_base64']
-        
-        # Извлекаем base64 данные (убираем префикс если есть)
-        if ',' in image_base64:
-            base64_data = image_base64.split(',')[-1]
+    def get(self, request, *args, **kwargs):
+        errors = {}
+        week_of = kwargs.get('date')
+        if week_of is not None:
+            day = _parse_day(week_of)
+            if not day:
+                errors['date'] = ["Неверный формат даты. Используйте YYYY-MM-DD."]
+            else:
+                start = day - timedelta(days=day.weekday())
+                end = start + timedelta(days=6)
         else:
-            base64_data = image_base64
-        
-        # Проверяем, что данные не пустые
-        if not base64_data or len(base64_data) < 100:
+            start = _parse_day(request.query_params.get('start', ''))
+            end = _parse_day(request.query_params.get('end', ''))
+            for name, value in (('start', start), ('end', end)):
+                if not value:
+                    errors[name] = ["Неверный формат даты. Используйте YYYY-MM-DD."]
+            if not errors and start > end:
+                errors['end'] = ["Дата окончания раньше даты начала."]
+            elif not errors and (end - start).days + 1 > MAX_STATS_DAYS:
+                errors['end'] = [f"Диапазон не должен превышать {MAX_STATS_DAYS} дней."]
+        
+        window = request.query_params.get('window', str(DEFAULT_STATS_WINDOW))
+        if not window.isdigit() or not 1 <= int(window) <= MAX_STATS_WINDOW:
+            errors['window'] = [f"Окно - целое число от 1 до {MAX_STATS_WINDOW}."]
+        
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(range_stats(request.user, start, end, int(window)))
+
+
+class DashboardView(ReadReplicaMixin, generics.GenericAPIView):
+    """
+    Стартовые данные приложения одним запросом: /api/dashboard/[?date=YYYY-MM-DD]
+    
+    Профиль, подписка и данные за день (по умолчанию - сегодня) в тех же
+    форматах, что /api/profile/, /api/subscription/ и /api/days/<date>/
+    (подписки нет - создаётся истёкшая, как в /api/subscription/).
+    По одному запросу на сущность. Готовое тело кэшируется по версии
+    дня, шаблонов целей и аккаунта пользователя (core.response_cache) и по
+    текущей дате; ETag строится из той же версии, без запросов к БД.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        date_str = request.query_params.get('date') or today.isoformat()
+        date_obj = _parse_day(date_str)
+        if not date_obj:
             return Response(
-                {"detail": "Изображение слишком маленькое или повреждено."},
+                {"date": ["Неверный формат даты. Используйте YYYY-MM-DD."]},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Проверяем максимальный размер base64 строки (примерно 13.3 МБ в base64 = 10 МБ бинарных данных)
-        max_base64_size = 14 * 1024 * 1024  # 14 МБ для учёта overhead base64
-        if len(base64_data) > max_base64_size:
+        user = request.user
+        # Остаток дней подписки зависит от текущей даты - она входит в версию
+        # (ключ кэша и ETag), иначе после полуночи отдавалось бы вчерашнее тело
+        version = f'{get_dashboard_version(user.pk, date_obj)}:{today.isoformat()}'
+        cached = get_cached_day_response(request, user.pk, date_obj, version)
+        if cached is not None:
+            return cached
+        
+        etag = make_etag('dashboard', user.pk, date_obj, version)
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        first_name = Profile.objects.filter(user=user).values_list('first_name', flat=True).first()
+        subscription, created = get_or_create_subscription(user)
+        if created:
+            # Создание подписки сменило версию аккаунта - тело сохраняется уже под новой
+            version = f'{get_dashboard_version(user.pk, date_obj)}:{today.isoformat()}'
+            etag = make_etag('dashboard', user.pk, date_obj, version)
+        response = Response({
+            'profile': {
+                'id': user.id,
+                'email': user.email,
+                'first_name': first_name or '',
+            },
+            'subscription': SubscriptionSerializer(subscription).data,
+            'day': day_data(user, date_obj, date_str),
+        })
+        set_validators(response, etag)
+        return store_day_response(response, request, user.pk, date_obj, version, etag)
+
+
+class BatchView(generics.GenericAPIView):
+    """
+    Несколько GET-запросов к API одним запросом: POST /api/batch/
+    
+    {"requests": [{"path": "/api/days/2025-01-15/"}, ...], "parallel": false}
+    
+    Подзапросы выполняются в процессе под аутентификацией внешнего запроса
+    (core.batch), ответ - {"responses": [{"path", "status", "body"}, ...]} в
+    порядке подзапросов. Ошибка подзапроса не прерывает пакет. Ответ всегда
+    в JSON.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = BatchSerializer
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        paths = [item['path'] for item in serializer.validated_data['requests']]
+        results = batch.run(request, paths, parallel=serializer.validated_data['parallel'])
+        return batch.batch_response(paths, results)
+
+
+def _prepare_recognition(serializer):
+    """
+    Проверки изображения до обращения к OpenRouter (общие для sync и async view).
+    
+    Returns:
+        tuple (base64_data, error_response) - error_response не None, если
+        запрос нужно отклонить
+    """
+    import logging
+    
+    logger = logging.getLogger(__name__)
+    image_base64 = serializer.validated_data['image_base64']
+    
+    # Извлекаем base64 данные (убираем префикс если есть)
+    if ',' in image_base64:
+        base64_data = image_base64.split(',')[-1]
+    else:
+        base64_data = image_base64
+    
+    # Проверяем, что данные не пустые
+    if not base64_data or len(base64_data) < 100:
+        return None, Response(
+            {"detail": "Изображение слишком маленькое или повреждено."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Проверяем максимальный размер base64 строки (примерно 13.3 МБ в base64 = 10 МБ бинарных данных)
+    max_base64_size = 14 * 1024 * 1024  # 14 МБ для учёта overhead base64
+    if len(base64_data) > max_base64_size:
+        return None, Response(
+            {"detail": "Размер изображения не должен превышать 10 МБ."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not openrouter.api_key():
+        return None, Response(
+            {"detail": "Сервис распознавания временно недоступен."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    error_response = _check_image(base64_data)
+    if error_response is not None:
+        return None, error_response
+    
+    logger.info(
+        f"Отправка запроса к OpenRouter API, модель: {openrouter.RECOGNITION_MODEL}, "
+        f"размер изображения: {len(base64_data)} символов"
+    )
+    return base64_data, None
+
+
+def _check_image(base64_data):
+    """
+    Декодирует base64 и проверяет, что это изображение поддерживаемого формата.
+    
+    Returns:
+        Response с ошибкой или None, если изображение корректно
+    """
+    import base64
+    import io
+    import logging
+    from PIL import Image
+    
+    logger = logging.getLogger(__name__)
+    
+    # Декодируем изображение для проверки
+    try:
+        image_bytes = base64.b64decode(base64_data, validate=True)
+    except Exception:
+        return Response(
+            {"detail": "Неверный формат base64."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Проверяем, что это действительно изображение
+    try:
+        # Проверяем размер декодированного изображения
+        if len(image_bytes) > 10 * 1024 * 1024:  # 10 МБ
             return Response(
                 {"detail": "Размер изображения не должен превышать 10 МБ."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Получаем API ключ из настроек
-        from django.conf import settings
-        api_key = getattr(settings, 'OPENROUTER_API_KEY', '')
-        
-        if not api_key:
+        # Проверяем формат изображения
+        img = Image.open(io.BytesIO(image_bytes))
+        img.verify()
+        # После verify() нужно открыть заново
+        img = Image.open(io.BytesIO(image_bytes))
+        # Проверяем, что это поддерживаемый формат
+        if img.format not in ['JPEG', 'PNG', 'WEBP', 'JPG']:
             return Response(
-                {"detail": "Сервис распознавания временно недоступен."},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-        
-        try:
-            import requests
-            import json
-            import base64
-            from PIL import Image
-            import io
-            from typing import Any, Dict, Optional
-
-            def _extract_json_object(text: str) -> Optional[str]:
-                """
-                Достаём первый валидный JSON-объект из произвольного текста.
-                Работает лучше, чем find('{')..rfind('}') (не ломается на лишних скобках).
-                """
-                if not text:
-                    return None
-                s = text.strip()
-                # убираем markdown fences
-                s = s.replace("```json", "").replace("```", "").strip()
-                start = s.find("{")
-                if start == -1:
-                    return None
-                in_str = False
-                esc = False
-                depth = 0
-                for i in range(start, len(s)):
-                    ch = s[i]
-                    if in_str:
-                        if esc:
-                            esc = False
-                        elif ch == "\\":
-                            esc = True
-                        elif ch == "\"":
-                            in_str = False
-                        continue
-                    else:
-                        if ch == "\"":
-                            in_str = True
-                            continue
-                        if ch == "{":
-                            depth += 1
-                        elif ch == "}":
-                            depth -= 1
-                            if depth == 0:
-                                return s[start:i + 1]
-                return None
-            
-            # Декодируем изображение для проверки
-            try:
-                image_bytes = base64.b64decode(base64_data, validate=True)
-            except Exception as e:
-                return Response(
-                    {"detail": "Неверный формат base64."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Проверяем, что это действительно изображение
-            import logging
-            logger = logging.getLogger(__name__)
-            try:
-                # Проверяем размер декодированного изображения
-                if len(image_bytes) > 10 * 1024 * 1024:  # 10 МБ
-                    return Response(
-                        {"detail": "Размер изображения не должен превышать 10 МБ."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                # Проверяем формат изображения
-                img = Image.open(io.BytesIO(image_bytes))
-                img.verify()
-                # После verify() нужно открыть заново
-                img = Image.open(io.BytesIO(image_bytes))
-                # Проверяем, что это поддерживаемый формат
-                if img.format not in ['JPEG', 'PNG', 'WEBP', 'JPG']:
-                    return Response(
-                        {"detail": "Неверный формат изображения. Поддерживаются только JPEG, PNG и WebP."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except Exception as e:
-                logger.error(f"Ошибка проверки изображения: {str(e)}")
-                return Response(
-                    {"detail": "Неверный формат изображения. Ожидается изображение в формате JPEG, PNG или WebP."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Используем OpenRouter API с моделью для распознавания изображений
-            # Используем модель, которая поддерживает vision (например, gpt-4-vision-preview или claude-3-opus)
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            
-            site_url = getattr(settings, 'SITE_URL', 'http://217.26.29.106')
-            # ВАЖНО: значения HTTP-заголовков должны быть ASCII (latin-1) для urllib3/requests.
-            # Кириллица в X-Title приводит к UnicodeEncodeError и запрос до OpenRouter даже не уходит.
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json; charset=utf-8",
-                "HTTP-Referer": site_url,
-                "X-Title": "Calorio - Dish Recognition",
-            }
-            
-            # Логируем для отладки (без ключа)
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Отправка запроса к OpenRouter API, модель: openai/gpt-4o, размер изображения: {len(base64_data)} символов")
-            
-            # Формируем промпт для распознавания блюда (на английском для избежания проблем с кодировкой)
-            prompt = """Analyze this food image and determine:
-1. Dish name (in Russian language)
-2. Approximate portion weight in grams
-3. Calories (kcal)
-4. Proteins (g)
-5. Fats (g)
-6. Carbohydrates (g)
-
-Respond ONLY in JSON format without any additional comments or markdown:
-{
-  "name": "dish name in Russian",
-  "weight": weight_in_grams,
-  "calories": calories,
-  "proteins": proteins,
-  "fats": fats,
-  "carbohydrates": carbohydrates
-}
-
-If you cannot determine exact values, use realistic estimates based on typical values for similar dishes."""
-            
-            # Пробуем разные модели для лучшей совместимости
-            # Сначала пробуем GPT-4o, если не сработает - попробуем другие
-            payload = {
-                "model": "openai/gpt-4o",  # Используем GPT-4o для лучшего распознавания
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_data}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": 1000,  # Увеличиваем для более детальных ответов
-                "temperature": 0.1,  # Очень низкая температура для точных результатов
-                # Просим строгий JSON (сильно снижает шанс "Некорректные данные от API")
-                "response_format": {"type": "json_object"},
-            }
-            
-            # Отправляем запрос с явной обработкой UTF-8
-            # Проблема: requests может использовать latin-1, поэтому делаем вручную
-            import json as json_lib
-            
-            # Сериализуем в JSON с ensure_ascii=False
-            json_str = json_lib.dumps(payload, ensure_ascii=False)
-            json_bytes = json_str.encode('utf-8')
-            
-            # Обновляем заголовки для правильной отправки
-            headers_final = headers.copy()
-            headers_final['Content-Type'] = 'application/json; charset=utf-8'
-            headers_final['Content-Length'] = str(len(json_bytes))
-            
-            # Отправляем как bytes
-            response = requests.post(
-                url,
-                headers=headers_final,
-                data=json_bytes,
-                timeout=60
+                {"detail": "Неверный формат изображения. Поддерживаются только JPEG, PNG и WebP."},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # Устанавливаем кодировку ответа
-            response.encoding = 'utf-8'
-            
-            # Проверяем статус ответа
-            if response.status_code != 200:
-                import logging
-                logger = logging.getLogger(__name__)
-                try:
-                    error_data = response.json()
-                    error_text = str(error_data).replace(api_key, '***HIDDEN***')[:500]
-                except:
-                    try:
-                        error_text = response.text[:500]
-                    except:
-                        error_text = "Не удалось прочитать ответ"
-                logger.error(f"OpenRouter API вернул статус {response.status_code}: {error_text}")
-                
-                # Возвращаем понятное сообщение пользователю
-                if response.status_code == 401:
-                    return Response(
-                        {"detail": "Ошибка авторизации в сервисе распознавания. Проверьте настройки API ключа."},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
-                elif response.status_code == 402:
-                    return Response(
-                        {"detail": "Сервис распознавания недоступен: на OpenRouter закончились кредиты (402)."},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
-                elif response.status_code == 429:
-                    return Response(
-                        {"detail": "Превышен лимит запросов к сервису распознавания. Попробуйте позже."},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
-                else:
-                    return Response(
-                        {"detail": "Не удалось распознать блюдо. Попробуйте ещё раз."},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            
-            # Парсим JSON ответа с правильной кодировкой
-            try:
-                result = response.json()
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Ошибка парсинга JSON ответа: {str(e)}")
-                # Пробуем декодировать вручную
-                try:
-                    result = json.loads(response.content.decode('utf-8'))
-                except Exception as e2:
-                    logger.error(f"Ошибка декодирования ответа: {str(e2)}")
-                    raise ValueError(f"Не удалось распарсить ответ от API: {str(e2)}")
-            
-            # Извлекаем ответ из API
-            if 'choices' in result and len(result['choices']) > 0:
-                # Получаем content, убеждаясь что это строка в UTF-8
-                content_raw = result['choices'][0]['message']['content']
-                if isinstance(content_raw, bytes):
-                    content = content_raw.decode('utf-8')
-                else:
-                    content = str(content_raw)
-                
-                # Пытаемся распарсить строго
-                content_cleaned = content.replace('```json', '').replace('```', '').strip()
-                dish_data: Optional[Dict[str, Any]] = None
-                try:
-                    parsed = json.loads(content_cleaned)
-                except Exception:
-                    extracted = _extract_json_object(content_cleaned)
-                    if extracted:
-                        parsed = json.loads(extracted)
-                    else:
-                        parsed = None
-
-                # Нормализуем разные форматы
-                if isinstance(parsed, dict):
-                    # Иногда модель возвращает {"recognized_dishes":[{...}]}
-                    if "recognized_dishes" in parsed and isinstance(parsed.get("recognized_dishes"), list) and parsed["recognized_dishes"]:
-                        if isinstance(parsed["recognized_dishes"][0], dict):
-                            dish_data = parsed["recognized_dishes"][0]
-                    else:
-                        dish_data = parsed
-                elif isinstance(parsed, list) and parsed and isinstance(parsed[0], dict):
-                    dish_data = parsed[0]
-
-                if dish_data:
-                    # Поддерживаем и русские ключи на всякий случай
-                    name = dish_data.get("name") or dish_data.get("название") or "Неизвестное блюдо"
-                    weight_val = dish_data.get("weight") or dish_data.get("вес") or 100
-                    calories_val = dish_data.get("calories") or dish_data.get("калории") or 0
-                    proteins_val = dish_data.get("proteins") or dish_data.get("белки") or 0
-                    fats_val = dish_data.get("fats") or dish_data.get("жиры") or 0
-                    carbs_val = dish_data.get("carbohydrates") or dish_data.get("углеводы") or 0
-
-                    recognized_dish = {
-                        "name": str(name).strip(),
-                        "weight": max(1, int(float(weight_val))),
-                        "calories": max(0, int(float(calories_val))),
-                        "proteins": round(max(0, float(proteins_val)), 2),
-                        "fats": round(max(0, float(fats_val)), 2),
-                        "carbohydrates": round(max(0, float(carbs_val)), 2),
-                        "confidence": 0.8,
-                    }
+    except Exception as e:
+        logger.error(f"Ошибка проверки изображения: {str(e)}")
+        return Response(
+            {"detail": "Неверный формат изображения. Ожидается изображение в формате JPEG, PNG или WebP."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
 
-                    return Response({
-                        "recognized_dishes": [recognized_dish],
-                        "suggested_date": serializer.validated_data.get('date', None),
-                        "suggested_meal_type": serializer.validated_data.get('meal_type', None)
-                    })
 
-                # Логируем для отладки
-                logger.error(f"Не удалось распарсить JSON из ответа модели. content: {content[:500]}")
-                raise ValueError("Не удалось извлечь JSON из ответа")
-            else:
-                raise ValueError("Неожиданный формат ответа от API")
-                
-        except requests.exceptions.HTTPError as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            if e.response:
-                try:
-                    error_text = e.response.content.decode('utf-8')[:200]
-                except:
-                    error_text = "Не удалось декодировать ответ"
-                error_msg = f"HTTP {e.response.status_code}: {error_text}"
-            else:
-                error_msg = str(e)
-            logger.error(f"HTTP ошибка при обращении к OpenRouter: {error_msg}")
-            
-            if e.response and e.response.status_code == 401:
-                return Response(
-                    {"detail": "Ошибка авторизации в сервисе распознавания. Проверьте настройки API ключа."},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-            elif e.response and e.response.status_code == 429:
-                return Response(
-                    {"detail": "Превышен лимит запросов к сервису распознавания. Попробуйте позже."},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-            else:
-                return Response(
-                    {"detail": f"Ошибка сервиса распознавания: {error_msg}"},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-        except requests.exceptions.RequestException as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Ошибка при обращении к сервису распознавания: {str(e)}")
+def _recognition_transport_error(exc):
+    """Ответ при сетевой ошибке обращения к сервису распознавания"""
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.error(f"Ошибка при обращении к сервису распознавания: {str(exc)}")
+    return Response(
+        {"detail": f"Ошибка при обращении к сервису распознавания: {str(exc)}"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def _recognition_response(status_code, body, serializer):
+    """Ответ клиенту по ответу OpenRouter (общий для sync и async view)"""
+    import json
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    if status_code != 200:
+        logger.error(f"OpenRouter API вернул статус {status_code}: {openrouter.error_text(body)}")
+        
+        # Возвращаем понятное сообщение пользователю
+        if status_code == 401:
             return Response(
-                {"detail": f"Ошибка при обращении к сервису распознавания: {str(e)}"},
+                {"detail": "Ошибка авторизации в сервисе распознавания. Проверьте настройки API ключа."},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-        except json.JSONDecodeError as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Ошибка парсинга JSON при распознавании: {str(e)}, content: {content[:200] if 'content' in locals() else 'N/A'}")
-            return Response(
-                {"detail": "Не удалось распознать блюдо. Ответ API содержит некорректный JSON."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        except ValueError as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Ошибка валидации данных при распознавании: {str(e)}")
+        elif status_code == 402:
             return Response(
-                {"detail": f"Не удалось распознать блюдо. Некорректные данные от API: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"detail": "Сервис распознавания недоступен: на OpenRouter закончились кредиты (402)."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-        except KeyError as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Отсутствует ключ в ответе API: {str(e)}")
+        elif status_code == 429:
             return Response(
-                {"detail": "Не удалось распознать блюдо. Неполный ответ от API."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"detail": "Превышен лимит запросов к сервису распознавания. Попробуйте позже."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Неожиданная ошибка при распознавании: {str(e)}", exc_info=True)
-            return Response(
-                {"detail": f"Ошибка распознавания: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        return Response(
+            {"detail": "Не удалось распознать блюдо. Попробуйте ещё раз."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    try:
+        recognized_dish = openrouter.parse_recognized_dish(openrouter.message_content(body))
+    except json.JSONDecodeError as e:
+        logger.error(f"Ошибка парсинга JSON при распознавании: {str(e)}")
+        return Response(
+            {"detail": "Не удалось распознать блюдо. Ответ API содержит некорректный JSON."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    except ValueError as e:
+        logger.error(f"Ошибка валидации данных при распознавании: {str(e)}")
+        return Response(
+            {"detail": f"Не удалось распознать блюдо. Некорректные данные от API: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    except (KeyError, IndexError, TypeError) as e:
+        logger.error(f"Отсутствует ключ в ответе API: {str(e)}")
+        return Response(
+            {"detail": "Не удалось распознать блюдо. Неполный ответ от API."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    return Response({
+        "recognized_dishes": [recognized_dish],
+        "suggested_date": serializer.validated_data.get('date', None),
+        "suggested_meal_type": serializer.validated_data.get('meal_type', None)
+    })
+
+
+class DishRecognitionView(QuotaHeadersMixin, generics.CreateAPIView):
+    """View для распознавания блюда по фотографии"""
+    serializer_class = DishRecognitionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_throttles(self):
+        """Применяем throttling для распознавания"""
+        from core.throttles import DishRecognitionThrottle
+        return [DishRecognitionThrottle()]
+    
+    def post(self, request, *args, **kwargs):
+        """Распознавание блюда через OpenRouter API"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        base64_data, error_response = _prepare_recognition(serializer)
+        if error_response is not None:
+            return error_response
+        
+        # Квота тарифного плана на распознавание (ограничивает расходы на OpenRouter)
+        self.consume_quota(request, RECOGNITION)
+        
+        try:
+            status_code, body = openrouter.post(
+                openrouter.recognition_payload(base64_data),
+                openrouter.RECOGNITION_TITLE,
+                openrouter.RECOGNITION_TIMEOUT,
             )
+        except openrouter.OpenRouterTransportError as e:
+            return _recognition_transport_error(e)
+        return _recognition_response(status_code, body, serializer)
 
 
-class FoodSearchView(generics.CreateAPIView):
+class FoodSearchView(QuotaHeadersMixin, generics.CreateAPIView):
     """View для поиска КБЖУ по названию продукта"""
     serializer_class = FoodSearchSerializer
     permission_classes = [IsAuthenticated]
@@ -795,8 +1000,13 @@ class FoodSearchView(generics.CreateAPIView):
         food_name = serializer.validated_data['food_name']
         weight = serializer.validated_data.get('weight', 100)
         
-        # Ищем КБЖУ через OpenRouter API (LLM)
-        nutrition_data = search_food_nutrition(food_name, weight)
+        # Ищем КБЖУ через OpenRouter API (LLM); LLM-запросы расходуют квоту плана
+        try:
+            nutrition_data = search_food_nutrition(food_name, weight, user=request.user)
+        except QuotaExceededException as exc:
+            request.quota_status = exc.quota_status
+            raise
+        request.quota_status = get_quota_status(request.user, NUTRITION_LOOKUP)
         
         if nutrition_data:
             return Response(nutrition_data, status=status.HTTP_200_OK)
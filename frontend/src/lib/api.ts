@@ -120,10 +120,34 @@ export const profileAPI = {
   
   changePassword: async (data: { old_password: string; new_password: string }) => {
     const response = await api.post('/profile/change-password/', data);
+    // Смена пароля отзывает все токены - сохраняем новую пару из ответа
+    const { access, refresh } = response.data.tokens;
+    localStorage.setItem('access_token', access);
+    localStorage.setItem('refresh_token', refresh);
     return response.data;
   },
 };
 
+// Dashboard API: профиль, подписка и данные за день одним запросом (для старта приложения)
+export const dashboardAPI = {
+  get: async (date?: string) => {
+    const params = date ? { date } : {};
+    const response = await api.get('/dashboard/', { params });
+    return response.data;
+  },
+};
+
+// Batch API: несколько GET-запросов одним запросом, ответы в том же порядке
+export const batchAPI = {
+  get: async (paths: string[], parallel = false) => {
+    const response = await api.post('/batch/', {
+      requests: paths.map((path) => ({ path: `/api${path}` })),
+      parallel,
+    });
+    return response.data.responses as { path: string; status: number; body: unknown }[];
+  },
+};
+
 // Days API
 export const daysAPI = {
   get: async (date: string) => {
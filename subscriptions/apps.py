@@ -6,3 +6,6 @@ class SubscriptionsConfig(AppConfig):
     name = 'subscriptions'
     verbose_name = 'Подписки'
 
+    def ready(self):
+        # Подключаем обработчики сигналов (кэш плана для квот)
+        from . import signals  # noqa: F401
@@ -0,0 +1,24 @@
+"""
+Сигналы подписок: сброс закэшированного плана для квот и кэша дашборда
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.quotas import invalidate_user_plan
+from core.response_cache import bump_account_version
+
+from .models import Subscription
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_quota_plan(sender, instance, **kwargs):
+    """Смена статуса или плана подписки сразу меняет квоты пользователя"""
+    invalidate_user_plan(instance.user_id)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_dashboard(sender, instance, **kwargs):
+    """Подписка входит в дашборд (core.views.DashboardView)"""
+    bump_account_version(instance.user_id)
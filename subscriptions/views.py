@@ -13,6 +13,8 @@ from .serializers import (
 )
 from datetime import datetime, timedelta
 from django.utils import timezone
+from core.conditional import not_modified_response, queryset_validators, set_validators
+from core.db_router import ReadReplicaMixin
 import logging
 import hmac
 import hashlib
@@ -21,6 +23,43 @@ import json
 logger = logging.getLogger(__name__)
 
 
+def get_default_plan():
+    """Базовый тарифный план (создаётся в основной БД, если его нет)"""
+    plan, _ = SubscriptionPlan.objects.db_manager('default').get_or_create(
+        name='Базовый',
+        defaults={
+            'price_monthly': 299.00,
+            'price_yearly': 2990.00,
+            'features': 'Базовый функционал',
+            'is_active': True,
+        }
+    )
+    return plan
+
+
+def get_or_create_subscription(user):
+    """
+    Подписка пользователя; если её нет - создаётся истёкшая на базовом плане.
+    
+    Общая для /api/subscription/ и /api/dashboard/, чтобы оба отдавали один
+    и тот же объект. Создание идёт в основной БД: в read-only view чтение
+    может быть с реплики, которая ещё не видит только что созданную строку.
+    
+    Returns:
+        tuple (subscription, created)
+    """
+    subscription = Subscription.objects.select_related('plan').filter(user=user).first()
+    if subscription is not None:
+        return subscription, False
+    return Subscription.objects.db_manager('default').select_related('plan').get_or_create(
+        user=user,
+        defaults={
+            'plan': get_default_plan(),
+            'status': 'expired',
+        }
+    )
+
+
 class SubscriptionView(APIView):
     """
     API для получения информации о подписке
@@ -30,34 +69,13 @@ class SubscriptionView(APIView):
     
     def get(self, request):
         """Получение информации о текущей подписке пользователя"""
-        # Получаем или создаём подписку пользователя
-        subscription, created = Subscription.objects.select_related('plan').get_or_create(
-            user=request.user,
-            defaults={
-                'plan': self._get_default_plan(),
-                'status': 'expired',
-            }
-        )
+        subscription, created = get_or_create_subscription(request.user)
         
         serializer = SubscriptionSerializer(subscription)
         return Response(serializer.data, status=status.HTTP_200_OK)
-    
-    def _get_default_plan(self):
-        """Получение базового тарифного плана"""
-        # Создаём базовый план, если его нет
-        plan, created = SubscriptionPlan.objects.get_or_create(
-            name='Базовый',
-            defaults={
-                'price_monthly': 299.00,
-                'price_yearly': 2990.00,
-                'features': 'Базовый функционал',
-                'is_active': True,
-            }
-        )
-        return plan
 
 
-class SubscriptionPlansView(generics.ListAPIView):
+class SubscriptionPlansView(ReadReplicaMixin, generics.ListAPIView):
     """
     API для получения списка доступных тарифных планов
     GET /api/subscription/plans/
@@ -65,6 +83,16 @@ class SubscriptionPlansView(generics.ListAPIView):
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.AllowAny]
+    
+    def list(self, request, *args, **kwargs):
+        """Список планов с поддержкой условного GET (ETag)"""
+        etag = queryset_validators('plans', self.get_queryset(), request.query_params.urlencode())
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        # Список планов одинаков для всех пользователей
+        return set_validators(response, etag, private=False)
 
 
 class PayMonthlyView(APIView):
@@ -231,7 +259,7 @@ class PaymentHistoryPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class PaymentHistoryView(generics.ListAPIView):
+class PaymentHistoryView(ReadReplicaMixin, generics.ListAPIView):
     """
     API для получения истории платежей
     GET /api/subscription/payments/
@@ -130,3 +130,42 @@ def subscription(user, subscription_plan):
         auto_renew=True
     )
 
+
+@pytest.fixture
+def openrouter_stub(settings):
+    """
+    Заглушка OpenRouter в фоновом потоке; настройки направлены на неё.
+
+    Поведение меняется через server.config (задержка, ошибки, заготовленные ответы).
+    """
+    from core.openrouter_stub import StubConfig, start_in_thread
+
+    server, url = start_in_thread(config=StubConfig(latency_ms=0))
+    server.url = url
+    settings.OPENROUTER_API_KEY = 'stub-key'
+    settings.OPENROUTER_API_URL = url
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def async_upstream_views(settings):
+    """URL-конфигурация ASGI-режима: /api/dishes/ - асинхронный dish_collection"""
+    import importlib
+
+    from django.urls import clear_url_caches
+
+    import calorio_api.urls
+    import core.urls
+
+    def reload_urls():
+        importlib.reload(core.urls)
+        importlib.reload(calorio_api.urls)
+        clear_url_caches()
+
+    settings.ASYNC_UPSTREAM_VIEWS = True
+    reload_urls()
+    yield
+    settings.ASYNC_UPSTREAM_VIEWS = False
+    reload_urls()
@@ -0,0 +1,150 @@
+"""
+Тесты асинхронных view (ASGI-режим) и клиента OpenRouter
+"""
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import Client
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import openrouter
+from core.async_views import AsyncDishCreateView, AsyncFoodSearchView
+from core.models import Dish
+
+
+def _chat_body(content):
+    return json.dumps({'choices': [{'message': {'content': content}}]}).encode('utf-8')
+
+
+class TestOpenRouterParsing:
+    """Разбор ответов OpenRouter (общий для sync и async view)"""
+    
+    def test_parse_recognized_dish(self):
+        """Блюдо из JSON в ответе модели, в том числе с markdown-обёрткой"""
+        content = (
+            '```json\n{"name": "Борщ", "weight": 300, "calories": 150, "proteins": 5, "fats": 6, "carbohydrates": 18}\n```'
+        )
+        dish = openrouter.parse_recognized_dish(openrouter.message_content(_chat_body(content)))
+        
+        assert dish['name'] == 'Борщ'
+        assert dish['weight'] == 300
+        assert dish['calories'] == 150
+    
+    def test_parse_recognized_dishes_list(self):
+        """Формат {"recognized_dishes": [...]} нормализуется"""
+        content = 'Ответ: {"recognized_dishes": [{"name": "Суп", "weight": 250, "calories": 90}]} конец'
+        dish = openrouter.parse_recognized_dish(content)
+        
+        assert dish['name'] == 'Суп'
+        assert dish['proteins'] == 0
+    
+    def test_parse_recognized_dish_without_json(self):
+        """Ответ без JSON - ValueError"""
+        with pytest.raises(ValueError):
+            openrouter.parse_recognized_dish('не могу распознать')
+    
+    def test_parse_nutrition(self):
+        """КБЖУ из ответа на поиск по названию"""
+        body = _chat_body(
+            '{"name": "Плов", "weight": 200, "calories": 300, "proteins": 10.123, "fats": 12, "carbohydrates": 40}'
+        )
+        data = openrouter.parse_nutrition(body, 'плов', 200)
+        
+        assert data == {'name': 'Плов', 'weight': 200, 'calories': 300, 'proteins': 10.12, 'fats': 12.0, 'carbohydrates': 40.0}
+    
+    def test_parse_nutrition_malformed(self):
+        """Некорректный ответ - None, без исключения"""
+        assert openrouter.parse_nutrition(b'not json', 'плов', 200) is None
+    
+    def test_api_url_override(self, settings):
+        """URL OpenRouter переопределяется настройкой"""
+        settings.OPENROUTER_API_URL = 'http://127.0.0.1:9000/v1/chat/completions'
+        
+        assert openrouter.api_url() == 'http://127.0.0.1:9000/v1/chat/completions'
+
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    """Асинхронные view с подменённым запросом к OpenRouter"""
+    
+    @pytest.fixture
+    def fake_upstream(self, monkeypatch, settings):
+        """Подменяет apost: ответы выдаются после await, как от реального клиента"""
+        settings.OPENROUTER_API_KEY = 'test-key'
+        calls = []
+        
+        async def apost(payload, title, timeout):
+            calls.append(title)
+            await asyncio.sleep(0)
+            content = '{"name": "Блюдо", "weight": 150, "calories": 210, "proteins": 7.5, "fats": 3.2, "carbohydrates": 30}'
+            return 200, _chat_body(content)
+        
+        monkeypatch.setattr(openrouter, 'apost', apost)
+        return calls
+    
+    def _post(self, view, path, data, user):
+        request = APIRequestFactory().post(path, data, format='json')
+        force_authenticate(request, user=user)
+        response = async_to_sync(view)(request)
+        response.render()
+        return response
+    
+    def test_food_search(self, user, fake_upstream):
+        """Поиск КБЖУ через LLM: ответ и заголовки квоты"""
+        response = self._post(AsyncFoodSearchView.as_view(), '/api/dishes/search-nutrition/',
+                              {'food_name': 'блюдо шефа', 'weight': 150}, user)
+        
+        assert response.status_code == 200
+        assert response.data['calories'] == 210
+        assert fake_upstream == [openrouter.NUTRITION_TITLE]
+        assert response['X-Quota-Remaining-Day'] == str(int(response['X-Quota-Limit-Day']) - 1)
+    
+    def test_food_search_validation(self, user, fake_upstream):
+        """Ошибки валидации обрабатываются как в синхронном view"""
+        response = self._post(AsyncFoodSearchView.as_view(), '/api/dishes/search-nutrition/', {}, user)
+        
+        assert response.status_code == 400
+        assert 'food_name' in response.data
+        assert fake_upstream == []
+    
+    def test_requires_authentication(self, fake_upstream):
+        """Без токена - 401"""
+        request = APIRequestFactory().post('/api/dishes/search-nutrition/', {'food_name': 'плов'}, format='json')
+        response = async_to_sync(AsyncFoodSearchView.as_view())(request)
+        
+        assert response.status_code == 401
+    
+    def test_dish_create_with_enrichment(self, user, fake_upstream):
+        """Блюдо без КБЖУ создаётся с найденными значениями"""
+        response = self._post(AsyncDishCreateView.as_view(), '/api/dishes/', {
+            'name': 'блюдо шефа', 'weight': 150, 'date': '2025-01-15', 'meal_type': 'lunch',
+        }, user)
+        
+        assert response.status_code == 201
+        dish = Dish.objects.get(pk=response.data['id'])
+        assert dish.calories == 210
+        assert dish.meal.user == user
+    
+    def test_dish_create_with_nutrition_skips_lookup(self, user, fake_upstream):
+        """Указанные КБЖУ не перезаписываются и LLM не вызывается"""
+        response = self._post(AsyncDishCreateView.as_view(), '/api/dishes/', {
+            'name': 'блюдо шефа', 'weight': 150, 'calories': 100, 'date': '2025-01-15', 'meal_type': 'lunch',
+        }, user)
+        
+        assert response.status_code == 201
+        assert Dish.objects.get(pk=response.data['id']).calories == 100
+        assert fake_upstream == []
+    
+    def test_dish_create_with_csrf_checks(self, test_user, fake_upstream, async_upstream_views):
+        """JWT-запрос к асинхронному /api/dishes/ не требует CSRF-токена, как DRF view"""
+        client = Client(enforce_csrf_checks=True)
+        token = RefreshToken.for_user(test_user).access_token
+        response = client.post('/api/dishes/', {
+            'name': 'блюдо шефа', 'weight': 150, 'calories': 100, 'date': '2025-01-15', 'meal_type': 'lunch',
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+        
+        assert response.status_code == 201
+        assert Dish.objects.filter(user=test_user).count() == 1
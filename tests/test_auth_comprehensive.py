@@ -5,8 +5,11 @@
 import pytest
 from django.contrib.auth import get_user_model
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.management import call_command
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from users.authentication import get_cached_user
+from users.tokens import TOKEN_VERSION_CLAIM, revoke_tokens
 from django.utils import timezone
 from datetime import timedelta
 
@@ -570,3 +573,158 @@ class TestLogout:
                                   {'refresh': refresh_token}, format='json')
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+@pytest.mark.django_db
+class TestCachedAuthentication:
+    """Кэш пользователя JWT-аутентификации (users.authentication)"""
+    
+    def test_user_loaded_once(self, authenticated_client, user, django_assert_num_queries):
+        """Повторные запросы не загружают пользователя из БД"""
+        authenticated_client.get('/api/profile/')
+        
+        with django_assert_num_queries(0):
+            cached = get_cached_user(user.pk)
+        
+        assert (cached.pk, cached.email, cached.is_active) == (user.pk, user.email, True)
+    
+    def test_email_change_visible(self, authenticated_client, user):
+        authenticated_client.get('/api/profile/')
+        
+        response = authenticated_client.patch('/api/profile/', {'email': 'changed@example.com'}, format='json')
+        
+        assert response.data['email'] == 'changed@example.com'
+        assert authenticated_client.get('/api/profile/').data['email'] == 'changed@example.com'
+    
+    def test_deactivation_rejects_token(self, authenticated_client, user):
+        assert authenticated_client.get('/api/profile/').status_code == status.HTTP_200_OK
+        
+        user.is_active = False
+        user.save()
+        
+        assert authenticated_client.get('/api/profile/').status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_deleted_user_rejected(self, authenticated_client, user):
+        authenticated_client.get('/api/profile/')
+        
+        user.delete()
+        
+        assert authenticated_client.get('/api/profile/').status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_password_change_keeps_other_fields(self, authenticated_client, user):
+        """Сохранение пользователя из кэша пишет только загруженные поля"""
+        authenticated_client.get('/api/profile/')
+        User.objects.filter(pk=user.pk).update(first_name='Иван')
+        
+        response = authenticated_client.post('/api/profile/change-password/', {
+            'old_password': 'testpass123', 'new_password': 'newpass123',
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.check_password('newpass123')
+        assert user.first_name == 'Иван'
+
+
+@pytest.mark.django_db
+class TestTokenVersion:
+    """Отзыв токенов версией пользователя (users.tokens)"""
+    
+    PASSWORD_URL = '/api/profile/change-password/'
+    
+    @pytest.fixture
+    def tokens(self, api_client, user):
+        response = api_client.post('/api/auth/login/', {'email': user.email, 'password': 'testpass123'}, format='json')
+        return response.data['tokens']
+    
+    def _change_password(self, api_client, access):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return api_client.post(self.PASSWORD_URL, {
+            'old_password': 'testpass123', 'new_password': 'newpass123',
+        }, format='json')
+    
+    def test_tokens_carry_version(self, api_client, user, tokens):
+        obtained = api_client.post('/api/auth/token/', {'username': user.username, 'password': 'testpass123'}, format='json')
+        
+        assert RefreshToken(tokens['refresh'])[TOKEN_VERSION_CLAIM] == 0
+        assert AccessToken(tokens['access'])[TOKEN_VERSION_CLAIM] == 0
+        assert AccessToken(obtained.data['access'])[TOKEN_VERSION_CLAIM] == 0
+    
+    def test_password_change_revokes_tokens(self, api_client, user, tokens):
+        response = self._change_password(api_client, tokens['access'])
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert not BlacklistedToken.objects.exists()
+        user.refresh_from_db()
+        assert user.token_version == 1
+        
+        # Старые access и refresh токены отклоняются
+        assert api_client.get('/api/profile/').status_code == status.HTTP_401_UNAUTHORIZED
+        api_client.credentials()
+        refresh = api_client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        assert refresh.status_code == status.HTTP_401_UNAUTHORIZED
+        
+        # Новые токены из ответа действуют
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['tokens']['access']}")
+        assert api_client.get('/api/profile/').status_code == status.HTTP_200_OK
+        refresh = api_client.post('/api/auth/token/refresh/', {'refresh': response.data['tokens']['refresh']}, format='json')
+        assert refresh.status_code == status.HTTP_200_OK
+        assert RefreshToken(refresh.data['refresh'])[TOKEN_VERSION_CLAIM] == 1
+    
+    def test_revocation_does_not_scan_outstanding_tokens(self, api_client, user, tokens, django_assert_max_num_queries):
+        """Число запросов не зависит от числа выданных токенов"""
+        for _ in range(20):
+            RefreshToken.for_user(user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        api_client.get('/api/profile/')
+        
+        with django_assert_max_num_queries(7):
+            assert self._change_password(api_client, tokens['access']).status_code == status.HTTP_200_OK
+    
+    def test_tokens_without_claim(self, authenticated_client, user):
+        """Токены, выданные без claim версии, действуют до первого отзыва"""
+        assert authenticated_client.get('/api/profile/').status_code == status.HTTP_200_OK
+        
+        revoke_tokens(user)
+        
+        assert authenticated_client.get('/api/profile/').status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_refresh_deleted_user(self, api_client, user, tokens):
+        user.delete()
+        
+        response = api_client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestPurgeTokens:
+    """Команда purge_tokens"""
+    
+    def _token(self, user, expires_at, blacklisted=False):
+        token = OutstandingToken.objects.create(
+            user=user, jti=f'jti-{OutstandingToken.objects.count()}', token='token', expires_at=expires_at,
+        )
+        if blacklisted:
+            BlacklistedToken.objects.create(token=token)
+        return token
+    
+    def test_purges_expired(self, user, capsys):
+        now = timezone.now()
+        self._token(user, now - timedelta(days=1), blacklisted=True)
+        self._token(user, now - timedelta(days=2))
+        self._token(user, now - timedelta(days=3))
+        alive = self._token(user, now + timedelta(days=1), blacklisted=True)
+        
+        call_command('purge_tokens', '--batch-size', '2')
+        
+        assert list(OutstandingToken.objects.all()) == [alive]
+        assert BlacklistedToken.objects.get().token == alive
+        assert 'Удалено выданных токенов: 3, из чёрного списка: 1' in capsys.readouterr().out
+    
+    def test_dry_run(self, user, capsys):
+        self._token(user, timezone.now() - timedelta(days=1), blacklisted=True)
+        
+        call_command('purge_tokens', '--dry-run')
+        
+        assert OutstandingToken.objects.count() == 1
+        assert 'к удалению: 1, из чёрного списка: 1' in capsys.readouterr().out
@@ -0,0 +1,123 @@
+"""
+Тесты пакетных GET-запросов (POST /api/batch/)
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.test import override_settings
+
+from core.models import DailyGoal, Dish, Meal
+
+URL = '/api/batch/'
+DAYS = ['2025-01-15', '2025-01-16']
+
+
+@pytest.fixture
+def days(user):
+    for day in DAYS:
+        meal = Meal.objects.create(user=user, date=date.fromisoformat(day), meal_type='lunch')
+        Dish.objects.create(
+            user=user, meal=meal, name='Суп', weight=300, calories=200,
+            proteins=Decimal('10'), fats=Decimal('5'), carbohydrates=Decimal('20'),
+        )
+    DailyGoal.objects.create(
+        user=user, date=date.fromisoformat(DAYS[0]), calories=2000,
+        proteins=Decimal('100'), fats=Decimal('50'), carbohydrates=Decimal('200'),
+    )
+
+
+def _batch(client, paths, **extra):
+    return client.post(URL, {'requests': [{'path': path} for path in paths], **extra}, format='json')
+
+
+@pytest.mark.django_db
+class TestBatch:
+    """Выполнение подзапросов"""
+
+    def test_responses_in_order(self, authenticated_client, days, subscription):
+        paths = [f'/api/days/{DAYS[1]}/', '/api/subscription/', f'/api/days/{DAYS[0]}/', '/api/goals/2025-01-15/']
+
+        response = _batch(authenticated_client, paths)
+
+        assert response.status_code == 200
+        items = response.json()['responses']
+        assert [item['path'] for item in items] == paths
+        assert all(item['status'] == 200 for item in items)
+        for path, item in zip(paths, items):
+            assert item['body'] == authenticated_client.get(path).json()
+
+    def test_errors_do_not_fail_batch(self, authenticated_client, days):
+        items = _batch(authenticated_client, [
+            '/api/unknown/', '/api/days/not-a-date/', f'/api/days/{DAYS[0]}/', '/api/goals/2024-01-01/',
+        ]).json()['responses']
+
+        assert [item['status'] for item in items] == [404, 400, 200, 404]
+
+    def test_query_string(self, authenticated_client, days):
+        item = _batch(authenticated_client, [f'/api/dashboard/?date={DAYS[0]}']).json()['responses'][0]
+
+        assert item['status'] == 200
+        assert item['body']['day']['date'] == DAYS[0]
+
+    def test_async_view(self, authenticated_client, days, async_upstream_views):
+        """С ASYNC_UPSTREAM_VIEWS список блюд обслуживает асинхронный view"""
+        item = _batch(authenticated_client, ['/api/dishes/']).json()['responses'][0]
+
+        assert item['status'] == 200
+        assert item['body'] == authenticated_client.get('/api/dishes/').json()
+
+    def test_conditional_headers_ignored(self, authenticated_client, days):
+        """If-None-Match внешнего запроса не превращает подзапросы в 304 без тела"""
+        etag = authenticated_client.get(f'/api/days/{DAYS[0]}/')['ETag']
+
+        item = authenticated_client.post(
+            URL, {'requests': [{'path': f'/api/days/{DAYS[0]}/'}]}, format='json', HTTP_IF_NONE_MATCH=etag,
+        ).json()['responses'][0]
+
+        assert item['status'] == 200
+        assert item['body']['date'] == DAYS[0]
+
+    def test_authenticates_once(self, authenticated_client, days, django_assert_max_num_queries):
+        """Пользователь загружается один раз на пакет, а не на каждый подзапрос"""
+        paths = [f'/api/days/{day}/' for day in DAYS]
+        _batch(authenticated_client, paths)
+
+        # Ответы за день закэшированы - остаются только запросы аутентификации
+        with django_assert_max_num_queries(1):
+            _batch(authenticated_client, paths * 5)
+
+    @pytest.mark.parametrize('payload, field', [
+        ({'requests': []}, 'requests'),
+        ({'requests': [{'path': '/api/days/2025-01-15/', 'method': 'POST'}]}, 'requests'),
+        ({'requests': [{'path': '/admin/'}]}, 'requests'),
+        ({'requests': [{'path': '/api/batch/'}]}, 'requests'),
+    ])
+    def test_invalid(self, authenticated_client, payload, field):
+        response = authenticated_client.post(URL, payload, format='json')
+
+        assert response.status_code == 400
+        assert field in response.json()
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_max_requests(self, authenticated_client):
+        response = _batch(authenticated_client, ['/api/profile/'] * 3)
+
+        assert response.status_code == 400
+
+    def test_requires_auth(self, api_client):
+        assert _batch(api_client, ['/api/profile/']).status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBatchParallel:
+    """Параллельное выполнение в пуле потоков"""
+
+    @override_settings(BATCH_MAX_WORKERS=4)
+    def test_parallel_matches_sequential(self, authenticated_client, days):
+        paths = [f'/api/days/{DAYS[0]}/', '/api/profile/', f'/api/days/{DAYS[1]}/', '/api/unknown/'] * 2
+
+        sequential = _batch(authenticated_client, paths).json()
+        parallel = _batch(authenticated_client, paths, parallel=True).json()
+
+        assert parallel == sequential
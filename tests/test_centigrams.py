@@ -0,0 +1,98 @@
+"""
+Тесты хранения БЖУ в целых сантиграммах
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+
+from core.fields import CentigramField, centigrams, format_centigrams, to_centigrams
+from core.models import DailyGoal, Dish, Meal
+
+
+class TestConversions:
+    """Граммы <-> сантиграммы"""
+
+    @pytest.mark.parametrize('value, expected', [
+        (Decimal('12.50'), 1250),
+        (Decimal('0.29'), 29),
+        (0.29, 29),
+        ('99.99', 9999),
+        (5, 500),
+        (Decimal('0.005'), 1),
+        (Decimal('0'), 0),
+    ])
+    def test_to_centigrams(self, value, expected):
+        assert to_centigrams(value) == expected
+
+    @pytest.mark.parametrize('value, expected', [
+        (0, '0.00'), (5, '0.05'), (1250, '12.50'), (999999, '9999.99'), (-150, '-1.50'),
+    ])
+    def test_format(self, value, expected):
+        assert format_centigrams(value) == expected
+
+    def test_to_python(self):
+        field = CentigramField()
+
+        assert field.to_python('12.5') == Decimal('12.50')
+        assert field.to_python(Decimal('1.5')).as_tuple().exponent == -2
+        with pytest.raises(ValidationError):
+            field.to_python('abc')
+
+
+@pytest.mark.django_db
+class TestCentigramStorage:
+    """Модели хранят целые числа, а снаружи - граммы"""
+
+    @pytest.fixture
+    def dishes(self, user):
+        meal = Meal.objects.create(user=user, date=date(2025, 1, 15), meal_type='lunch')
+        return [
+            Dish.objects.create(
+                user=user, meal=meal, name=f'Блюдо {index}', weight=100, calories=100,
+                proteins=proteins, fats=Decimal('0.2'), carbohydrates=Decimal('10'),
+            )
+            for index, proteins in enumerate([Decimal('0.1'), Decimal('12.55'), Decimal('0.29')])
+        ]
+
+    def test_roundtrip(self, dishes):
+        dish = Dish.objects.get(pk=dishes[1].pk)
+
+        assert dish.proteins == Decimal('12.55')
+        assert dish.proteins.as_tuple().exponent == -2
+        assert Dish.objects.filter(pk=dish.pk).values_list(centigrams('proteins'), flat=True).get() == 1255
+
+    def test_sum_in_sql(self, dishes):
+        """Sum() - целочисленная сумма в SQL, наружу - Decimal граммов"""
+        totals = Dish.objects.aggregate(proteins=Sum('proteins'), fats=Sum('fats'))
+
+        assert totals == {'proteins': Decimal('12.94'), 'fats': Decimal('0.60')}
+
+    def test_lookups_in_grams(self, dishes):
+        assert Dish.objects.filter(proteins__gte=Decimal('12.55')).count() == 1
+        assert Dish.objects.filter(proteins__lt=1).count() == 2
+        Dish.objects.filter(pk=dishes[0].pk).update(proteins=Decimal('7.25'))
+        assert Dish.objects.get(pk=dishes[0].pk).proteins == Decimal('7.25')
+
+    def test_day_totals_exact(self, authenticated_client, dishes, user):
+        """Суммы за день без ошибок округления float (0.1 + 0.2 + ...)"""
+        DailyGoal.objects.create(
+            user=user, date=date(2025, 1, 15), calories=2000, proteins=Decimal('12.94'),
+            fats=Decimal('0.3'), carbohydrates=Decimal('100'),
+        )
+
+        summary = authenticated_client.get('/api/days/2025-01-15/').json()['summary']
+
+        assert summary['total_proteins'] == 12.94
+        assert summary['total_fats'] == 0.6
+        assert summary['goal_progress']['proteins_percent'] == 100.0
+        assert summary['goal_progress']['fats_percent'] == 200.0
+        assert summary['goal_progress']['carbohydrates_percent'] == 30.0
+
+    def test_api_format_unchanged(self, authenticated_client, dishes):
+        results = authenticated_client.get('/api/dishes/').json()['results']
+
+        assert sorted(dish['proteins'] for dish in results) == ['0.10', '0.29', '12.55']
+        assert {dish['fats'] for dish in results} == {'0.20'}
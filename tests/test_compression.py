@@ -0,0 +1,164 @@
+"""
+Тесты сжатия ответов и сжатых вариантов в кэше ответов за день
+"""
+import gzip
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from core import compression
+from core.models import Dish, Meal
+
+requires_brotli = pytest.mark.skipif(compression.brotli is None, reason='brotli не установлен')
+requires_zstd = pytest.mark.skipif(compression.zstandard is None, reason='zstandard не установлен')
+
+DAY = '2025-01-15'
+
+
+def _decompress(content, coding):
+    if coding == 'gzip':
+        return gzip.decompress(content)
+    if coding == 'br':
+        return compression.brotli.decompress(content)
+    return compression.zstandard.ZstdDecompressor().decompress(content)
+
+
+@pytest.fixture
+def heavy_day(user):
+    """День с блюдами на несколько КБ JSON"""
+    for index in range(20):
+        meal, _ = Meal.objects.get_or_create(
+            user=user, date=date.fromisoformat(DAY), meal_type=('breakfast', 'lunch', 'dinner')[index % 3],
+        )
+        Dish.objects.create(
+            user=user, meal=meal, name=f'Блюдо {index}', weight=200, calories=300,
+            proteins=Decimal('12.50'), fats=Decimal('8.00'), carbohydrates=Decimal('40.00'),
+        )
+
+
+class TestNegotiate:
+    """Выбор кодировки по Accept-Encoding"""
+
+    @pytest.mark.parametrize('header, expected', [
+        ('', None),
+        ('identity', None),
+        ('gzip', 'gzip'),
+        ('gzip, deflate', 'gzip'),
+        ('gzip;q=0', None),
+        ('GZIP', 'gzip'),
+        ('*;q=0.5, gzip;q=0', 'zstd'),
+    ])
+    @requires_zstd
+    def test_header(self, header, expected):
+        assert compression.negotiate(header) == expected
+
+    @requires_brotli
+    @requires_zstd
+    def test_server_preference_on_equal_q(self):
+        """При равных q - порядок COMPRESSION_ENCODINGS"""
+        assert compression.negotiate('gzip, br, zstd') == 'zstd'
+        assert compression.negotiate('gzip, br') == 'br'
+        assert compression.negotiate('gzip;q=1, br;q=0.8') == 'gzip'
+
+    def test_configured_encodings(self, settings):
+        settings.COMPRESSION_ENCODINGS = ['gzip']
+
+        assert compression.negotiate('zstd, br, gzip') == 'gzip'
+        assert compression.negotiate('br') is None
+
+    @pytest.mark.parametrize('coding', [
+        'gzip',
+        pytest.param('br', marks=requires_brotli),
+        pytest.param('zstd', marks=requires_zstd),
+    ])
+    def test_roundtrip(self, coding):
+        content = b'{"name": "\xd0\x91\xd0\xbe\xd1\x80\xd1\x89"}' * 100
+
+        assert _decompress(compression.compress(content, coding), coding) == content
+
+
+@pytest.mark.django_db
+class TestCompressionMiddleware:
+    """Сжатие ответов API"""
+
+    @pytest.mark.parametrize('coding', [
+        'gzip',
+        pytest.param('br', marks=requires_brotli),
+        pytest.param('zstd', marks=requires_zstd),
+    ])
+    def test_day_compressed(self, authenticated_client, heavy_day, coding):
+        plain = authenticated_client.get(f'/api/days/{DAY}/')
+        response = authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING=coding)
+
+        assert 'Content-Encoding' not in plain
+        assert response['Content-Encoding'] == coding
+        assert int(response['Content-Length']) == len(response.content) < len(plain.content)
+        assert _decompress(response.content, coding) == plain.content
+        assert 'Accept-Encoding' in response['Vary']
+
+    def test_small_response_not_compressed(self, authenticated_client, settings):
+        settings.COMPRESSION_MIN_SIZE = 100_000
+        response = authenticated_client.get('/api/dishes/', HTTP_ACCEPT_ENCODING='gzip')
+
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response
+
+    def test_dish_page_compressed(self, authenticated_client, heavy_day):
+        response = authenticated_client.get('/api/dishes/', HTTP_ACCEPT_ENCODING='gzip')
+
+        assert response['Content-Encoding'] == 'gzip'
+        assert b'"count":20' in gzip.decompress(response.content)
+
+
+@pytest.mark.django_db
+class TestPrecompressedDayCache:
+    """Кэш ответов за день хранит сжатое тело: попадание не сжимает заново"""
+
+    @pytest.fixture
+    def calls(self, monkeypatch):
+        calls = []
+        original = compression.COMPRESSORS['gzip']
+
+        def counting(content):
+            calls.append(len(content))
+            return original(content)
+
+        monkeypatch.setitem(compression.COMPRESSORS, 'gzip', counting)
+        return calls
+
+    def test_hit_uses_stored_variant(self, authenticated_client, heavy_day, calls):
+        first = authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='gzip')
+        second = authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='gzip')
+
+        assert len(calls) == 1
+        assert second.content == first.content
+        assert second['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in second['Vary']
+
+    @requires_brotli
+    def test_new_coding_stored_on_hit(self, authenticated_client, heavy_day, calls, monkeypatch):
+        """Кодировка, которой ещё нет в записи, сжимается один раз и дописывается"""
+        brotli_calls = []
+        original = compression.COMPRESSORS['br']
+        monkeypatch.setitem(
+            compression.COMPRESSORS, 'br', lambda content: brotli_calls.append(1) or original(content)
+        )
+
+        authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='gzip')
+        authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='br')
+        response = authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='br')
+        authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='gzip')
+
+        assert len(calls) == 1
+        assert len(brotli_calls) == 1
+        assert response['Content-Encoding'] == 'br'
+
+    def test_write_invalidates(self, authenticated_client, heavy_day, user, calls):
+        """После записи версия дня меняется - тело сжимается заново"""
+        authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='gzip')
+        Dish.objects.filter(user=user).first().delete()
+        response = authenticated_client.get(f'/api/days/{DAY}/', HTTP_ACCEPT_ENCODING='gzip')
+
+        assert len(calls) == 2
+        assert gzip.decompress(response.content).count(b'"name"') == 19
@@ -0,0 +1,112 @@
+"""
+Тесты дашборда: профиль, подписка и данные за день одним запросом
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from core.models import DailyGoal, Dish, Meal
+from users.models import Profile
+
+DAY = '2025-01-15'
+
+
+@pytest.fixture
+def day(user):
+    meal = Meal.objects.create(user=user, date=date.fromisoformat(DAY), meal_type='lunch')
+    Dish.objects.create(
+        user=user, meal=meal, name='Суп', weight=300, calories=200,
+        proteins=Decimal('10'), fats=Decimal('5'), carbohydrates=Decimal('20'),
+    )
+    DailyGoal.objects.create(
+        user=user, date=date.fromisoformat(DAY), calories=2000,
+        proteins=Decimal('100'), fats=Decimal('50'), carbohydrates=Decimal('200'),
+    )
+
+
+@pytest.mark.django_db
+class TestDashboard:
+    """GET /api/dashboard/"""
+
+    def test_matches_separate_endpoints(self, authenticated_client, day, subscription):
+        data = authenticated_client.get(f'/api/dashboard/?date={DAY}').json()
+
+        assert data['profile'] == authenticated_client.get('/api/profile/').json()
+        assert data['subscription'] == authenticated_client.get('/api/subscription/').json()
+        assert data['day'] == authenticated_client.get(f'/api/days/{DAY}/').json()
+        assert data['day']['goal']['calories'] == 2000
+
+    def test_defaults_to_today(self, authenticated_client):
+        data = authenticated_client.get('/api/dashboard/').json()
+
+        assert data['day']['date'] == timezone.localdate().isoformat()
+
+    def test_subscription_created_like_subscription_endpoint(self, authenticated_client, user):
+        """Без подписки - та же истёкшая подписка, что отдаёт /api/subscription/"""
+        first = authenticated_client.get('/api/dashboard/')
+        data = first.json()
+
+        assert data['subscription']['status'] == 'expired'
+        assert data['subscription']['plan_name'] == 'Базовый'
+        assert data['subscription'] == authenticated_client.get('/api/subscription/').json()
+        # Тело сохранено под версией после создания подписки
+        assert authenticated_client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+
+    def test_query_plan(self, authenticated_client, day, subscription, django_assert_num_queries):
+        """Профиль, подписка, цель, блюда (пользователь JWT и шаблоны целей - из кэша)"""
+        authenticated_client.get('/api/goals/templates/')
+        authenticated_client.get(f'/api/days/{DAY}/')
+
+        with django_assert_num_queries(4):
+            authenticated_client.get(f'/api/dashboard/?date={DAY}')
+
+    def test_cached_until_change(self, authenticated_client, day, user, subscription, django_assert_num_queries):
+        first = authenticated_client.get(f'/api/dashboard/?date={DAY}')
+
+        with django_assert_num_queries(0):
+            cached = authenticated_client.get(f'/api/dashboard/?date={DAY}')
+        assert cached.content == first.content
+
+        Profile.objects.update_or_create(user=user, defaults={'first_name': 'Пётр'})
+        assert authenticated_client.get(f'/api/dashboard/?date={DAY}').json()['profile']['first_name'] == 'Пётр'
+
+        subscription.auto_renew = not subscription.auto_renew
+        subscription.save()
+        data = authenticated_client.get(f'/api/dashboard/?date={DAY}').json()
+        assert data['subscription']['auto_renew'] == subscription.auto_renew
+
+        Dish.objects.filter(user=user).delete()
+        assert authenticated_client.get(f'/api/dashboard/?date={DAY}').json()['day']['meals']['lunch'] == []
+
+    def test_cache_expires_at_midnight(self, authenticated_client, day, monkeypatch):
+        """Остаток дней подписки зависит от текущей даты: на следующий день тело пересчитывается"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        first = authenticated_client.get(f'/api/dashboard/?date={DAY}')
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        monkeypatch.setattr(timezone, 'localdate', lambda *args, **kwargs: tomorrow)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(f'/api/dashboard/?date={DAY}')
+
+        assert len(queries) > 0
+        assert response['ETag'] != first['ETag']
+
+    def test_not_modified(self, authenticated_client, day):
+        etag = authenticated_client.get(f'/api/dashboard/?date={DAY}')['ETag']
+
+        response = authenticated_client.get(f'/api/dashboard/?date={DAY}', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+
+    def test_invalid_date(self, authenticated_client):
+        response = authenticated_client.get('/api/dashboard/?date=2025-02-30')
+
+        assert response.status_code == 400
+        assert 'date' in response.json()
+
+    def test_requires_auth(self, api_client):
+        assert api_client.get('/api/dashboard/').status_code == 401
@@ -390,3 +390,128 @@ class TestDayData:
         assert response.data['meals']['breakfast'][0]['name'] == 'Моё блюдо'
         assert response.data['summary']['total_calories'] == 100
 
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    """Условные GET-запросы (ETag) для данных за день и целей"""
+    
+    def test_day_returns_validators(self, authenticated_client, dish):
+        """Ответ за день содержит ETag, но не Last-Modified"""
+        response = authenticated_client.get(f'/api/days/{date.today()}/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'].startswith('W/"')
+        assert 'Last-Modified' not in response
+    
+    def test_day_not_modified(self, authenticated_client, dish):
+        """Повторный запрос с If-None-Match возвращает 304 без тела"""
+        url = f'/api/days/{date.today()}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b''
+        assert response['ETag'] == etag
+    
+    def test_day_etag_changes_after_dish_delete(self, authenticated_client, test_user, dish):
+        """Удаление блюда меняет ETag"""
+        url = f'/api/days/{date.today()}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        authenticated_client.delete(f'/api/dishes/{dish.id}/')
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+    
+    def test_day_etag_not_shared_between_users(self, authenticated_client, api_client, user2):
+        """ETag пустого дня разных пользователей не совпадает"""
+        from rest_framework_simplejwt.tokens import RefreshToken
+        url = f'/api/days/{date.today()}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user2).access_token}')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_200_OK
+    
+    def test_goal_not_modified(self, authenticated_client, daily_goal):
+        """Цель на день поддерживает If-None-Match"""
+        url = f'/api/goals/{daily_goal.date}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_if_modified_since_ignored(self, authenticated_client, dish):
+        """Без ETag 304 не отдаётся: после удаления блюда If-Modified-Since не даёт устаревший ответ"""
+        url = f'/api/days/{date.today()}/'
+        authenticated_client.get(url)
+        
+        authenticated_client.delete(f'/api/dishes/{dish.id}/')
+        response = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['meals']['breakfast'] == []
+
+
+@pytest.mark.django_db
+class TestDayResponseCache:
+    """Версионированный кэш ответов за день"""
+    
+    def test_cache_hit_skips_orm(self, authenticated_client, dish, django_assert_num_queries):
+        """Повторный запрос отдаётся из кэша без запросов к БД (пользователь JWT тоже из кэша)"""
+        url = f'/api/days/{date.today()}/'
+        first = authenticated_client.get(url)
+        
+        with django_assert_num_queries(0):
+            second = authenticated_client.get(url)
+        
+        assert second.status_code == status.HTTP_200_OK
+        assert second.content == first.content
+        assert second['ETag'] == first['ETag']
+    
+    def test_cache_hit_not_modified(self, authenticated_client, dish):
+        """Закэшированный ответ тоже поддерживает If-None-Match"""
+        url = f'/api/days/{date.today()}/'
+        etag = authenticated_client.get(url)['ETag']
+        
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_dish_create_invalidates(self, authenticated_client):
+        """Добавление блюда через API сбрасывает кэш дня"""
+        url = f'/api/days/{date.today()}/'
+        authenticated_client.get(url)
+        
+        authenticated_client.post('/api/dishes/', {
+            'name': 'Кофе', 'weight': 200, 'calories': 5, 'proteins': '0.20',
+            'fats': '0', 'carbohydrates': '0', 'date': str(date.today()), 'meal_type': 'breakfast',
+        }, format='json')
+        response = authenticated_client.get(url)
+        
+        assert response.data['summary']['total_calories'] == 5
+    
+    def test_goal_change_invalidates(self, authenticated_client, daily_goal):
+        """Изменение цели сбрасывает кэш дня"""
+        url = f'/api/days/{daily_goal.date}/'
+        authenticated_client.get(url)
+        
+        daily_goal.calories = 2500
+        daily_goal.save()
+        response = authenticated_client.get(url)
+        
+        assert response.data['goal']['calories'] == 2500
+    
+    def test_dish_delete_invalidates(self, authenticated_client, dish):
+        """Удаление блюда сбрасывает кэш дня"""
+        url = f'/api/days/{date.today()}/'
+        authenticated_client.get(url)
+        
+        dish.delete()
+        response = authenticated_client.get(url)
+        
+        assert response.data['meals']['breakfast'] == []
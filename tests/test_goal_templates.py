@@ -0,0 +1,251 @@
+"""
+Тесты шаблонов целей КБЖУ и разрешения целей по дням
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+
+from core.goal_schedule import GoalSchedule, compact_goals, get_schedule
+from core.models import DailyGoal, GoalTemplate
+
+MONDAY = date(2025, 1, 13)
+
+
+def _template_row(effective_from, weekday, calories, effective_to=None):
+    return (effective_from, effective_to, weekday, calories, 10000, 5000, 20000, False, None, None)
+
+
+class TestGoalSchedule:
+    """Поиск версии шаблона для дня"""
+
+    SCHEDULE = GoalSchedule([
+        _template_row(MONDAY, None, 2000),
+        _template_row(MONDAY, 5, 2500),
+        _template_row(MONDAY + timedelta(days=14), None, 1800),
+    ])
+
+    @pytest.mark.parametrize('offset, calories', [
+        (-1, None),
+        (0, 2000),
+        (5, 2500),
+        (6, 2000),
+        (12, 2500),
+        (14, 1800),
+        (19, 1800),
+        (400, 1800),
+    ])
+    def test_goal_for_day(self, offset, calories):
+        row = self.SCHEDULE.goal_row(MONDAY + timedelta(days=offset))
+
+        assert (row[2] if row else None) == calories
+
+    def test_weekday_only_version(self):
+        schedule = GoalSchedule([_template_row(MONDAY, 0, 2000)])
+
+        assert schedule.goal_row(MONDAY)[2] == 2000
+        assert schedule.goal_row(MONDAY + timedelta(days=1)) is None
+
+    def test_effective_to(self):
+        schedule = GoalSchedule([
+            _template_row(MONDAY, None, 2000, effective_to=MONDAY + timedelta(days=6)),
+            _template_row(MONDAY, 6, 2500, effective_to=MONDAY + timedelta(days=6)),
+        ])
+
+        assert schedule.goal_row(MONDAY + timedelta(days=6))[2] == 2500
+        assert schedule.goal_row(MONDAY + timedelta(days=7)) is None
+
+    def test_resolve_prefers_explicit(self):
+        explicit = (7, MONDAY + timedelta(days=1), 1500, 1, 1, 1, False, None, None)
+
+        rows = self.SCHEDULE.resolve(MONDAY - timedelta(days=1), MONDAY + timedelta(days=2), [explicit])
+
+        assert [(row[0], row[1], row[2]) for row in rows] == [
+            (None, MONDAY, 2000),
+            (7, MONDAY + timedelta(days=1), 1500),
+            (None, MONDAY + timedelta(days=2), 2000),
+        ]
+
+
+@pytest.mark.django_db
+class TestGoalTemplateAPI:
+    """CRUD шаблонов и цели из шаблона в API"""
+
+    URL = '/api/goals/templates/'
+
+    @pytest.fixture
+    def template(self, user):
+        return GoalTemplate.objects.create(
+            user=user, effective_from=MONDAY, calories=2000,
+            proteins=Decimal('100'), fats=Decimal('60.5'), carbohydrates=Decimal('250'),
+        )
+
+    def test_create(self, authenticated_client, user):
+        response = authenticated_client.post(self.URL, {
+            'effective_from': '2025-01-13', 'weekday': 5, 'calories': 2500,
+            'proteins': '120,5', 'fats': '70', 'carbohydrates': '300',
+        }, format='json')
+
+        assert response.status_code == 201
+        assert response.data['proteins'] == '120.50'
+        assert GoalTemplate.objects.get(user=user).weekday == 5
+
+    def test_duplicate_rejected(self, authenticated_client, template):
+        response = authenticated_client.post(self.URL, {
+            'effective_from': '2025-01-13', 'calories': 2500, 'proteins': 1, 'fats': 1, 'carbohydrates': 1,
+        }, format='json')
+
+        assert response.status_code == 400
+        assert 'effective_from' in response.data
+
+    def test_effective_to_before_start_rejected(self, authenticated_client):
+        response = authenticated_client.post(self.URL, {
+            'effective_from': '2025-01-13', 'effective_to': '2025-01-12',
+            'calories': 2500, 'proteins': 1, 'fats': 1, 'carbohydrates': 1,
+        }, format='json')
+
+        assert response.status_code == 400
+        assert 'effective_to' in response.data
+
+    def test_list_only_own(self, authenticated_client, template, user2):
+        GoalTemplate.objects.create(
+            user=user2, effective_from=MONDAY, calories=1, proteins=1, fats=1, carbohydrates=1,
+        )
+
+        response = authenticated_client.get(self.URL)
+
+        assert [row['id'] for row in response.data] == [template.pk]
+
+    def test_goal_from_template(self, authenticated_client, template):
+        """Без явной цели на день /api/goals/<date>/ отдаёт цель из шаблона"""
+        response = authenticated_client.get('/api/goals/2025-02-01/')
+
+        assert response.status_code == 200
+        assert response.data['id'] is None
+        assert response.data['date'] == '2025-02-01'
+        assert response.data['fats'] == '60.50'
+        assert authenticated_client.get('/api/goals/2025-01-12/').status_code == 404
+
+    def test_update_creates_override(self, authenticated_client, template, user):
+        response = authenticated_client.put('/api/goals/2025-02-01/', {
+            'calories': 1500, 'proteins': 90, 'fats': 50, 'carbohydrates': 150,
+        }, format='json')
+
+        assert response.status_code == 200
+        assert DailyGoal.objects.get(user=user, date=date(2025, 2, 1)).calories == 1500
+        assert authenticated_client.get('/api/goals/2025-02-02/').data['calories'] == 2000
+
+    def test_day_data_uses_template(self, authenticated_client, template, user):
+        DailyGoal.objects.create(
+            user=user, date=MONDAY + timedelta(days=1), calories=1000, proteins=1, fats=1, carbohydrates=1,
+        )
+
+        monday = authenticated_client.get(f'/api/days/{MONDAY}/').json()
+        tuesday = authenticated_client.get(f'/api/days/{MONDAY + timedelta(days=1)}/').json()
+
+        assert monday['goal']['calories'] == 2000
+        assert monday['goal']['id'] is None
+        assert tuesday['goal']['calories'] == 1000
+
+    def test_template_change_invalidates_days(self, authenticated_client, template):
+        """Изменение шаблона сбрасывает кэш ответов и ETag всех дней"""
+        first = authenticated_client.get(f'/api/days/{MONDAY}/')
+
+        authenticated_client.patch(f'{self.URL}{template.pk}/', {'calories': 2100}, format='json')
+        second = authenticated_client.get(f'/api/days/{MONDAY}/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        assert second.status_code == 200
+        assert second.json()['goal']['calories'] == 2100
+
+        authenticated_client.delete(f'{self.URL}{template.pk}/')
+        assert authenticated_client.get(f'/api/days/{MONDAY}/').json()['goal'] is None
+
+    def test_stats_use_templates(self, authenticated_client, template):
+        data = authenticated_client.get(f'/api/stats/week/{MONDAY}/').json()
+
+        assert data['summary']['days_with_goal'] == 7
+        assert data['days'][6]['goal']['fats'] == 60.5
+
+    def test_schedule_cached(self, template, user, django_assert_num_queries):
+        get_schedule(user.pk)
+
+        with django_assert_num_queries(0):
+            assert get_schedule(user.pk).goal_row(MONDAY)[2] == 2000
+
+
+@pytest.mark.django_db
+class TestCompactGoals:
+    """Перенос истории DailyGoal в шаблоны"""
+
+    def _goals(self, user, start, values):
+        for offset, calories in enumerate(values):
+            if calories is not None:
+                DailyGoal.objects.create(
+                    user=user, date=start + timedelta(days=offset), calories=calories,
+                    proteins=Decimal('100.25'), fats=60, carbohydrates=250,
+                )
+
+    def _resolved(self, user, start, end):
+        overrides = DailyGoal.objects.filter(user=user).values_list(
+            'id', 'date', 'calories', 'proteins', 'fats', 'carbohydrates', 'is_auto_calculated',
+        )
+        schedule = get_schedule(user.pk)
+        resolved = {}
+        for row in schedule.resolve(start, end, list(overrides)):
+            resolved[row[1]] = row[2]
+        return resolved
+
+    def test_history_preserved(self, user):
+        values = [2000] * 10 + [1500] + [2000] * 5 + [1800] * 4 + [2000] * 10
+        self._goals(user, MONDAY, values)
+        end = MONDAY + timedelta(days=len(values) - 1)
+        before = self._resolved(user, MONDAY, end)
+
+        created, deleted = compact_goals(user.pk)
+
+        assert (created, deleted) == (3, 29)
+        assert DailyGoal.objects.filter(user=user).count() == 1
+        assert self._resolved(user, MONDAY, end) == before
+        # Последний шаблон закрыт концом отрезка: дни после него по-прежнему без целей
+        assert get_schedule(user.pk).goal_row(end + timedelta(days=1)) is None
+        assert get_schedule(user.pk).goal_row(end + timedelta(days=30)) is None
+
+    def test_gaps_stay_empty(self, user):
+        """Каждый непрерывный отрезок переносится, дни в пропусках не получают цели"""
+        self._goals(user, MONDAY, [2000] * 5 + [None] * 3 + [2000] * 5)
+
+        assert compact_goals(user.pk) == (2, 10)
+        assert get_schedule(user.pk).goal_row(MONDAY + timedelta(days=6)) is None
+        assert not DailyGoal.objects.filter(user=user).exists()
+
+    def test_history_with_several_gaps(self, user):
+        values = (
+            [2000] * 4 + [None] + [1800] * 6 + [2200] + [None] * 2
+            + [1800] * 2 + [None] + [1800] * 3 + [1600] * 3 + [None] * 4 + [2000] * 5
+        )
+        self._goals(user, MONDAY, values)
+        end = MONDAY + timedelta(days=len(values) + 9)
+        before = self._resolved(user, MONDAY - timedelta(days=3), end)
+
+        created, deleted = compact_goals(user.pk)
+
+        assert (created, deleted) == (5, 21)
+        # Остались только короткие серии: 2200 и две строки 1800 между пропусками
+        assert DailyGoal.objects.filter(user=user).count() == 3
+        assert self._resolved(user, MONDAY - timedelta(days=3), end) == before
+
+    def test_skips_users_with_templates(self, user):
+        self._goals(user, MONDAY, [2000] * 5)
+        GoalTemplate.objects.create(user=user, effective_from=MONDAY, calories=1, proteins=1, fats=1, carbohydrates=1)
+
+        assert compact_goals(user.pk) == (0, 0)
+
+    def test_command_dry_run(self, user, capsys):
+        self._goals(user, MONDAY, [2000] * 7)
+
+        call_command('compact_goals', '--dry-run')
+
+        assert DailyGoal.objects.filter(user=user).count() == 7
+        assert not GoalTemplate.objects.exists()
+        assert 'удалено: 7' in capsys.readouterr().out
@@ -513,3 +513,113 @@ class TestGoalAutoCalculate:
         # Проверяем, что цель одна
         assert DailyGoal.objects.filter(user=test_user, date=test_date).count() == 1
 
+
+@pytest.mark.django_db
+class TestGoalAutoCalculateRange:
+    """Расчёт целей на диапазон дат (POST /api/goals/auto-calculate/range/)"""
+    
+    URL = '/api/goals/auto-calculate/range/'
+    MONDAY = date(2025, 1, 13)
+    
+    def _data(self, **extra):
+        return {
+            'weight': 70,
+            'height': 175,
+            'age': 30,
+            'activity_level': 'moderate',
+            'start_date': str(self.MONDAY),
+            'end_date': str(self.MONDAY + timedelta(days=13)),
+            **extra,
+        }
+    
+    def test_creates_goal_for_every_day(self, authenticated_client, test_user):
+        """Цели на все дни диапазона совпадают с расчётом на один день"""
+        response = authenticated_client.post(self.URL, self._data(), format='json')
+        single = authenticated_client.post('/api/goals/auto-calculate/', {
+            'weight': 70, 'height': 175, 'age': 30, 'activity_level': 'moderate', 'date': '2025-03-01',
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 14
+        assert response.data['updated'] == 0
+        assert response.data['schedule'] == [0] * 14
+        target = response.data['targets'][0]
+        assert target['calories'] == single.data['calories']
+        assert target['proteins'] == single.data['proteins']
+        goals = DailyGoal.objects.filter(user=test_user, date__lt='2025-03-01')
+        assert goals.count() == 14
+        assert all(goal.is_auto_calculated for goal in goals)
+    
+    def test_scenarios_by_weekday(self, authenticated_client, test_user):
+        """Сценарии переопределяют параметры для своих дней недели"""
+        data = self._data(goal='lose', scenarios=[{'weekdays': [0, 2, 4], 'activity_level': 'active'}])
+        
+        response = authenticated_client.post(self.URL, data, format='json')
+        
+        targets = response.data['targets']
+        assert [(target['activity_level'], target['goal']) for target in targets] == [
+            ('active', 'lose'), ('moderate', 'lose'),
+        ]
+        assert response.data['schedule'][:7] == [0, 1, 0, 1, 0, 1, 1]
+        monday = DailyGoal.objects.get(user=test_user, date=self.MONDAY)
+        tuesday = DailyGoal.objects.get(user=test_user, date=self.MONDAY + timedelta(days=1))
+        assert monday.calories == targets[0]['calories'] > tuesday.calories
+    
+    def test_updates_existing_goals(self, authenticated_client, test_user):
+        """Существующие цели перезаписываются, дата создания сохраняется"""
+        existing = DailyGoal.objects.create(
+            user=test_user, date=self.MONDAY, calories=1000, proteins=10, fats=10, carbohydrates=10,
+        )
+        
+        response = authenticated_client.post(self.URL, self._data(), format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 13
+        assert response.data['updated'] == 1
+        goal = DailyGoal.objects.get(pk=existing.pk)
+        assert goal.calories == response.data['targets'][0]['calories']
+        assert goal.is_auto_calculated is True
+        assert goal.created_at == existing.created_at
+        
+        repeated = authenticated_client.post(self.URL, self._data(), format='json')
+        assert repeated.status_code == status.HTTP_200_OK
+        assert DailyGoal.objects.filter(user=test_user).count() == 14
+    
+    def test_single_write_query(self, authenticated_client, django_assert_num_queries):
+        """Диапазон пишется одним запросом, независимо от числа дней"""
+        data = self._data(end_date=str(self.MONDAY + timedelta(days=60)))
+        
+        # пользователь, счётчик существующих целей, bulk upsert (+ SAVEPOINT/RELEASE)
+        with django_assert_num_queries(5):
+            response = authenticated_client.post(self.URL, data, format='json')
+        
+        assert response.data['created'] == 61
+    
+    def test_day_cache_invalidated(self, authenticated_client):
+        """bulk upsert без сигналов всё равно инвалидирует кэш дня"""
+        before = authenticated_client.get(f'/api/days/{self.MONDAY}/').json()
+        
+        authenticated_client.post(self.URL, self._data(), format='json')
+        after = authenticated_client.get(f'/api/days/{self.MONDAY}/').json()
+        
+        assert before['goal'] is None
+        assert after['goal']['is_auto_calculated'] is True
+    
+    @pytest.mark.parametrize('extra, field', [
+        ({'end_date': '2025-01-12'}, 'end_date'),
+        ({'end_date': '2026-01-14'}, 'end_date'),
+        ({'start_date': '13.01.2025'}, 'start_date'),
+        ({'scenarios': [{'weekdays': [0, 1]}, {'weekdays': [1]}]}, 'scenarios'),
+        ({'scenarios': [{'weekdays': [7]}]}, 'scenarios'),
+        ({'scenarios': [{'weekdays': [], 'goal': 'gain'}]}, 'scenarios'),
+        ({'scenarios': [{'weekdays': [0], 'goal': 'invalid'}]}, 'scenarios'),
+    ])
+    def test_invalid_data(self, authenticated_client, test_user, extra, field):
+        response = authenticated_client.post(self.URL, self._data(**extra), format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert field in response.data
+        assert not DailyGoal.objects.filter(user=test_user).exists()
+    
+    def test_without_auth(self, api_client):
+        assert api_client.post(self.URL, self._data(), format='json').status_code == status.HTTP_401_UNAUTHORIZED
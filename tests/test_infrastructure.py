@@ -298,3 +298,421 @@ class TestDataUploadLimits:
         assert hasattr(settings, 'DATA_UPLOAD_MAX_MEMORY_SIZE')
         assert settings.DATA_UPLOAD_MAX_MEMORY_SIZE <= 10485760  # 10 MB
 
+
+class TestCacheLayer:
+    """Слой кэширования core.cache"""
+    
+    def test_keys_are_namespaced(self):
+        """Одинаковые ключи в разных пространствах имён не пересекаются"""
+        from core.cache import get_cache
+        get_cache('ns_a').set('key', 1)
+        get_cache('ns_b').set('key', 2)
+        
+        assert get_cache('ns_a').get('key') == 1
+        assert get_cache('ns_b').get('key') == 2
+    
+    def test_get_or_set_computes_once(self):
+        """get_or_set вычисляет значение один раз"""
+        from core.cache import get_cache
+        cache = get_cache('test_get_or_set')
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            return 'value'
+        
+        assert cache.get_or_set('key', compute) == 'value'
+        assert cache.get_or_set('key', compute) == 'value'
+        assert len(calls) == 1
+    
+    def test_get_or_set_waits_for_lock_holder(self):
+        """Пока другой процесс держит блокировку, get_or_set ждёт его результата"""
+        import threading
+        from core.cache import get_cache
+        cache = get_cache('test_stampede')
+        cache.backend.add(cache.make_key('key') + ':lock', 1, 10)
+        timer = threading.Timer(0.05, lambda: cache.set('key', 'from-other-worker'))
+        timer.start()
+        
+        value = cache.get_or_set('key', lambda: 'computed-here', wait_timeout=2)
+        timer.join()
+        
+        assert value == 'from-other-worker'
+    
+    def test_stats_by_key_family(self):
+        """Статистика попаданий считается по семействам ключей"""
+        from core.cache import get_cache, reset_stats, stats
+        reset_stats()
+        cache = get_cache('test_stats')
+        cache.get('item:1')
+        cache.set('item:1', 'x')
+        cache.get('item:1')
+        cache.get('item:2')
+        
+        family = stats()['test_stats:item']
+        assert family['hits'] == 1
+        assert family['misses'] == 2
+        assert family['hit_ratio'] == round(1 / 3, 4)
+    
+    def test_file_backend_is_shared_store(self, tmp_path, settings):
+        """Файловый кэш работает как общий для процессов стенд вместо Redis"""
+        from django.core.cache import caches
+        from core.cache import NamespacedCache
+        settings.CACHES = {
+            'default': settings.CACHES['default'],
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': str(tmp_path),
+            },
+        }
+        NamespacedCache('throttle', alias='shared').set('counter', 5)
+        
+        assert caches['shared'].get('throttle:counter') == 5
+        assert NamespacedCache('throttle', alias='shared').incr('counter') == 6
+
+
+@pytest.mark.django_db
+class TestReplicaRouting:
+    """Чтение с реплики в read-only view и read-your-writes"""
+    
+    @pytest.fixture
+    def routed(self, monkeypatch):
+        """
+        Реплика "настроена", а решения router'а записываются; сами запросы
+        идут в default (в тестах реплика - зеркало основной БД)
+        """
+        from core import db_router
+        
+        decisions = []
+        original = db_router.ReplicaRouter.db_for_read
+        
+        def spy(router, model, **hints):
+            decisions.append(original(router, model, **hints))
+            return None
+        
+        monkeypatch.setattr(db_router, 'replica_configured', lambda: True)
+        monkeypatch.setattr(db_router.ReplicaRouter, 'db_for_read', spy)
+        return decisions
+    
+    def test_router_decisions(self, monkeypatch):
+        """Реплика - только внутри use_replica(), запись - всегда в default"""
+        from core import db_router
+        from core.models import Dish
+        
+        monkeypatch.setattr(db_router, 'replica_configured', lambda: True)
+        router = db_router.ReplicaRouter()
+        
+        assert router.db_for_read(Dish) is None
+        with db_router.use_replica():
+            assert router.db_for_read(Dish) == 'replica'
+            assert router.db_for_write(Dish) == 'default'
+        assert router.allow_migrate('replica', 'core') is False
+    
+    def test_read_only_view_uses_replica(self, api_client, routed):
+        """Список планов читается с реплики"""
+        api_client.get('/api/subscription/plans/')
+        
+        assert 'replica' in routed
+    
+    def test_write_view_uses_primary(self, authenticated_client, routed):
+        """Изменяющие view читают с основной БД"""
+        authenticated_client.post('/api/dishes/', {
+            'name': 'Каша', 'weight': 200, 'calories': 150,
+            'date': '2025-01-15', 'meal_type': 'breakfast',
+        }, format='json')
+        
+        assert 'replica' not in routed
+    
+    def test_read_your_writes(self, authenticated_client, routed):
+        """После записи пользователь временно читает из основной БД"""
+        authenticated_client.post('/api/dishes/', {
+            'name': 'Каша', 'weight': 200, 'calories': 150,
+            'date': '2025-01-15', 'meal_type': 'breakfast',
+        }, format='json')
+        routed.clear()
+        authenticated_client.get('/api/days/2025-01-15/')
+        
+        assert routed and 'replica' not in routed
+    
+    def test_pinned_before_version_bump(self, test_user, routed, monkeypatch):
+        """Закрепление ставится при записи, до смены версии дня"""
+        from datetime import date
+        from core import db_router, response_cache
+        from core.models import Meal
+        
+        pinned_at_bump = []
+        original = response_cache._bump_twice
+        
+        def spy(key):
+            pinned_at_bump.append(db_router.is_pinned(test_user.pk))
+            original(key)
+        
+        monkeypatch.setattr(response_cache, '_bump_twice', spy)
+        Meal.objects.create(user=test_user, date=date(2025, 1, 15), meal_type='lunch')
+        
+        assert pinned_at_bump == [True]
+    
+    def test_other_users_not_pinned(self, api_client, user2, routed):
+        """Закрепление за основной БД действует только на автора записи"""
+        from core.db_router import pin_to_primary
+        
+        pin_to_primary(user2.pk + 1000)
+        api_client.force_authenticate(user=user2)
+        api_client.get('/api/days/2025-01-15/')
+        
+        assert 'replica' in routed
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    """Метрики Prometheus и их агрегация по процессам"""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_metrics(self):
+        from core import cache as cache_layer, metrics
+        
+        metrics.reset()
+        cache_layer.reset_stats()
+        yield
+        metrics.reset()
+    
+    def test_request_metrics(self, authenticated_client, client, settings):
+        """Длительность по маршруту и статусу, SQL-запросы на запрос"""
+        settings.METRICS_TOKEN = 'secret-token'
+        authenticated_client.get('/api/days/2025-01-15/')
+        authenticated_client.get('/api/days/2025-01-15/')
+        response = client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret-token')
+        body = response.content.decode('utf-8')
+        
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert 'calorio_http_request_duration_seconds_count{route="api/days/<str:date>/",method="GET",status="200"} 2' in body
+        assert 'calorio_db_queries_per_request_count{route="api/days/<str:date>/"} 2' in body
+        assert 'calorio_cache_hit_ratio{family="day:response"} 0.5' in body
+    
+    def test_async_chain(self, test_user):
+        """Под ASGI middleware асинхронные, SQL-запросы из потоков sync_to_async учитываются"""
+        from asgiref.sync import async_to_sync, iscoroutinefunction
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from core import metrics
+        from core.compression import CompressionMiddleware
+        from core.db_router import ReplicaPinMiddleware
+        
+        async def get_response(request):
+            return None
+        
+        for middleware in (metrics.MetricsMiddleware, CompressionMiddleware, ReplicaPinMiddleware):
+            assert iscoroutinefunction(middleware(get_response))
+        
+        token = RefreshToken.for_user(test_user).access_token
+        response = async_to_sync(AsyncClient().get)(
+            '/api/days/2025-01-15/', headers={'Authorization': f'Bearer {token}'},
+        )
+        series = metrics.collect()[metrics.DB_QUERIES.name][('api/days/<str:date>/',)]
+        
+        assert response.status_code == 200
+        assert series['count'] == 1
+        assert series['sum'] >= 1
+    
+    def test_unmatched_route(self, api_client):
+        """Несуществующие URL - одна серия, без пути в метке"""
+        from core import metrics
+        
+        api_client.get('/api/no-such-endpoint-12345/')
+        
+        assert ('unmatched', 'GET', '404') in metrics.collect()[metrics.REQUEST_DURATION.name]
+    
+    def test_openrouter_metrics(self, openrouter_stub):
+        """Длительность и исход запросов к OpenRouter по моделям"""
+        from core import metrics, openrouter
+        from core.utils import search_food_nutrition
+        
+        search_food_nutrition('блюдо шефа 42', 200)
+        openrouter_stub.config.failures = {429: 1.0}
+        search_food_nutrition('блюдо шефа 42', 200)
+        
+        series = metrics.collect()[metrics.OPENROUTER_DURATION.name]
+        assert series[(openrouter.NUTRITION_MODEL, 'ok')]['count'] == 1
+        assert series[(openrouter.NUTRITION_MODEL, '429')]['count'] == 1
+    
+    def test_throttle_rejections(self, api_client):
+        """Отказы throttling считаются по view"""
+        from core import metrics
+        
+        for _ in range(11):
+            api_client.post('/api/auth/login/', {'email': 'x@example.com', 'password': 'x'}, format='json')
+        
+        assert metrics.collect()[metrics.REJECTIONS.name][('throttle', 'LoginView')] >= 1
+    
+    def test_multiprocess_aggregation(self, settings, tmp_path):
+        """Снимки других процессов суммируются; gauge завершившихся - отбрасываются"""
+        import json
+        from core import metrics
+        
+        settings.METRICS_DIR = str(tmp_path)
+        metrics.DB_QUERIES.observe(2, route='api/x/')
+        metrics.REQUESTS_IN_PROGRESS.inc()
+        other = {
+            metrics.DB_QUERIES.name: [[['api/x/'], {'buckets': [0, 0, 0, 1, 0, 0, 0, 0, 0, 0], 'sum': 3, 'count': 1}]],
+            metrics.REQUESTS_IN_PROGRESS.name: [[[], 5]],
+        }
+        # pid, которого нет в системе
+        (tmp_path / '999999999.json').write_text(json.dumps(other))
+        
+        total = metrics.collect()
+        
+        assert total[metrics.DB_QUERIES.name][('api/x/',)]['count'] == 2
+        assert total[metrics.DB_QUERIES.name][('api/x/',)]['sum'] == 5
+        assert total[metrics.REQUESTS_IN_PROGRESS.name][()] == 1
+        metrics.REQUESTS_IN_PROGRESS.dec()
+    
+    def test_flush_writes_snapshot(self, settings, tmp_path):
+        """Снимок процесса записывается в METRICS_DIR/<pid>.json"""
+        from core import metrics
+        
+        settings.METRICS_DIR = str(tmp_path)
+        metrics.flush(force=True)
+        
+        assert (tmp_path / f'{os.getpid()}.json').exists()
+    
+    def test_token_required(self, api_client, settings):
+        """При заданном METRICS_TOKEN без токена - 401"""
+        settings.METRICS_TOKEN = 'secret-token'
+        
+        assert api_client.get('/api/metrics/').status_code == 401
+        assert api_client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret-token').status_code == 200
+    
+    def test_hidden_without_token(self, api_client, settings):
+        """Без METRICS_TOKEN вне DEBUG - 404, в DEBUG - открыт"""
+        settings.METRICS_TOKEN = ''
+        settings.DEBUG = False
+        
+        assert api_client.get('/api/metrics/').status_code == 404
+        
+        settings.DEBUG = True
+        
+        assert api_client.get('/api/metrics/').status_code == 200
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    """Профилирование запросов из выборки"""
+    
+    @pytest.fixture
+    def profiling(self, settings, tmp_path):
+        settings.PROFILING_ENABLED = True
+        settings.PROFILING_SAMPLE_RATE = 0
+        settings.PROFILING_TOKEN = 'profile-token'
+        settings.PROFILING_USERS = []
+        settings.PROFILING_CAPTURE = ''
+        settings.PROFILING_DIR = str(tmp_path)
+        return settings
+    
+    def test_disabled_by_default(self, authenticated_client, settings):
+        """Без PROFILING_ENABLED middleware не участвует в цепочке"""
+        settings.PROFILING_ENABLED = False
+        response = authenticated_client.get('/api/days/2025-01-15/')
+        
+        assert 'Server-Timing' not in response
+    
+    def test_not_sampled(self, authenticated_client, profiling):
+        """Запрос вне выборки не профилируется"""
+        response = authenticated_client.get('/api/days/2025-01-15/')
+        
+        assert 'Server-Timing' not in response
+    
+    def test_header_sampling(self, authenticated_client, profiling, tmp_path):
+        """По заголовку с токеном - разбивка в Server-Timing и в PROFILING_DIR"""
+        import json
+        
+        authenticated_client.post('/api/dishes/', {
+            'name': 'Каша', 'weight': 200, 'calories': 150, 'proteins': '5.00', 'fats': '3.00',
+            'carbohydrates': '25.00', 'date': '2025-01-15', 'meal_type': 'breakfast',
+        }, format='json')
+        response = authenticated_client.get('/api/days/2025-01-15/', HTTP_X_CALORIO_PROFILE='profile-token')
+        profile = json.loads((tmp_path / f"{response['X-Profile-Id']}.json").read_text())
+        
+        assert 'sql;dur=' in response['Server-Timing']
+        assert profile['view'] == 'core:day-data'
+        assert profile['reason'] == 'header'
+        assert profile['sql_count'] >= 1
+        assert profile['serializer_ms'] > 0
+        assert profile['render_ms'] > 0
+    
+    def test_serializer_timing_restored(self, authenticated_client, profiling):
+        """Подмена методов сериализаторов действует только на время профилируемого запроса"""
+        from rest_framework.serializers import BaseSerializer
+        
+        is_valid, data = BaseSerializer.is_valid, BaseSerializer.data
+        response = authenticated_client.get('/api/days/2025-01-15/', HTTP_X_CALORIO_PROFILE='profile-token')
+        
+        assert 'Server-Timing' in response
+        assert BaseSerializer.is_valid is is_valid
+        assert BaseSerializer.data is data
+    
+    def test_wrong_token_ignored(self, authenticated_client, profiling):
+        """Неверный токен - без профиля"""
+        response = authenticated_client.get('/api/days/2025-01-15/', HTTP_X_CALORIO_PROFILE='wrong')
+        
+        assert 'Server-Timing' not in response
+    
+    def test_user_sampling(self, authenticated_client, profiling, test_user):
+        """Пользователь из PROFILING_USERS (по JWT) профилируется"""
+        profiling.PROFILING_USERS = [str(test_user.pk)]
+        response = authenticated_client.get('/api/days/2025-01-15/')
+        
+        assert 'Server-Timing' in response
+    
+    def test_upstream_time(self, authenticated_client, profiling, openrouter_stub, tmp_path):
+        """Время ожидания OpenRouter - в фазе upstream"""
+        import json
+        
+        openrouter_stub.config.latency_ms = 50
+        response = authenticated_client.post(
+            '/api/dishes/search-nutrition/', {'food_name': 'блюдо шефа 42', 'weight': 200},
+            format='json', HTTP_X_CALORIO_PROFILE='profile-token',
+        )
+        profile = json.loads((tmp_path / f"{response['X-Profile-Id']}.json").read_text())
+        
+        assert profile['upstream_ms'] >= 50
+    
+    def test_async_chain(self, profiling, test_user):
+        """Профилирование в асинхронной цепочке (ASGI)"""
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        
+        token = RefreshToken.for_user(test_user).access_token
+        response = async_to_sync(AsyncClient().get)('/api/days/2025-01-15/', headers={
+            'Authorization': f'Bearer {token}', 'X-Calorio-Profile': 'profile-token',
+        })
+        
+        assert response.status_code == 200
+        assert 'sql;dur=' in response['Server-Timing']
+        assert response['X-Profile-Id']
+    
+    @pytest.mark.parametrize('capture, suffix', [('cprofile', '.prof'), ('stack', '.folded')])
+    def test_capture_and_command(self, authenticated_client, profiling, tmp_path, capture, suffix):
+        """Захват профиля и агрегация командой profiles"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        profiling.PROFILING_CAPTURE = capture
+        profiling.PROFILING_STACK_INTERVAL_MS = 1
+        for _ in range(2):
+            authenticated_client.get('/api/days/2025-01-15/', HTTP_X_CALORIO_PROFILE='profile-token')
+        
+        assert len(list(tmp_path.glob(f'*{suffix}'))) == 2
+        
+        output = StringIO()
+        call_command('profiles', '--dir', str(tmp_path), '--aggregate', stdout=output)
+        assert 'day-data' in output.getvalue()
+        
+        output = StringIO()
+        if capture == 'cprofile':
+            call_command('profiles', '--dir', str(tmp_path), '--view', 'core:day-data', '--stats', stdout=output)
+            assert 'Объединено профилей: 2' in output.getvalue()
+        else:
+            call_command('profiles', '--dir', str(tmp_path), '--folded', str(tmp_path / 'all.txt'), stdout=output)
+            assert (tmp_path / 'all.txt').exists()
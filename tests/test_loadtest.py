@@ -0,0 +1,46 @@
+"""
+Тесты нагрузочного теста
+"""
+import pytest
+
+from core import benchmarks
+from core.loadtest import LoadTest, bench_users, summarize
+
+
+class TestSummarize:
+    """Отчёт нагрузочного теста"""
+
+    def test_per_endpoint_stats(self):
+        """Перцентили, пропускная способность и ошибки по endpoint'ам; 429 - отдельно"""
+        records = [
+            ('login', 200, 10.0), ('login', 200, 30.0),
+            ('day_view', 500, 5.0), ('day_view', 429, 1.0), ('day_view', 0, 60.0),
+        ]
+        report = summarize(records, elapsed=2.0)
+
+        assert report['endpoints']['login']['requests'] == 2
+        assert report['endpoints']['login']['throughput_rps'] == 1.0
+        assert report['endpoints']['login']['p50_ms'] == 10.0
+        assert report['endpoints']['day_view']['errors'] == 2
+        assert report['endpoints']['day_view']['throttled'] == 1
+        assert report['total']['requests'] == 5
+
+    def test_requires_limit(self):
+        """Без duration и sessions нагрузка не запускается"""
+        with pytest.raises(ValueError):
+            LoadTest('http://127.0.0.1:1', bench_users(1))
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoadTestRun:
+    """Полная сессия против живого сервера и заглушки"""
+
+    def test_sessions(self, live_server, openrouter_stub):
+        """Все шаги сессии выполняются без ошибок"""
+        benchmarks.seed(users=2, dishes_per_user=4, days=2)
+
+        report = LoadTest(live_server.url, bench_users(2), concurrency=2, sessions=2, dishes_per_session=2).run()
+
+        assert set(report['endpoints']) == {'login', 'day_view', 'stats_week', 'dish_create', 'food_search', 'recognize'}
+        assert report['endpoints']['dish_create']['requests'] == 4
+        assert report['total']['errors'] == 0
@@ -0,0 +1,170 @@
+"""
+Тесты заглушки OpenRouter и работы с OpenRouter через HTTP
+"""
+import json
+import statistics
+
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+
+from core import openrouter
+from core.loadtest import sample_image_base64
+from core.openrouter_stub import StubConfig
+from core.utils import asearch_food_nutrition, search_food_nutrition
+
+# Нет в локальной базе: поиск всегда уходит в OpenRouter
+FOOD_NAME = 'блюдо шефа 42'
+
+
+class TestStubConfig:
+    """Задержки и исходы заглушки"""
+
+    def test_uniform_latency_bounds(self):
+        """uniform - в пределах latency ± jitter"""
+        config = StubConfig(latency_ms=100, jitter_ms=20, distribution='uniform', seed=1)
+        samples = [config.latency() for _ in range(500)]
+
+        assert 80 <= min(samples) and max(samples) <= 120
+
+    def test_lognormal_latency_median(self):
+        """lognormal - медиана около latency_ms, длинный правый хвост"""
+        config = StubConfig(latency_ms=100, jitter_ms=100, distribution='lognormal', seed=1)
+        samples = [config.latency() for _ in range(2000)]
+
+        assert 90 <= statistics.median(samples) <= 110
+        assert max(samples) > 300
+
+    def test_outcome_rates(self):
+        """Доли ошибок и некорректных ответов соблюдаются"""
+        config = StubConfig(failures={402: 0.1, 429: 0.2}, malformed_rate=0.1, seed=1)
+        outcomes = [config.outcome() for _ in range(5000)]
+
+        assert outcomes.count(402) / 5000 == pytest.approx(0.1, abs=0.02)
+        assert outcomes.count(429) / 5000 == pytest.approx(0.2, abs=0.02)
+        assert outcomes.count('malformed') / 5000 == pytest.approx(0.1, abs=0.02)
+
+    def test_invalid_config(self):
+        """Доли больше 1 и неизвестное распределение - ValueError"""
+        with pytest.raises(ValueError):
+            StubConfig(failures={500: 0.8}, malformed_rate=0.3)
+        with pytest.raises(ValueError):
+            StubConfig(distribution='pareto')
+
+
+class TestStubServer:
+    """Заглушка отвечает в формате chat completions"""
+
+    def test_canned_nutrition(self, openrouter_stub):
+        """Ответ детерминирован и содержит JSON блюда из промпта"""
+        payload = openrouter.nutrition_payload('Плов', 300)
+        first = requests.post(openrouter_stub.url, json=payload, timeout=5).json()
+        second = requests.post(openrouter_stub.url, json=payload, timeout=5).json()
+        dish = json.loads(first['choices'][0]['message']['content'])
+
+        assert first == second
+        assert dish['name'] == 'Плов'
+        assert dish['weight'] == 300
+
+    def test_error_injection(self, openrouter_stub):
+        """429 - с Retry-After, тело ошибки в формате OpenRouter"""
+        openrouter_stub.config.failures = {429: 1.0}
+        response = requests.post(openrouter_stub.url, json={'messages': []}, timeout=5)
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        assert response.json()['error']['code'] == 429
+        assert openrouter_stub.stats[429] == 1
+
+    def test_unknown_path(self, openrouter_stub):
+        """Другие пути - 404"""
+        url = openrouter_stub.url.replace('/chat/completions', '/other')
+
+        assert requests.post(url, json={}, timeout=5).status_code == 404
+
+
+@pytest.mark.django_db
+class TestFoodSearchOverHTTP:
+    """search_food_nutrition против заглушки: весь путь через HTTP"""
+
+    def test_success(self, openrouter_stub):
+        """КБЖУ из ответа заглушки"""
+        data = search_food_nutrition(FOOD_NAME, 200)
+
+        assert data['name'] == FOOD_NAME
+        assert data['weight'] == 200
+        assert data['calories'] > 0
+        assert openrouter_stub.stats[200] == 1
+
+    def test_canned_response(self, openrouter_stub):
+        """Заготовленные значения на 100 г масштабируются на вес"""
+        openrouter_stub.config.canned = {FOOD_NAME: {'calories': 150, 'proteins': 10, 'fats': 5, 'carbohydrates': 20}}
+
+        data = search_food_nutrition(FOOD_NAME, 200)
+
+        assert data == {
+            'name': FOOD_NAME, 'weight': 200, 'calories': 300, 'proteins': 20.0, 'fats': 10.0, 'carbohydrates': 40.0,
+        }
+
+    @pytest.mark.parametrize('status_code', [402, 429, 500, 502, 503])
+    def test_upstream_errors(self, openrouter_stub, status_code):
+        """Ошибки OpenRouter - None без исключения"""
+        openrouter_stub.config.failures = {status_code: 1.0}
+
+        assert search_food_nutrition(FOOD_NAME, 200) is None
+        assert openrouter_stub.stats[status_code] == 1
+
+    @pytest.mark.parametrize('mode', ['body', 'content', 'choices'])
+    def test_malformed_responses(self, openrouter_stub, mode):
+        """Некорректный ответ со статусом 200 - None без исключения"""
+        openrouter_stub.config.malformed_rate = 1.0
+        openrouter_stub.config.malformed_mode = mode
+
+        assert search_food_nutrition(FOOD_NAME, 200) is None
+
+    def test_timeout(self, openrouter_stub, monkeypatch):
+        """Ответ дольше таймаута - None"""
+        openrouter_stub.config.latency_ms = 500
+        monkeypatch.setattr(openrouter, 'NUTRITION_TIMEOUT', 0.1)
+
+        assert search_food_nutrition(FOOD_NAME, 200) is None
+
+    def test_async_success(self, openrouter_stub):
+        """Асинхронный поиск через httpx - тот же результат"""
+        assert async_to_sync(asearch_food_nutrition)(FOOD_NAME, 200) == search_food_nutrition(FOOD_NAME, 200)
+
+
+@pytest.mark.django_db
+class TestRecognitionOverHTTP:
+    """Распознавание блюда против заглушки"""
+
+    def test_success(self, authenticated_client, openrouter_stub):
+        """Распознанное блюдо из ответа заглушки"""
+        response = authenticated_client.post(
+            '/api/dishes/recognize/', {'image_base64': sample_image_base64()}, format='json'
+        )
+
+        assert response.status_code == 200
+        assert response.data['recognized_dishes'][0]['name'] == 'Тестовое блюдо'
+
+    @pytest.mark.parametrize('status_code', [402, 429])
+    def test_upstream_unavailable(self, authenticated_client, openrouter_stub, status_code):
+        """Нет кредитов и лимит OpenRouter - 503 клиенту"""
+        openrouter_stub.config.failures = {status_code: 1.0}
+
+        response = authenticated_client.post(
+            '/api/dishes/recognize/', {'image_base64': sample_image_base64()}, format='json'
+        )
+
+        assert response.status_code == 503
+
+    def test_malformed_content(self, authenticated_client, openrouter_stub):
+        """Ответ модели без JSON - 500 с понятным сообщением"""
+        openrouter_stub.config.malformed_rate = 1.0
+
+        response = authenticated_client.post(
+            '/api/dishes/recognize/', {'image_base64': sample_image_base64()}, format='json'
+        )
+
+        assert response.status_code == 500
+        assert 'Не удалось распознать блюдо' in response.data['detail']
@@ -2,10 +2,17 @@
 Полные тесты для профиля пользователя (2.1-2.3)
 Покрывает все пункты из TEST_CHECKLIST.md раздел 2
 """
+from datetime import timedelta
+from decimal import Decimal
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from core.goal_schedule import get_schedule
+from core.models import DailyGoal, GoalTemplate
+from core.utils import auto_calculate_goals, memoized_goals
 from users.models import Profile
 
 User = get_user_model()
@@ -75,6 +82,19 @@ class TestProfileRetrieve:
         assert response.data['email'] == user.email
         profile = Profile.objects.get(user=user)
         assert response.data['first_name'] == profile.first_name
+    
+    def test_get_profile_not_modified(self, authenticated_user):
+        """Повторный запрос профиля с If-None-Match возвращает 304, после изменения - 200"""
+        api_client, user, user_id = authenticated_user
+        etag = api_client.get('/api/profile/')['ETag']
+        
+        response = api_client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        
+        api_client.patch('/api/profile/', {'first_name': 'Пётр'}, format='json')
+        response = api_client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['first_name'] == 'Пётр'
 
 
 @pytest.mark.django_db
@@ -214,6 +234,97 @@ class TestProfileUpdate:
         assert response.data['email'] == 'petr@example.com'
 
 
+@pytest.mark.django_db
+class TestProfileGoalRecalculation:
+    """Пересчёт автоматических целей при изменении профиля (auto_update_goals)"""
+    
+    PARAMS = {
+        'weight': '70', 'height': 175, 'age': 30, 'activity_level': 'moderate', 'auto_update_goals': True,
+    }
+    
+    @pytest.fixture
+    def goals(self, user):
+        today = timezone.localdate()
+        result = {}
+        for name, offset, auto in [('past', -1, True), ('today', 0, True), ('future', 3, True), ('manual', 4, False)]:
+            result[name] = DailyGoal.objects.create(
+                user=user, date=today + timedelta(days=offset), calories=1000,
+                proteins=10, fats=10, carbohydrates=10, is_auto_calculated=auto,
+            )
+        return result
+    
+    def test_future_auto_goals_recalculated(self, authenticated_client, goals):
+        response = authenticated_client.patch('/api/profile/', self.PARAMS, format='json')
+        expected = auto_calculate_goals(70.0, 175, 30, 'moderate')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['goals_updated'] == 2
+        for name in ('today', 'future'):
+            goals[name].refresh_from_db()
+            assert goals[name].calories == expected['calories']
+            assert goals[name].proteins == expected['proteins']
+        for name in ('past', 'manual'):
+            goals[name].refresh_from_db()
+            assert goals[name].calories == 1000
+    
+    def test_identical_save_is_noop(self, authenticated_client, goals):
+        authenticated_client.patch('/api/profile/', self.PARAMS, format='json')
+        DailyGoal.objects.filter(pk=goals['future'].pk).update(calories=1234)
+        
+        response = authenticated_client.patch('/api/profile/', self.PARAMS, format='json')
+        
+        assert response.data['goals_updated'] == 0
+        goals['future'].refresh_from_db()
+        assert goals['future'].calories == 1234
+    
+    def test_disabled_by_default(self, authenticated_client, goals):
+        params = {**self.PARAMS}
+        del params['auto_update_goals']
+        
+        response = authenticated_client.patch('/api/profile/', params, format='json')
+        
+        assert 'goals_updated' not in response.data
+        goals['future'].refresh_from_db()
+        assert goals['future'].calories == 1000
+        assert Profile.objects.get(user=goals['future'].user).weight == Decimal('70')
+    
+    def test_incomplete_profile_skipped(self, authenticated_client, goals):
+        response = authenticated_client.patch('/api/profile/', {'auto_update_goals': True, 'age': 30}, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert 'goals_updated' not in response.data
+    
+    def test_memoized(self, authenticated_client, goals):
+        memoized_goals.cache_clear()
+        authenticated_client.patch('/api/profile/', self.PARAMS, format='json')
+        authenticated_client.patch('/api/profile/', {'weight': '71'}, format='json')
+        authenticated_client.patch('/api/profile/', {'weight': '70.00'}, format='json')
+        
+        info = memoized_goals.cache_info()
+        assert (info.misses, info.hits) == (2, 1)
+    
+    def test_auto_template_split_at_today(self, authenticated_client, user):
+        """Действующий автоматический шаблон не меняется задним числом"""
+        start = timezone.localdate() - timedelta(days=10)
+        GoalTemplate.objects.create(
+            user=user, effective_from=start, calories=1000, proteins=10, fats=10, carbohydrates=10,
+            is_auto_calculated=True,
+        )
+        
+        authenticated_client.patch('/api/profile/', self.PARAMS, format='json')
+        schedule = get_schedule(user.pk)
+        
+        assert schedule.goal_row(start)[2] == 1000
+        assert schedule.goal_row(timezone.localdate())[2] == auto_calculate_goals(70.0, 175, 30, 'moderate')['calories']
+    
+    @pytest.mark.parametrize('field, value', [('weight', 0), ('age', 200), ('activity_level', 'x'), ('goal', 'x')])
+    def test_invalid_params(self, authenticated_client, field, value):
+        response = authenticated_client.patch('/api/profile/', {field: value}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert field in response.data
+
+
 @pytest.mark.django_db
 class TestPasswordChange:
     """2.3. Смена пароля (POST /api/profile/change-password/)"""
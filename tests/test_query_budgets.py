@@ -0,0 +1,84 @@
+"""
+Бюджеты SQL-запросов горячих endpoint'ов (регрессии N+1)
+
+Бюджеты общие с командой benchmark (core.benchmarks.QUERY_BUDGETS) и не
+зависят от объёма данных, поэтому проверяются на небольшом наборе.
+"""
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+from core import benchmarks
+from core.models import Dish
+
+
+@pytest.fixture
+def bench_user(db):
+    """Пользователь с историей блюд, целей и подпиской"""
+    benchmarks.seed(users=2, dishes_per_user=60, days=15, batch_size=50)
+    return Dish.objects.filter(user__username__startswith=benchmarks.USERNAME_PREFIX).order_by('user_id').first().user
+
+
+@pytest.fixture
+def bench_client(api_client, bench_user):
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(bench_user).access_token}')
+    return api_client
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """Число запросов не превышает бюджет"""
+    
+    @pytest.mark.parametrize('name', list(benchmarks.QUERY_BUDGETS))
+    def test_endpoint_within_budget(self, name, bench_client, bench_user, django_assert_max_num_queries):
+        """Каждый сценарий бенчмарка укладывается в свой бюджет"""
+        day_dates = sorted(set(bench_user.meals.values_list('date', flat=True)), reverse=True)
+        scenario = {item[0]: item for item in benchmarks.scenarios(bench_user, day_dates)}[name]
+        _, method, request_for = scenario
+        send = getattr(bench_client, method)
+        
+        def request(iteration):
+            path, data = request_for(iteration)
+            return send(path, data, format='json') if data is not None else send(path)
+        
+        # Прогрев: кэш ответов дня, создание приёма пищи и т.п.
+        request(0)
+        with django_assert_max_num_queries(benchmarks.QUERY_BUDGETS[name]):
+            response = request(1)
+        
+        assert response.status_code < 400
+    
+    def test_day_view_does_not_grow_with_dishes(self, bench_client, bench_user, django_assert_max_num_queries):
+        """Число запросов дня не зависит от числа блюд в нём"""
+        day = bench_user.meals.order_by('-date').first()
+        for index in range(20):
+            Dish.objects.create(user=bench_user, meal=day, name=f'Блюдо {index}', weight=100, calories=100,
+                                proteins=1, fats=1, carbohydrates=1)
+        
+        with django_assert_max_num_queries(benchmarks.QUERY_BUDGETS['day_view']):
+            response = bench_client.get(f'/api/days/{day.date.isoformat()}/')
+        
+        assert response.status_code == 200
+    
+    def test_percentile(self):
+        """Перцентиль методом ближайшего ранга"""
+        values = list(range(1, 101))
+        
+        assert benchmarks.percentile(values, 50) == 50
+        assert benchmarks.percentile(values, 99) == 99
+        assert benchmarks.percentile([5.0], 95) == 5.0
+        assert benchmarks.percentile([], 50) == 0.0
+
+
+@pytest.mark.django_db
+class TestAdminQueries:
+    """Админ-панель блюд без N+1"""
+    
+    def test_dish_changelist(self, client, bench_user, django_assert_max_num_queries):
+        """Список блюд в админке: число запросов не зависит от числа строк"""
+        from django.contrib.auth import get_user_model
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'AdminPassw0rd!')
+        client.force_login(admin)
+        
+        with django_assert_max_num_queries(10):
+            response = client.get('/admin/core/dish/')
+        
+        assert response.status_code == 200
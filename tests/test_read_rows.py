@@ -0,0 +1,103 @@
+"""
+Тесты быстрых путей чтения: строки из values_list() совпадают с сериализаторами
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import DailyGoal, Dish, Meal
+from core.serializers import (
+    DISH_ROW_FIELDS, GOAL_ROW_FIELDS, DailyGoalSerializer, DishSerializer, dish_rows, goal_row,
+)
+
+DAY = date(2025, 1, 15)
+
+
+@pytest.fixture
+def day_dishes(user):
+    """Блюда за день в разных приёмах пищи, включая нулевые и дробные значения"""
+    dishes = []
+    for index, (meal_type, proteins) in enumerate([
+        ('breakfast', '0'), ('breakfast', '12.5'), ('lunch', '99.99'), ('snack', '0.01'), ('dinner', '1000'),
+    ]):
+        meal, _ = Meal.objects.get_or_create(user=user, date=DAY, meal_type=meal_type)
+        dishes.append(Dish.objects.create(
+            user=user, meal=meal, name=f'Блюдо {index}', weight=100 + index, calories=index * 150,
+            proteins=Decimal(proteins), fats=Decimal('5.25'), carbohydrates=Decimal('20'),
+        ))
+    return dishes
+
+
+def _render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestDishRows:
+    """dish_rows - то же, что DishSerializer(many=True).data"""
+
+    def test_same_as_serializer(self, user, day_dishes):
+        queryset = Dish.objects.filter(user=user).order_by('-created_at')
+
+        assert _render(dish_rows(queryset.values_list(*DISH_ROW_FIELDS))) == _render(DishSerializer(queryset, many=True).data)
+
+    def test_dish_without_meal(self, user):
+        """Без приёма пищи date и meal_type не выводятся"""
+        Dish.objects.create(
+            user=user, meal=None, name='Без приёма', weight=50, calories=10,
+            proteins=Decimal('1'), fats=Decimal('1'), carbohydrates=Decimal('1'),
+        )
+        queryset = Dish.objects.filter(user=user)
+
+        rows = dish_rows(queryset.values_list(*DISH_ROW_FIELDS))
+
+        assert _render(rows) == _render(DishSerializer(queryset, many=True).data)
+        assert 'date' not in rows[0]
+
+    def test_current_timezone(self, user, day_dishes):
+        """Время - в текущем часовом поясе, как в DateTimeField"""
+        queryset = Dish.objects.filter(user=user)
+
+        with timezone.override('Europe/Moscow'):
+            rows = dish_rows(queryset.values_list(*DISH_ROW_FIELDS))
+            expected = DishSerializer(queryset, many=True).data
+
+        assert _render(rows) == _render(expected)
+        assert rows[0]['created_at'].endswith('+03:00')
+
+    def test_list_endpoint(self, authenticated_client, user, day_dishes):
+        """Страница /api/dishes/ совпадает с выводом сериализатора"""
+        response = authenticated_client.get('/api/dishes/?date=2025-01-15')
+        expected = DishSerializer(Dish.objects.filter(user=user).order_by('-created_at'), many=True).data
+
+        assert response.status_code == 200
+        assert response.data['count'] == 5
+        assert _render(response.data['results']) == _render(expected)
+
+
+@pytest.mark.django_db
+class TestDayRows:
+    """Ответ дня совпадает с прежней сборкой через модели и сериализаторы"""
+
+    def test_goal_row(self, daily_goal):
+        values = DailyGoal.objects.filter(pk=daily_goal.pk).values_list(*GOAL_ROW_FIELDS).get()
+
+        assert _render(goal_row(values)) == _render(DailyGoalSerializer(daily_goal).data)
+
+    def test_day_view(self, authenticated_client, user, day_dishes):
+        DailyGoal.objects.create(user=user, date=DAY, calories=2000, proteins=100, fats=70, carbohydrates=250)
+
+        data = authenticated_client.get('/api/days/2025-01-15/').json()
+
+        expected_meals = {meal_type: [] for meal_type in ('breakfast', 'lunch', 'dinner', 'snack')}
+        for meal in Meal.objects.filter(user=user, date=DAY).prefetch_related('dishes').order_by('meal_type'):
+            expected_meals[meal.meal_type].extend(DishSerializer(meal.dishes.all(), many=True).data)
+        goal = DailyGoalSerializer(DailyGoal.objects.get(user=user, date=DAY)).data
+
+        assert _render(data['meals']) == _render(expected_meals)
+        assert _render(data['goal']) == _render(goal)
+        assert data['summary']['total_proteins'] == pytest.approx(1112.5)
+        assert data['summary']['goal_progress']['calories_percent'] == 75.0
@@ -0,0 +1,175 @@
+"""
+Тесты быстрого JSON-рендерера и парсера, MessagePack
+"""
+import io
+import json
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import sample_payloads
+from core.parsers import FastJSONParser, MessagePackParser
+from core.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+requires_msgpack = pytest.mark.skipif(msgpack is None, reason='msgpack не установлен')
+
+
+class TestFastJSONRenderer:
+    """Вывод совпадает со стандартным JSONRenderer DRF"""
+
+    @pytest.mark.parametrize('data', [
+        {'proteins': Decimal('12.50'), 'calories': 300, 'ratio': 0.1 + 0.2},
+        {'created_at': datetime(2025, 1, 15, 8, 30, 0, 123456, tzinfo=timezone.utc)},
+        {'created_at': datetime(2025, 1, 15, 8, 30), 'date': date(2025, 1, 15), 'time': time(8, 30, 0, 500)},
+        {'id': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'detail': gettext_lazy('Не найдено.')},
+        {1: 'числовой ключ', 'вложенный': [{'a': None, 'b': True}], 'pair': (1, 2)},
+        {'text': 'строка с разделителем '},
+    ])
+    def test_same_output_as_drf(self, data):
+        """Decimal, даты, UUID, ленивые строки, числовые ключи, U+2028"""
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_sample_payloads(self):
+        """Типичные ответы (день и страница блюд) - байт в байт"""
+        for payload in sample_payloads(dishes_per_day=10, page_size=10).values():
+            assert FastJSONRenderer().render(payload) == JSONRenderer().render(payload)
+
+    def test_indent_fallback(self):
+        """Отступы по Accept - через стандартный рендерер"""
+        data = {'a': 1}
+        rendered = FastJSONRenderer().render(data, 'application/json; indent=4')
+
+        assert rendered == JSONRenderer().render(data, 'application/json; indent=4')
+        assert b'\n    "a"' in rendered
+
+    def test_none(self):
+        assert FastJSONRenderer().render(None) == b''
+
+
+class TestFastJSONParser:
+    """Разбор тела запроса"""
+
+    def test_same_as_drf(self):
+        body = '{"name": "Борщ", "weight": 300, "proteins": 5.5, "tags": [1, 2]}'.encode('utf-8')
+
+        assert FastJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body))
+
+    @pytest.mark.parametrize('body', [b'{"a": ', b'{"a": NaN}', b'\xff\xfe'])
+    def test_invalid(self, body):
+        """Некорректный JSON и NaN - ParseError"""
+        with pytest.raises(ParseError):
+            FastJSONParser().parse(io.BytesIO(body))
+
+
+@pytest.mark.django_db
+class TestAPIUsesFastJSON:
+    """Рендерер и парсер подключены в REST_FRAMEWORK"""
+
+    def test_dish_roundtrip(self, authenticated_client):
+        response = authenticated_client.post('/api/dishes/', {
+            'name': 'Плов', 'weight': 250, 'calories': 400, 'proteins': '12.50',
+            'fats': '15.00', 'carbohydrates': '50.00', 'date': '2025-01-15', 'meal_type': 'lunch',
+        }, format='json')
+
+        assert response.status_code == 201
+        assert isinstance(response.accepted_renderer, FastJSONRenderer)
+        assert response.json()['proteins'] == '12.50'
+
+        day = authenticated_client.get('/api/days/2025-01-15/').json()
+        assert day['summary']['total_proteins'] == 12.5
+        assert day['meals']['lunch'][0]['name'] == 'Плов'
+
+
+@requires_msgpack
+class TestMessagePack:
+    """MessagePack: та же схема, что и в JSON"""
+
+    @pytest.mark.parametrize('data', [
+        {'proteins': Decimal('12.50'), 'calories': 300, 'ratio': 0.1 + 0.2},
+        {'created_at': datetime(2025, 1, 15, 8, 30, 0, 123456, tzinfo=timezone.utc), 'date': date(2025, 1, 15)},
+        {'id': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'detail': gettext_lazy('Не найдено.')},
+        {'вложенный': [{'a': None, 'b': True}], 'pair': (1, 2)},
+    ])
+    def test_same_schema_as_json(self, data):
+        """Decimal, даты, UUID и ленивые строки - как в JSON"""
+        assert msgpack.unpackb(MessagePackRenderer().render(data)) == json.loads(JSONRenderer().render(data))
+
+    def test_sample_payloads(self):
+        """Типичные ответы: те же данные и меньше байт"""
+        for payload in sample_payloads(dishes_per_day=10, page_size=10).values():
+            packed = MessagePackRenderer().render(payload)
+            rendered = JSONRenderer().render(payload)
+
+            assert msgpack.unpackb(packed) == json.loads(rendered)
+            assert len(packed) < len(rendered)
+
+    def test_parse(self):
+        body = msgpack.packb({'name': 'Борщ', 'weight': 300, 'tags': [1, 2]})
+
+        assert MessagePackParser().parse(io.BytesIO(body)) == {'name': 'Борщ', 'weight': 300, 'tags': [1, 2]}
+
+    @pytest.mark.parametrize('body', [b'\x92\x01', b'\xc1', b'\x81\x01\x02', b'\x01\x02'])
+    def test_invalid(self, body):
+        """Обрезанные данные, неизвестный байт, нестроковый ключ, лишние байты - ParseError"""
+        with pytest.raises(ParseError):
+            MessagePackParser().parse(io.BytesIO(body))
+
+
+@requires_msgpack
+@pytest.mark.django_db
+class TestAPIMessagePack:
+    """Согласование формата по Accept и Content-Type"""
+
+    DISH = {
+        'name': 'Плов', 'weight': 250, 'calories': 400, 'proteins': '12.50',
+        'fats': '15.00', 'carbohydrates': '50.00', 'date': '2025-01-15', 'meal_type': 'lunch',
+    }
+
+    def test_post_and_get_day(self, authenticated_client):
+        response = authenticated_client.post(
+            '/api/dishes/', msgpack.packb(self.DISH), content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+
+        assert response.status_code == 201
+        assert response['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content)['proteins'] == '12.50'
+
+        packed = authenticated_client.get('/api/days/2025-01-15/', HTTP_ACCEPT='application/msgpack')
+        as_json = authenticated_client.get('/api/days/2025-01-15/')
+
+        assert packed['Content-Type'] == 'application/msgpack'
+        assert as_json['Content-Type'] == 'application/json'
+        assert msgpack.unpackb(packed.content) == as_json.json()
+        assert 'Accept' in packed['Vary']
+
+    def test_cached_day_keeps_format(self, authenticated_client):
+        """Кэш ответов дня хранит JSON и MessagePack раздельно"""
+        authenticated_client.post('/api/dishes/', self.DISH, format='json')
+        first = authenticated_client.get('/api/days/2025-01-15/', HTTP_ACCEPT='application/msgpack')
+        cached = authenticated_client.get('/api/days/2025-01-15/', HTTP_ACCEPT='application/msgpack')
+        as_json = authenticated_client.get('/api/days/2025-01-15/')
+
+        assert cached.content == first.content
+        assert cached['Content-Type'] == 'application/msgpack'
+        assert 'Accept' in cached['Vary']
+        assert as_json.json()['meals']['lunch'][0]['name'] == 'Плов'
+
+    def test_format_query_and_errors(self, authenticated_client):
+        """?format=msgpack и ошибки валидации - тоже в MessagePack"""
+        response = authenticated_client.get('/api/dishes/?format=msgpack')
+
+        assert response['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content)['count'] == 0
+
+        invalid = authenticated_client.post(
+            '/api/dishes/', b'\xc1', content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+        assert invalid.status_code == 400
+        assert 'MessagePack parse error' in str(msgpack.unpackb(invalid.content))
@@ -0,0 +1,138 @@
+"""
+Тесты расчётов КБЖУ по дням (core.nutrition_math) и статистики за период
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from core import nutrition_math
+from core.models import DailyGoal, Dish, Meal
+
+MONDAY = date(2025, 1, 13)
+
+
+class TestNutritionMath:
+    """Колоночные расчёты"""
+
+    ROWS = [
+        # (день, калории, белки сг, жиры сг, углеводы сг)
+        (0, 500, 2550, 1000, 6000),
+        (0, 300, 1000, 500, 4000),
+        (2, 1000, 5000, 2000, 10000),
+    ]
+
+    def test_sum_columns(self):
+        totals = nutrition_math.sum_columns(self.ROWS, (1, 2, 3, 4), days=3, day_of=lambda row: row[0])
+
+        assert list(totals['calories']) == [800, 0, 1000]
+        assert list(totals['proteins']) == [3550, 0, 5000]
+
+    def test_single_day_without_day_of(self):
+        totals = nutrition_math.sum_columns(self.ROWS, (1, 2, 3, 4))
+
+        assert nutrition_math.day_values(totals, 0) == {
+            'calories': 1800, 'proteins': 85.5, 'fats': 35.0, 'carbohydrates': 200.0,
+        }
+
+    def test_none_values_skipped(self):
+        totals = nutrition_math.sum_columns([(None, None, 5, 0)], (0, 1, 2, 3))
+
+        assert list(totals['fats']) == [5]
+
+    def test_percentages_and_balance(self):
+        totals = nutrition_math.sum_columns(self.ROWS, (1, 2, 3, 4), days=3, day_of=lambda row: row[0])
+        goals, has_goal = nutrition_math.goal_columns(
+            [(0, 1600, 10000, 0, 20000), (2, 2000, 5000, 4000, 10000)], (1, 2, 3, 4), days=3, day_of=lambda row: row[0],
+        )
+
+        progress = nutrition_math.percentages(totals, goals)
+        balance = nutrition_math.balance(totals, goals, has_goal)
+
+        assert list(has_goal) == [1, 0, 1]
+        assert list(progress['calories']) == [50.0, 0.0, 50.0]
+        assert list(progress['fats']) == [0.0, 0.0, 50.0]
+        assert list(balance['calories']) == [-800, 0, -1000]
+        assert list(balance['proteins']) == [-6450, 0, 0]
+
+    def test_rolling_average(self):
+        series = nutrition_math.sum_columns([(day, day * 10) for day in range(6)], (1, 1, 1, 1), 6, lambda row: row[0])
+
+        assert list(nutrition_math.rolling_average(series['calories'], 3)) == [0.0, 5.0, 10.0, 20.0, 30.0, 40.0]
+
+
+@pytest.mark.django_db
+class TestStatsEndpoints:
+    """Статистика за неделю и диапазон"""
+
+    @pytest.fixture
+    def week(self, user):
+        for offset, calories, proteins in [(0, 1500, '50.25'), (0, 500, '10'), (2, 1800, '80'), (-1, 2100, '90')]:
+            meal, _ = Meal.objects.get_or_create(user=user, date=MONDAY + timedelta(days=offset), meal_type='lunch')
+            Dish.objects.create(
+                user=user, meal=meal, name='Блюдо', weight=300, calories=calories,
+                proteins=Decimal(proteins), fats=Decimal('10'), carbohydrates=Decimal('100'),
+            )
+        DailyGoal.objects.create(
+            user=user, date=MONDAY, calories=2500, proteins=Decimal('100'), fats=Decimal('20'), carbohydrates=Decimal('300'),
+        )
+
+    def test_week(self, authenticated_client, week):
+        """Неделя пн-вс по любой дате внутри неё"""
+        data = authenticated_client.get(f'/api/stats/week/{(MONDAY + timedelta(days=3)).isoformat()}/').json()
+
+        assert data['start'] == '2025-01-13'
+        assert data['end'] == '2025-01-19'
+        assert [day['date'] for day in data['days']][:2] == ['2025-01-13', '2025-01-14']
+        monday = data['days'][0]
+        assert monday['dishes'] == 2
+        assert monday['totals'] == {'calories': 2000, 'proteins': 60.25, 'fats': 20.0, 'carbohydrates': 200.0}
+        assert monday['goal']['calories'] == 2500
+        assert monday['goal_progress']['calories_percent'] == 80.0
+        assert monday['balance'] == {'calories': -500, 'proteins': -39.75, 'fats': 0.0, 'carbohydrates': -100.0}
+        assert data['days'][1]['goal'] is None
+        assert data['days'][1]['balance'] is None
+        assert data['summary']['days_logged'] == 2
+        assert data['summary']['days_with_goal'] == 1
+        assert data['summary']['average']['calories'] == 1900.0
+
+    def test_rolling_average_includes_days_before_range(self, authenticated_client, week):
+        """Окно скользящего среднего первых дней захватывает дни до начала диапазона"""
+        data = authenticated_client.get(f'/api/stats/?start={MONDAY.isoformat()}&end={MONDAY.isoformat()}&window=2').json()
+
+        assert len(data['days']) == 1
+        assert data['days'][0]['rolling_average']['calories'] == (2100 + 2000) / 2
+
+    def test_day_view_matches_stats(self, authenticated_client, week):
+        """День и статистика считают одинаково"""
+        day = authenticated_client.get(f'/api/days/{MONDAY.isoformat()}/').json()['summary']
+        stats = authenticated_client.get(f'/api/stats/week/{MONDAY.isoformat()}/').json()['days'][0]
+
+        assert day['total_proteins'] == stats['totals']['proteins']
+        assert day['goal_progress'] == stats['goal_progress']
+
+    def test_other_user_not_included(self, authenticated_client, week, user2):
+        meal = Meal.objects.create(user=user2, date=MONDAY, meal_type='lunch')
+        Dish.objects.create(user=user2, meal=meal, name='Чужое', weight=100, calories=999, proteins=1, fats=1, carbohydrates=1)
+
+        data = authenticated_client.get(f'/api/stats/week/{MONDAY.isoformat()}/').json()
+
+        assert data['days'][0]['totals']['calories'] == 2000
+
+    @pytest.mark.parametrize('query, field', [
+        ('start=2025-01-13', 'end'),
+        ('start=2025-13-01&end=2025-01-14', 'start'),
+        ('start=2025-02-30&end=2025-03-01', 'start'),
+        ('start=2025-01-14&end=2025-01-13', 'end'),
+        ('start=2024-01-01&end=2025-01-13', 'end'),
+        ('start=2025-01-13&end=2025-01-14&window=0', 'window'),
+        ('start=2025-01-13&end=2025-01-14&window=abc', 'window'),
+    ])
+    def test_invalid_params(self, authenticated_client, query, field):
+        response = authenticated_client.get(f'/api/stats/?{query}')
+
+        assert response.status_code == 400
+        assert field in response.json()
+
+    def test_requires_auth(self, api_client):
+        assert api_client.get('/api/stats/week/2025-01-13/').status_code == 401
@@ -59,6 +59,14 @@ class TestSubscriptionPlans:
         # API использует пагинацию, поэтому проверяем results
         assert 'results' in response.data
         assert isinstance(response.data['results'], list)
+    
+    def test_get_plans_not_modified(self, api_client, subscription_plan):
+        """Повторный запрос списка планов с If-None-Match возвращает 304"""
+        etag = api_client.get('/api/subscription/plans/')['ETag']
+        
+        response = api_client.get('/api/subscription/plans/', HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
 
 
 @pytest.mark.django_db
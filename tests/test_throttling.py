@@ -0,0 +1,178 @@
+"""
+Тесты rate limiting (sliding window counter), throttle распознавания блюд и квот
+"""
+import pytest
+from rest_framework.test import APIRequestFactory
+from core.exceptions import QuotaExceededException
+from core.quotas import (
+    DEFAULT_PAID_PLAN, DEFAULT_QUOTA_PLANS, FREE_PLAN, NUTRITION_LOOKUP, RECOGNITION,
+    consume_quota, get_quota_status, get_user_plan,
+)
+from core.ratelimit import SlidingWindowLimiter
+from core.throttles import DishRecognitionThrottle
+
+
+class TestSlidingWindowLimiter:
+    """Лимитер с постоянной памятью на ключ"""
+    
+    def test_allows_up_to_limit(self):
+        """В пределах окна пропускается ровно limit запросов"""
+        limiter = SlidingWindowLimiter('test_limit', [(3, 60)])
+        results = [limiter.hit('ip', now=1000.0)[0] for _ in range(4)]
+        
+        assert results == [True, True, True, False]
+    
+    def test_state_is_two_counters(self):
+        """На окно хранится один целочисленный счётчик интервала, а не список меток"""
+        limiter = SlidingWindowLimiter('test_state', [(100, 60)])
+        for _ in range(50):
+            limiter.hit('ip', now=1000.0)
+        
+        assert limiter.cache.get(limiter._key('ip', 60, int(1000.0 // 60))) == 50
+    
+    def test_rejected_request_not_counted(self):
+        """Отклонённые запросы не расходуют лимит"""
+        limiter = SlidingWindowLimiter('test_rollback', [(2, 60)])
+        for _ in range(5):
+            limiter.hit('ip', now=1000.0)
+        
+        assert limiter.cache.get(limiter._key('ip', 60, int(1000.0 // 60))) == 2
+    
+    def test_previous_window_weighted(self):
+        """Запросы предыдущего интервала учитываются пропорционально перекрытию"""
+        limiter = SlidingWindowLimiter('test_weight', [(10, 60)])
+        for _ in range(10):
+            limiter.hit('ip', now=60.0)
+        
+        # Середина следующего интервала: половина прошлых запросов ещё в окне
+        results = [limiter.hit('ip', now=150.0)[0] for _ in range(6)]
+        assert results == [True, True, True, True, True, False]
+    
+    def test_wait_is_accurate(self):
+        """wait() указывает момент, когда запрос действительно будет пропущен"""
+        limiter = SlidingWindowLimiter('test_wait', [(10, 60)])
+        for _ in range(10):
+            limiter.hit('ip', now=60.0)
+        
+        allowed, wait = limiter.hit('ip', now=90.0)
+        assert not allowed
+        assert 0 < wait <= 60
+        assert limiter.hit('ip', now=90.0 + wait - 1)[0] is False
+        assert limiter.hit('ip', now=90.0 + wait)[0] is True
+    
+    def test_multiple_windows(self):
+        """Дневной лимит срабатывает, даже если минутный не превышен"""
+        limiter = SlidingWindowLimiter('test_multi', [(10, 60), (15, 86400)])
+        now = 86400.0 * 10
+        allowed = [limiter.hit('ip', now=now + minute * 60)[0] for minute in range(20)]
+        
+        assert allowed.count(True) == 15
+        allowed, wait = limiter.hit('ip', now=now + 21 * 60)
+        assert not allowed
+        assert wait > 3600
+    
+    def test_keys_are_isolated(self):
+        """Лимиты разных клиентов независимы"""
+        limiter = SlidingWindowLimiter('test_isolation', [(1, 60)])
+        
+        assert limiter.hit('a', now=1000.0)[0] is True
+        assert limiter.hit('b', now=1000.0)[0] is True
+        assert limiter.hit('a', now=1000.0)[0] is False
+
+
+class TestDishRecognitionThrottle:
+    """Throttle распознавания блюд"""
+    
+    def test_minute_limit(self):
+        """11-й запрос за минуту отклоняется с корректным временем ожидания"""
+        request = APIRequestFactory().post('/api/dishes/recognize/', REMOTE_ADDR='10.0.0.1')
+        results = []
+        for _ in range(11):
+            throttle = DishRecognitionThrottle()
+            results.append(throttle.allow_request(request, None))
+        
+        assert results.count(True) == 10
+        assert results[-1] is False
+        assert 0 < throttle.wait() <= 120
+
+
+@pytest.mark.django_db
+class TestQuotas:
+    """Квоты по пользователю и тарифному плану"""
+    
+    def test_free_plan_without_subscription(self, user):
+        """Без активной подписки действует план free"""
+        assert get_user_plan(user) == FREE_PLAN
+    
+    def test_paid_plan_from_subscription(self, user, subscription):
+        """Активная подписка даёт план подписки"""
+        assert get_user_plan(user) == subscription.plan.name
+    
+    def test_plan_cache_invalidated_on_subscription_change(self, user, subscription):
+        """Отмена подписки сразу переводит пользователя на free"""
+        assert get_user_plan(user) != FREE_PLAN
+        subscription.status = 'cancelled'
+        subscription.save()
+        
+        assert get_user_plan(user) == FREE_PLAN
+    
+    def test_consume_until_exhausted(self, user, settings):
+        """После исчерпания дневного бюджета списание отклоняется и не расходует квоту"""
+        settings.QUOTA_PLANS = {
+            FREE_PLAN: {RECOGNITION: {'day': 2, 'month': 10}, NUTRITION_LOOKUP: {'day': 2, 'month': 10}},
+            DEFAULT_PAID_PLAN: {RECOGNITION: {'day': 5, 'month': 10}, NUTRITION_LOOKUP: {'day': 5, 'month': 10}},
+        }
+        consume_quota(user, RECOGNITION)
+        consume_quota(user, RECOGNITION)
+        with pytest.raises(QuotaExceededException) as exc_info:
+            consume_quota(user, RECOGNITION)
+        
+        status = get_quota_status(user, RECOGNITION)
+        assert status.used == {'day': 2, 'month': 2}
+        assert exc_info.value.quota_status.remaining('day') == 0
+        assert exc_info.value.wait >= 1
+        # Другие операции расходуются отдельно
+        assert consume_quota(user, NUTRITION_LOOKUP).remaining('day') == 1
+    
+    def test_paid_plan_has_larger_budget(self, user, subscription):
+        """Платный план использует свои лимиты"""
+        status = consume_quota(user, RECOGNITION)
+        
+        assert status.limits == DEFAULT_QUOTA_PLANS[DEFAULT_PAID_PLAN][RECOGNITION]
+        assert status.remaining('day') == status.limits['day'] - 1
+    
+    def test_partial_override_merged_with_defaults(self, user, subscription, settings):
+        """QUOTA_PLANS без плана 'default' и без части периодов дополняется умолчаниями"""
+        settings.QUOTA_PLANS = {FREE_PLAN: {RECOGNITION: {'day': 3}}}
+        
+        paid = get_quota_status(user, RECOGNITION)
+        subscription.status = 'cancelled'
+        subscription.save()
+        free = get_quota_status(user, RECOGNITION)
+        
+        assert paid.limits == DEFAULT_QUOTA_PLANS[DEFAULT_PAID_PLAN][RECOGNITION]
+        assert free.limits == {'day': 3, 'month': DEFAULT_QUOTA_PLANS[FREE_PLAN][RECOGNITION]['month']}
+    
+    def test_food_search_returns_429_with_headers(self, api_client, user, settings):
+        """Исчерпанная квота: 429, Retry-After и заголовки X-Quota-*"""
+        settings.OPENROUTER_API_KEY = 'test-key'
+        settings.QUOTA_PLANS = {
+            FREE_PLAN: {RECOGNITION: {'day': 0, 'month': 0}, NUTRITION_LOOKUP: {'day': 0, 'month': 0}},
+            DEFAULT_PAID_PLAN: DEFAULT_QUOTA_PLANS[DEFAULT_PAID_PLAN],
+        }
+        api_client.force_authenticate(user=user)
+        response = api_client.post('/api/dishes/search-nutrition/', {'food_name': 'блюдо шефа 42'}, format='json')
+        
+        assert response.status_code == 429
+        assert response['X-Quota-Plan'] == FREE_PLAN
+        assert response['X-Quota-Remaining-Day'] == '0'
+        assert int(response['Retry-After']) >= 1
+    
+    def test_local_database_hit_does_not_consume(self, api_client, user, settings):
+        """Продукты из локальной базы не расходуют квоту LLM"""
+        settings.OPENROUTER_API_KEY = 'test-key'
+        api_client.force_authenticate(user=user)
+        response = api_client.post('/api/dishes/search-nutrition/', {'food_name': 'яблоко'}, format='json')
+        
+        assert response.status_code == 200
+        assert response['X-Quota-Remaining-Day'] == response['X-Quota-Limit-Day']
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (кэш пользователя для аутентификации)
+        from . import signals  # noqa: F401
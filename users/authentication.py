@@ -0,0 +1,100 @@
+"""
+JWT-аутентификация с кэшем пользователя
+
+JWTAuthentication на каждый запрос загружает строку пользователя из БД.
+CachedJWTAuthentication берёт минимальный набор полей (CACHED_USER_FIELDS)
+из общего кэша и собирает из них экземпляр User с отложенными остальными
+полями: обращение к ним (например, к паролю) догружает поле из БД, save()
+сохраняет только загруженные поля. Кэш пользователя сбрасывается при
+сохранении и удалении User (users.signals) - смена email, пароля,
+деактивация - и при отзыве токенов (users.tokens.revoke_tokens). Версия
+токенов пользователя проверяется на каждый запрос.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core.cache import get_cache
+
+from .tokens import check_token_version
+
+cache = get_cache('auth')
+
+# Короткий TTL ограничивает устаревание при изменениях в обход сигналов (UPDATE)
+USER_CACHE_TIMEOUT = 60
+
+# Поля пользователя, нужные аутентификации и проверкам прав
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser', 'token_version')
+
+
+def _user_key(user_id):
+    return f'user:{user_id}'
+
+
+def _load_user_fields(user_id):
+    User = get_user_model()
+    return (
+        User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .values(*CACHED_USER_FIELDS)
+        .first()
+    )
+
+
+def get_cached_user(user_id):
+    """
+    Пользователь по значению USER_ID_FIELD (из кэша; при промахе - один запрос).
+
+    Returns:
+        User с загруженными CACHED_USER_FIELDS или None, если пользователя нет
+    """
+    fields = cache.get(_user_key(user_id))
+    if fields is None:
+        fields = _load_user_fields(user_id)
+        if fields is None:
+            return None
+        cache.set(_user_key(user_id), fields, USER_CACHE_TIMEOUT)
+
+    User = get_user_model()
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    return User.from_db(connection.alias, names, [fields[name] for name in names])
+
+
+def invalidate_cached_user(user_id):
+    """
+    Сбрасывает кэш пользователя.
+
+    Внутри транзакции - ещё раз после коммита, чтобы параллельный запрос
+    не закэшировал незакоммиченное состояние.
+    """
+    cache.delete(_user_key(user_id))
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(_user_key(user_id)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, загружающая пользователя через get_cached_user и проверяющая версию токена"""
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Проверке нужен хэш пароля - его в общий кэш не кладём
+            user = super().get_user(validated_token)
+            check_token_version(validated_token, user)
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        check_token_version(validated_token, user)
+        return user
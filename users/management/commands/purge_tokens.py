@@ -0,0 +1,44 @@
+"""
+Удаление истёкших токенов из таблиц OutstandingToken и BlacklistedToken
+
+Отзыв токенов при смене пароля не пишет в чёрный список (users.tokens), а
+записи о выданных токенах после истечения срока не нужны - команда
+запускается периодически (cron):
+
+    python manage.py purge_tokens
+    python manage.py purge_tokens --batch-size 5000 --dry-run
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие выданные токены и записи чёрного списка пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Токенов за одну транзакцию')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не удалять')
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        if options['dry_run']:
+            outstanding = expired.count()
+            blacklisted = BlacklistedToken.objects.filter(token__in=expired).count()
+            self.stdout.write(self.style.SUCCESS(
+                f'[dry-run] Выданных токенов к удалению: {outstanding}, из чёрного списка: {blacklisted}'
+            ))
+            return
+
+        outstanding = blacklisted = 0
+        while True:
+            ids = list(expired.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+                outstanding += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено выданных токенов: {outstanding}, из чёрного списка: {blacklisted}'
+        ))
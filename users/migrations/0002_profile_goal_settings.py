@@ -0,0 +1,28 @@
+# Пол, цель и режим автоматического пересчёта целей в профиле
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='auto_update_goals',
+            field=models.BooleanField(default=False, verbose_name='Пересчитывать автоматические цели при изменении профиля'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='gender',
+            field=models.CharField(choices=[('male', 'Мужской'), ('female', 'Женский')], default='male', max_length=10, verbose_name='Пол'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='goal',
+            field=models.CharField(choices=[('lose', 'Похудение'), ('maintain', 'Поддержание'), ('gain', 'Набор массы')], default='maintain', max_length=10, verbose_name='Цель'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Версия токенов пользователя: отзыв всех токенов одним UPDATE (users.tokens)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_goal_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Увеличивается при отзыве всех токенов пользователя (users.tokens)', verbose_name='Версия токенов'),
+        ),
+    ]
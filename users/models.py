@@ -5,6 +5,11 @@ from django.db import models
 class User(AbstractUser):
     """Кастомная модель пользователя"""
     email = models.EmailField(unique=True, verbose_name='Email')
+    token_version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Версия токенов',
+        help_text='Увеличивается при отзыве всех токенов пользователя (users.tokens)'
+    )
     
     class Meta:
         verbose_name = 'Пользователь'
@@ -43,6 +48,26 @@ class Profile(models.Model):
         default='sedentary',
         verbose_name='Уровень активности'
     )
+    gender = models.CharField(
+        max_length=10,
+        choices=[('male', 'Мужской'), ('female', 'Женский')],
+        default='male',
+        verbose_name='Пол'
+    )
+    goal = models.CharField(
+        max_length=10,
+        choices=[
+            ('lose', 'Похудение'),
+            ('maintain', 'Поддержание'),
+            ('gain', 'Набор массы'),
+        ],
+        default='maintain',
+        verbose_name='Цель'
+    )
+    auto_update_goals = models.BooleanField(
+        default=False,
+        verbose_name='Пересчитывать автоматические цели при изменении профиля'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
@@ -51,5 +76,13 @@ class Profile(models.Model):
         verbose_name_plural = 'Профили'
         db_table = 'profiles'
     
+    # Параметры auto_calculate_goals в порядке её аргументов
+    GOAL_PARAM_FIELDS = ('weight', 'height', 'age', 'activity_level', 'gender', 'goal')
+    
     def __str__(self):
         return f'Профиль {self.user.username}'
+    
+    def goal_params(self):
+        """Кортеж параметров расчёта целей или None, если вес, рост или возраст не заполнены"""
+        params = tuple(getattr(self, field) for field in self.GOAL_PARAM_FIELDS)
+        return None if None in params else params
@@ -2,7 +2,15 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from core.goal_schedule import recalculate_auto_goals
+from core.utils import memoized_goals
+from .authentication import get_cached_user
 from .models import Profile
+from .tokens import VersionedRefreshToken, check_token_version
 
 User = get_user_model()
 
@@ -114,7 +122,7 @@ class ProfileRetrieveSerializer(serializers.Serializer):
 
 
 class ProfileUpdateSerializer(serializers.Serializer):
-    """Сериализатор для обновления профиля (только first_name и email)"""
+    """Сериализатор для обновления профиля (имя, email и параметры расчёта целей)"""
     first_name = serializers.CharField(
         required=False,
         max_length=150,
@@ -122,6 +130,17 @@ class ProfileUpdateSerializer(serializers.Serializer):
         allow_null=False
     )
     email = serializers.EmailField(required=False)
+    weight = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=1, required=False)
+    height = serializers.IntegerField(min_value=1, required=False)
+    age = serializers.IntegerField(min_value=1, max_value=150, required=False)
+    activity_level = serializers.ChoiceField(
+        choices=Profile._meta.get_field('activity_level').choices, required=False
+    )
+    gender = serializers.ChoiceField(choices=Profile._meta.get_field('gender').choices, required=False)
+    goal = serializers.ChoiceField(choices=Profile._meta.get_field('goal').choices, required=False)
+    auto_update_goals = serializers.BooleanField(required=False)
+    
+    PROFILE_FIELDS = ('first_name', 'auto_update_goals') + Profile.GOAL_PARAM_FIELDS
 
     def validate_first_name(self, value):
         """Валидация имени: если передано, должно быть 1-150 символов"""
@@ -150,15 +169,31 @@ class ProfileUpdateSerializer(serializers.Serializer):
         """Обновление профиля и email пользователя"""
         user = instance.user
         
-        # Обновляем first_name в профиле (только если передано)
-        if 'first_name' in validated_data:
-            instance.first_name = validated_data['first_name']
+        goal_params = instance.goal_params()
+        was_auto = instance.auto_update_goals
+        
+        # Обновляем поля профиля (только переданные)
+        changed = [field for field in self.PROFILE_FIELDS if field in validated_data]
+        if changed:
+            for field in changed:
+                setattr(instance, field, validated_data[field])
             instance.save()
         
+        # Автоматические цели пересчитываются, только если параметры изменились
+        # (или режим только что включён): повторное сохранение того же профиля - no-op
+        self.goals_updated = None
+        if instance.auto_update_goals and instance.goal_params() is not None:
+            if instance.goal_params() != goal_params or not was_auto:
+                self.goals_updated = recalculate_auto_goals(
+                    user.pk, memoized_goals(*instance.goal_params()), timezone.localdate()
+                )
+            else:
+                self.goals_updated = 0
+        
         # Обновляем email в пользователе (только если передано)
         if 'email' in validated_data:
             user.email = validated_data['email']
-            user.save()
+            user.save(update_fields=['email'])
         
         return instance
 
@@ -218,3 +253,19 @@ class PasswordChangeSerializer(serializers.Serializer):
         
         return attrs
 
+
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Выдача пары токенов (/api/auth/token/) с версией токенов пользователя"""
+    token_class = VersionedRefreshToken
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновление токена: refresh-токен, выданный до отзыва токенов, отклоняется"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = get_cached_user(refresh.payload.get(api_settings.USER_ID_CLAIM))
+        if user is None:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        check_token_version(refresh, user)
+        return super().validate(attrs)
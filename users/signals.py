@@ -0,0 +1,15 @@
+"""
+Сигналы пользователей: сброс кэша пользователя для аутентификации
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_auth_cache(sender, instance, **kwargs):
+    """Смена email, пароля, деактивация и удаление сразу видны аутентификации"""
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,48 @@
+"""
+Версия токенов пользователя
+
+Каждый выданный токен несёт claim TOKEN_VERSION_CLAIM с User.token_version на
+момент выдачи. Аутентификация (users.authentication) и обновление токена
+(users.serializers.VersionedTokenRefreshSerializer) отклоняют токены, версия
+которых не совпадает с текущей. Отзыв всех токенов пользователя (смена
+пароля) - один UPDATE, увеличивающий token_version, вместо внесения каждого
+OutstandingToken в чёрный список. Токены, выданные без claim, считаются
+версией 0.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh-токен с версией токенов пользователя (копируется и в access-токен)"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+def check_token_version(token, user):
+    """Отклоняет токен, выданный до последнего отзыва токенов пользователя"""
+    if token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+        raise AuthenticationFailed('Токен отозван.', code='token_revoked')
+
+
+def revoke_tokens(user):
+    """
+    Отзывает все выданные токены пользователя одним UPDATE.
+
+    user.token_version получает новое значение: токены, выданные после
+    этого (VersionedRefreshToken.for_user), действительны.
+    """
+    from .authentication import invalidate_cached_user
+
+    get_user_model().objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    # UPDATE не отправляет post_save - сбрасываем кэш аутентификации сами
+    invalidate_cached_user(user.pk)
+    user.refresh_from_db(fields=['token_version'])
@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from core.throttles import RegistrationThrottle, LoginThrottle
+from core.conditional import make_etag, not_modified_response, set_validators
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -17,6 +18,7 @@ from .serializers import (
     PasswordChangeSerializer
 )
 from .models import Profile
+from .tokens import VersionedRefreshToken, revoke_tokens
 
 User = get_user_model()
 
@@ -34,7 +36,7 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
         
         # Генерируем токены для нового пользователя
-        refresh = RefreshToken.for_user(user)
+        refresh = VersionedRefreshToken.for_user(user)
         
         # Получаем профиль для first_name (должен быть создан в сериализаторе)
         profile, _ = Profile.objects.get_or_create(user=user)
@@ -102,7 +104,7 @@ class LoginView(generics.GenericAPIView):
             }, status=status.HTTP_401_UNAUTHORIZED)
         
         # Генерируем токены
-        refresh = RefreshToken.for_user(user)
+        refresh = VersionedRefreshToken.for_user(user)
         
         # Получаем профиль для first_name
         profile, _ = Profile.objects.get_or_create(user=user)
@@ -173,12 +175,20 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         """Получение профиля пользователя (только id, email, first_name)"""
+        # Условный GET: валидатор строится из updated_at профиля и email пользователя
+        updated_at = Profile.objects.filter(user=request.user).values_list('updated_at', flat=True).first()
+        etag = make_etag('profile', request.user.pk, request.user.email, updated_at.isoformat()) if updated_at else None
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
         profile = self.get_object()
-        return Response({
+        response = Response({
             'id': request.user.id,
             'email': request.user.email,
             'first_name': profile.first_name or ''
         })
+        return set_validators(response, etag)
 
     def update(self, request, *args, **kwargs):
         """Обновление профиля"""
@@ -198,11 +208,15 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         profile, _ = Profile.objects.get_or_create(user=request.user)
         profile.refresh_from_db()
         
-        return Response({
+        data = {
             'id': request.user.id,
             'email': request.user.email,
             'first_name': profile.first_name or ''
-        }, status=status.HTTP_200_OK)
+        }
+        if serializer.goals_updated is not None:
+            # Режим auto_update_goals: сколько автоматических целей на день пересчитано
+            data['goals_updated'] = serializer.goals_updated
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class EmailUpdateView(generics.GenericAPIView):
@@ -216,7 +230,7 @@ class EmailUpdateView(generics.GenericAPIView):
         
         user = request.user
         user.email = serializer.validated_data['email']
-        user.save()
+        user.save(update_fields=['email'])
         
         return Response({
             'message': 'Email успешно обновлён.',
@@ -235,23 +249,20 @@ class PasswordChangeView(generics.GenericAPIView):
         
         user = request.user
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
-        
-        # Инвалидируем все существующие токены пользователя при смене пароля
-        # Это защищает от использования украденных токенов
-        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
-        from rest_framework_simplejwt.tokens import RefreshToken
+        # Только пароль: сохранение всех полей могло бы вернуть token_version,
+        # увеличенную параллельным отзывом токенов
+        user.save(update_fields=['password'])
         
-        # Получаем все outstanding токены пользователя
-        outstanding_tokens = OutstandingToken.objects.filter(user=user)
-        for token in outstanding_tokens:
-            try:
-                refresh_token = RefreshToken(token.token)
-                refresh_token.blacklist()
-            except Exception:
-                # Токен уже истёк или невалиден, пропускаем
-                pass
+        # Отзываем все выданные токены пользователя (включая текущий) одним UPDATE:
+        # это защищает от использования украденных токенов. Клиент, сменивший
+        # пароль, получает новую пару токенов
+        revoke_tokens(user)
+        refresh = VersionedRefreshToken.for_user(user)
         
         return Response({
-            'detail': 'Пароль успешно изменён.'
+            'detail': 'Пароль успешно изменён.',
+            'tokens': {
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+            }
         }, status=status.HTTP_200_OK)